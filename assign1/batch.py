@@ -0,0 +1,115 @@
+import contextlib
+import glob
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from prover import prove, load_solver
+from report import ProofResult
+
+_cache_dir = None
+_output = {}
+_options = {}
+
+def expand_paths(specs, pattern='test_*.py'):
+    """Expands files, directories and glob patterns into a sorted file list."""
+    files = set()
+    for spec in specs:
+        if os.path.isdir(spec):
+            # Directories are searched recursively for matching programs
+            files.update(glob.glob(os.path.join(spec, '**', pattern), recursive=True))
+        elif os.path.isfile(spec):
+            files.add(spec)
+        else:
+            matches = glob.glob(spec, recursive=True)
+            if not matches:
+                raise FileNotFoundError(f"No files match '{spec}'")
+            files.update(m for m in matches if os.path.isfile(m))
+    return sorted(os.path.normpath(f) for f in files)
+
+def _init_worker(timeout, cache_dir, output, options):
+    """Runs once per worker process, so Z3 is loaded before the first file."""
+    global _cache_dir, _output, _options
+    _cache_dir = cache_dir
+    _output = output
+    _options = options
+    if timeout is not None:
+        load_solver()
+        from z3 import set_param
+        set_param('timeout', int(timeout * 1000))
+
+def _prove_one(path):
+    """Proves a single file, capturing its output. Runs inside a worker."""
+    out = io.StringIO()
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(out):
+            # Files already run in parallel; keep each one on a single thread
+            result = prove(path, jobs=1, cache_dir=_cache_dir, **_output, **_options)
+    except Exception as e:
+        result = ProofResult(path, 'error', time.perf_counter() - start,
+                             error=f"{type(e).__name__}: {e}")
+    return {
+        'path': path,
+        'verdict': result.verdict,
+        'seconds': time.perf_counter() - start,
+        'output': out.getvalue(),
+        'error': result.error,
+        'result': result.to_dict(),
+    }
+
+def prove_many(paths, jobs=None, timeout=None, pattern='test_*.py', cache_dir=None,
+               progress=False, quiet=False, dump=False, **options):
+    """Proves every file in `paths` on a pool of `jobs` worker processes.
+
+    Returns one result dict per file (path, verdict, seconds, output,
+    error, and the ProofResult as a dict), sorted by path. Workers are
+    reused across files, and share the verdict cache in `cache_dir` if
+    one is given. `quiet`, `dump` and other keyword options are passed
+    on to prove().
+    """
+    files = expand_paths(paths, pattern)
+    results = []
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                             initargs=(timeout, cache_dir, {'quiet': quiet, 'dump': dump},
+                                       options)) as pool:
+        futures = [pool.submit(_prove_one, f) for f in files]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            if progress:
+                print(f"  {result['verdict'].upper():9} {result['seconds']:7.2f}s  {result['path']}")
+    results.sort(key=lambda r: r['path'])
+    return results
+
+def print_summary(results, verbose=False, wall=None):
+    """Prints an aggregate summary. Returns True if every file was verified.
+
+    `wall` is the elapsed time of the whole run, in seconds; with
+    parallel workers it is less than the sum of the files' times.
+    """
+    counts = {}
+    for r in results:
+        counts[r['verdict']] = counts.get(r['verdict'], 0) + 1
+
+    bad = [r for r in results if r['verdict'] != 'verified']
+    if bad:
+        print("\n--- Not verified ---")
+        for r in bad:
+            print(f"  {r['path']}: {r['verdict']}" + (f" ({r['error']})" if r['error'] else ""))
+            if verbose:
+                print(r['output'])
+
+    total = sum(r['seconds'] for r in results)
+    slowest = max(results, key=lambda r: r['seconds'], default=None)
+    print("\n--- Summary ---")
+    print(f"  Files:    {len(results)}")
+    for verdict in ('verified', 'failed', 'unknown', 'error'):
+        print(f"  {verdict.capitalize() + ':':9} {counts.get(verdict, 0)}")
+    if wall is not None:
+        print(f"  Wall time: {wall:.2f}s")
+    print(f"  Sum time:  {total:.2f}s")
+    if slowest is not None:
+        print(f"  Slowest:  {slowest['path']} ({slowest['seconds']:.2f}s)")
+    return not bad
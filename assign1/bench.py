@@ -0,0 +1,304 @@
+import datetime
+import io
+import json
+import platform
+import sys
+import time
+
+from z3 import *
+from parser import parse
+from ir import Interner
+from sorts import infer_sorts
+from slicing import slice_program
+from scheduler import call_graph, strongly_connected_components
+from prover import DEFAULT_OPTIONS, VerificationContext, proc_vc, main_vc, discharge, fuel_level
+
+# Bumped when the JSON layout changes, so old result files are not misread
+RESULTS_VERSION = 1
+
+# --- Program generators: each returns While-Py source of size n ---
+
+def gen_straight(n):
+    """n assignments in a row, each reading the previous one."""
+    lines = ["x0 = 0"]
+    lines += [f"x{i} = x{i - 1} + 1" for i in range(1, n + 1)]
+    lines.append(f"assert(x{n} == {n})")
+    return "\n".join(lines) + "\n"
+
+def gen_ifs(n):
+    """n conditionals in sequence, so 2^n paths."""
+    lines = ["x = 0"]
+    for i in range(n):
+        lines += [f"if c{i} > 0:",
+                  "    x = x + 1",
+                  "else:",
+                  "    x = x + 0"]
+    lines.append(f"assert(x >= 0 and x <= {n})")
+    return "\n".join(lines) + "\n"
+
+def gen_loops(n):
+    """n loops nested in each other, each with a bounds invariant."""
+    lines = []
+    for i in range(n):
+        pad = "    " * i
+        lines += [f"{pad}i{i} = 0",
+                  f"{pad}while i{i} < 10:",
+                  f"{pad}    invariant(i{i} >= 0 and i{i} <= 10)"]
+    for i in reversed(range(n)):
+        lines.append("    " * (i + 1) + f"i{i} = i{i} + 1")
+    return "\n".join(lines) + "\n"
+
+def gen_calls(n):
+    """A chain of n procedures, each calling the next."""
+    lines = []
+    for k in range(n):
+        lines += [f"def p{k}(x):",
+                  "    requires(x >= 0)",
+                  f"    ensures(ret == x + {n - k})",
+                  "    modifies()"]
+        if k + 1 < n:
+            lines += [f"    r = p{k + 1}(x + 1)",
+                      "    return r"]
+        else:
+            lines.append("    return x + 1")
+        lines.append("")
+    lines += ["y = p0(0)",
+              f"assert(y == {n})"]
+    return "\n".join(lines) + "\n"
+
+def gen_modifies(n):
+    """A procedure that modifies n globals, called three times."""
+    names = [f"g{i}" for i in range(n)]
+    lines = ["def bump():",
+             f"    ensures({' and '.join(f'{g} == old({g}) + 1' for g in names)})",
+             f"    modifies({', '.join(repr(g) for g in names)})"]
+    lines += [f"    {g} = {g} + 1" for g in names]
+    lines.append("")
+    lines += [f"{g} = 0" for g in names]
+    lines += ["bump()"] * 3
+    lines.append(f"assert({' and '.join(f'{g} == 3' for g in names)})")
+    return "\n".join(lines) + "\n"
+
+def gen_stores(n):
+    """n array writes, then one read-back assertion per cell."""
+    lines = [f"a[{i}] = {i}" for i in range(n)]
+    lines += [f"assert(a[{i}] == {i})" for i in range(n)]
+    return "\n".join(lines) + "\n"
+
+def gen_recursive(n):
+    """n array-summing procedures like test_recursive2.py, each specified
+    through its own recursive call."""
+    lines = []
+    for k in range(n):
+        lines += [f"def sum{k}(n):",
+                  "    requires(n >= 0)",
+                  f"    ensures(n == 0 and ret == 0 or n > 0 and ret == old(a)[n-1] + sum{k}(n-1))",
+                  "    modifies()",
+                  "    if n == 0:",
+                  "        return 0",
+                  "    else:",
+                  f"        rest = sum{k}(n - 1)",
+                  "        val = a[n-1]",
+                  "        r = rest + val",
+                  "        return r",
+                  ""]
+    lines += ["a[0] = 5", "a[1] = 10", "a[2] = 15"]
+    for k in range(n):
+        lines += [f"total{k} = sum{k}(3)",
+                  f"assert(total{k} == 30)"]
+    return "\n".join(lines) + "\n"
+
+# Generators by name, with the sizes run by default
+GENERATORS = {
+    'straight': (gen_straight, [10, 100, 1000, 5000]),
+    'ifs': (gen_ifs, [4, 8, 16, 32, 64, 128, 256]),
+    'loops': (gen_loops, [1, 2, 4, 8]),
+    'calls': (gen_calls, [1, 10, 50, 200]),
+    'modifies': (gen_modifies, [10, 50, 200]),
+    'stores': (gen_stores, [10, 50, 200]),
+    'recursive': (gen_recursive, [1, 2, 4]),
+}
+
+# --- Running one case ---
+
+def run_case(source, options):
+    """Verifies generated source, timing parse, VC generation and solving.
+
+    Procedures are checked callees first, then main, all on one thread;
+    unlike prover.prove() nothing stops at the first failure, so every
+    size costs the same work whatever the verdict. Returns a dict with
+    the verdict ('verified', 'failed', 'unknown' or 'error') and the
+    seconds spent in each phase.
+    """
+    times = {'parse': 0.0, 'vcgen': 0.0, 'solve': 0.0}
+    result = {'verdict': 'error', 'error': None, 'times': times}
+
+    start = time.perf_counter()
+    interner = Interner()
+    parsed = parse(source, interner)
+    main_stmt, procs, all_vars = parsed['main'], parsed['procs'], parsed['vars']
+    if procs:
+        all_vars.add('ret')
+    sorts = infer_sorts(procs, main_stmt, all_vars)
+    times['parse'] = time.perf_counter() - start
+
+    if options['slice']:
+        start = time.perf_counter()
+        main_stmt, procs, _ = slice_program(main_stmt, procs, interner)
+        times['vcgen'] += time.perf_counter() - start
+
+    verdicts = []
+    with VerificationContext(procs, all_vars, out=io.StringIO(), sorts=sorts, **options) as vctx:
+        order = [name for scc in strongly_connected_components(call_graph(procs)) for name in scc]
+        for name in order + [None]:
+            start = time.perf_counter()
+            if name is None:
+                vc, axioms = main_vc(main_stmt, vctx), []
+            else:
+                vc, axioms = proc_vc(name, procs[name], vctx)
+            times['vcgen'] += time.perf_counter() - start
+
+            start = time.perf_counter()
+            verdicts.append(discharge(vc, vctx, axioms, key=name or 'main')[0])
+            times['solve'] += time.perf_counter() - start
+
+    if any(v == sat for v in verdicts):
+        result['verdict'] = 'failed'
+    elif any(v == unknown for v in verdicts):
+        result['verdict'] = 'unknown'
+    else:
+        result['verdict'] = 'verified'
+    return result
+
+def run(names, sizes=None, options=None, max_seconds=None, progress=True):
+    """Runs the generators in `names` over their sizes. Returns the result list.
+
+    `sizes` replaces every generator's default sizes. Once the next size
+    is expected to take more than `max_seconds` (or a size does not
+    finish with a verdict), the larger sizes of that generator are
+    recorded as 'skipped'.
+    """
+    options = {**DEFAULT_OPTIONS, **(options or {})}
+    results = []
+    for name in names:
+        gen, default_sizes = GENERATORS[name]
+        stop, prev = False, None
+        for n in sizes or default_sizes:
+            entry = {'generator': name, 'size': n}
+            if stop:
+                entry.update(verdict='skipped', error=None, times=None, total=None)
+            else:
+                source = gen(n)
+                entry['lines'] = source.count("\n")
+                try:
+                    entry.update(run_case(source, options))
+                except Exception as e:
+                    entry.update(verdict='error', error=f"{type(e).__name__}: {e}", times=None)
+                times = entry['times']
+                entry['total'] = sum(times.values()) if times else None
+                stop = entry['verdict'] in ('unknown', 'error')
+                if max_seconds is not None and not stop:
+                    # Guess the next size's time from the growth so far, so
+                    # that exponential cases stop before they blow up
+                    growth = entry['total'] / prev if prev else 1.0
+                    stop = entry['total'] * max(growth, 1.0) > max_seconds
+                prev = entry['total']
+            results.append(entry)
+            if progress:
+                print_entry(entry)
+    return results
+
+# --- Reporting ---
+
+def _secs(t):
+    return f"{t:8.3f}" if t is not None else "       -"
+
+def print_entry(entry):
+    times = entry['times'] or {}
+    print(f"  {entry['generator']:10} {entry['size']:6}  {entry['verdict'].upper():9}"
+          f" parse{_secs(times.get('parse'))}  vcgen{_secs(times.get('vcgen'))}"
+          f"  solve{_secs(times.get('solve'))}  total{_secs(entry['total'])}")
+    if entry['error']:
+        print(f"      {entry['error']}")
+
+def compare(old, new):
+    """Prints the total time of every case in `new` against the same case in `old`."""
+    before = {(r['generator'], r['size']): r for r in old['results']}
+    print(f"{'case':18} {'before':>9} {'after':>9} {'ratio':>7}")
+    for r in new['results']:
+        prev = before.get((r['generator'], r['size']))
+        if prev is None:
+            continue
+        t0, t1 = prev['total'], r['total']
+        ratio = f"{t1 / t0:7.2f}" if t0 and t1 is not None else "      -"
+        print(f"{r['generator'] + ' ' + str(r['size']):18} {_secs(t0)} {_secs(t1)} {ratio}"
+              + ("" if prev['verdict'] == r['verdict']
+                 else f"  ({prev['verdict']} -> {r['verdict']})"))
+    if old['options'] != new['options']:
+        print("Note: the two runs used different options.")
+
+if __name__ == "__main__":
+    import argparse
+
+    argp = argparse.ArgumentParser(
+        description="Times the prover on generated programs of growing size.")
+    argp.add_argument('--only', nargs='+', choices=sorted(GENERATORS), default=list(GENERATORS),
+                      help="generators to run (default: all)")
+    argp.add_argument('--sizes', type=lambda s: [int(n) for n in s.split(',')], default=None,
+                      help="comma-separated sizes, instead of each generator's defaults")
+    argp.add_argument('--timeout', type=float, default=10.0,
+                      help="Z3 timeout per query, in seconds (default: 10)")
+    argp.add_argument('--max-seconds', type=float, default=30.0,
+                      help="skip the larger sizes of a generator once the next "
+                           "one is expected to take longer than this (default: 30)")
+    argp.add_argument('--vcgen', choices=('wp', 'linear', 'ssa'), default='wp')
+    argp.add_argument('--split', action='store_true')
+    argp.add_argument('--incremental', action='store_true')
+    argp.add_argument('--portfolio', action='store_true')
+    argp.add_argument('--slice', action='store_true')
+    argp.add_argument('--fuel', type=fuel_level, default=None)
+    argp.add_argument('-o', '--output', default=None,
+                      help="write the results to this JSON file")
+    argp.add_argument('--compare', default=None,
+                      help="JSON file of an earlier run to compare against")
+    argp.add_argument('--show', action='store_true',
+                      help="print the program of every size instead of running it")
+    args = argp.parse_args()
+
+    if args.show:
+        for name in args.only:
+            gen, default_sizes = GENERATORS[name]
+            for n in args.sizes or default_sizes:
+                print(f"# --- {name} {n} ---")
+                print(gen(n))
+        sys.exit(0)
+
+    options = {'vcgen': args.vcgen, 'split': args.split, 'incremental': args.incremental,
+               'portfolio': args.portfolio, 'slice': args.slice, 'fuel': args.fuel}
+    set_param('timeout', int(args.timeout * 1000))
+    # Deep straight-line programs give deeply nested expressions
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 100000))
+
+    print(f"{'generator':12} {'size':>6}  verdict")
+    results = run(args.only, args.sizes, options, args.max_seconds)
+    report = {
+        'version': RESULTS_VERSION,
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'z3': get_full_version(),
+        'python': platform.python_version(),
+        'options': options,
+        'timeout': args.timeout,
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)
+        if old.get('version') != RESULTS_VERSION:
+            raise Exception(f"{args.compare}: results version {old.get('version')}, "
+                            f"expected {RESULTS_VERSION}")
+        print()
+        compare(old, report)
@@ -0,0 +1,175 @@
+import hashlib
+import json
+import marshal
+import os
+import sys
+import tempfile
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    # No file locks (Windows): concurrent processes may lose entries
+    fcntl = None
+
+from scheduler import find_callees
+from sorts import INT
+
+# Bump whenever a change to the prover can change a verdict
+CACHE_VERSION = 4
+
+# Bump whenever a change to the parser changes its output
+PARSE_VERSION = 2
+
+def contract(spec):
+    """The part of a procedure that its callers are verified against."""
+    return {
+        'params': spec['params'],
+        'requires': spec['requires'],
+        'ensures': spec['ensures'],
+        'modifies': sorted(spec['modifies']),
+    }
+
+def proc_fingerprint(name, procs):
+    """Hashes everything the verdict of procedure `name` depends on.
+
+    That is its own body and contract plus the contracts of the procedures
+    it calls, so editing a body invalidates only that procedure, while
+    editing a contract also invalidates its callers.
+    """
+    spec = procs[name]
+    callees = (find_callees(spec['body'])
+               | find_callees(spec['requires'])
+               | find_callees(spec['ensures']))
+    data = {
+        'version': CACHE_VERSION,
+        'name': name,
+        'body': spec['body'],
+        'contract': contract(spec),
+        'callees': {c: contract(procs[c]) for c in sorted(callees) if c in procs},
+    }
+    # Canonical JSON is our normal form: key order and spacing are fixed
+    text = json.dumps(data, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(text.encode()).hexdigest()
+
+def main_fingerprint(main, procs):
+    """Hashes everything the verdict of the main program depends on: its
+    statements and the contracts of the procedures it calls."""
+    data = {
+        'version': CACHE_VERSION,
+        'main': main,
+        'callees': {c: contract(procs[c]) for c in sorted(find_callees(main)) if c in procs},
+    }
+    text = json.dumps(data, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(text.encode()).hexdigest()
+
+def verdict_salt(sorts, options):
+    """What every verdict depends on besides the program: the sorts that
+    are not Int, and the verification options."""
+    # Int is the default, so adding an Int variable invalidates nothing
+    return json.dumps([sorted((v, s) for v, s in sorts.items() if s != INT),
+                       sorted(options.items())])
+
+def salted(fingerprint, salt):
+    return hashlib.sha256((fingerprint + salt).encode()).hexdigest()
+
+def load_json(path):
+    """The JSON object in file `path`, or {} if it is missing or unreadable."""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def merge_json(path, added):
+    """Adds the entries of `added` to the JSON object in file `path`.
+
+    The file is read, merged and replaced under an exclusive lock on
+    `path`.lock, so concurrent writers, in this process or others (see
+    batch.py), keep each other's entries. Returns the merged object.
+    """
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    with open(path + '.lock', 'a') as lock:
+        if fcntl is not None:
+            # Released when the lock file is closed
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        entries = load_json(path)
+        entries.update(added)
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(entries, f)
+        os.replace(tmp, path)
+    return entries
+
+class VerdictCache:
+    """On-disk store of verified procedures, keyed by fingerprint.
+
+    Only successful verdicts are stored: failures are always re-checked so
+    the counterexample is printed again. Keys are salted with `salt`
+    (see verdict_salt), so runs with other options or sorts do not share
+    verdicts.
+    """
+
+    def __init__(self, directory, salt=''):
+        self.path = os.path.join(directory, 'verdicts.json')
+        self.salt = salt
+        self.entries = load_json(self.path)
+        self.added = {}
+        self.lock = threading.Lock()
+
+    def key(self, name, procs):
+        """Cache key of procedure `name`; see proc_fingerprint."""
+        return salted(proc_fingerprint(name, procs), self.salt)
+
+    def main_key(self, main, procs):
+        """Cache key of the main program; see main_fingerprint."""
+        return salted(main_fingerprint(main, procs), self.salt)
+
+    def get(self, key):
+        with self.lock:
+            return self.entries.get(key)
+
+    def put(self, key, name):
+        with self.lock:
+            self.entries[key] = self.added[key] = {'proc': name}
+
+    def save(self):
+        """Merges new entries into the file; safe with concurrent writers."""
+        with self.lock:
+            if not self.added:
+                return
+            self.entries = merge_json(self.path, self.added)
+            self.added = {}
+
+class ParseCache:
+    """On-disk store of parsed programs, keyed by a hash of the source.
+
+    Each entry is the output of parser.parse() ({'main', 'procs', 'vars'})
+    in marshal format, one file per source. marshal keeps shared
+    subtrees shared and loads far faster than parsing the source again.
+    """
+
+    def __init__(self, directory):
+        self.directory = os.path.join(directory, 'parsed')
+
+    def path(self, source):
+        # marshal's format is tied to the Python version that wrote it,
+        # and marshal.version is not bumped for every change
+        data = f"{PARSE_VERSION}:{sys.implementation.cache_tag}:{marshal.version}:{source}"
+        return os.path.join(self.directory, hashlib.sha256(data.encode()).hexdigest() + '.marshal')
+
+    def get(self, source):
+        """The parsed program of `source`, or None if it is not stored."""
+        try:
+            with open(self.path(source), 'rb') as f:
+                return marshal.load(f)
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+
+    def put(self, source, parsed):
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            marshal.dump(parsed, f)
+        os.replace(tmp, self.path(source))
@@ -0,0 +1,143 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from z3 import *
+from portfolio import race
+
+def solve_goals(vc, goals, background, vctx, key=''):
+    """Checks every labelled goal of `vc` on its own. Returns one result per goal.
+
+    `goals` are the obligations recorded by vctx.obligation(): each guards
+    its formula with a literal, so the goal is checked by asserting Not(vc)
+    with its own literal on and all others off. `vc` is valid iff every
+    goal is. Goals are spread over `goal_jobs` worker threads; each worker
+    gets its own Z3 Context with a translated copy of the VC, and every
+    check is limited to `goal_timeout` seconds (both vctx options). In
+    portfolio mode each goal is raced over the solver configurations, with
+    its label appended to `key` to remember the winner.
+
+    A result is a dict with the goal's kind and label, its verdict
+    ('verified', 'failed' or 'unknown'), the time taken, and the
+    counterexample (failed) or the solver's reason (unknown) as text.
+    """
+    jobs = vctx.options['goal_jobs'] or os.cpu_count() or 1
+    jobs = max(1, min(jobs, len(goals)))
+    timeout = vctx.options['goal_timeout']
+
+    # Z3 contexts are not thread-safe: translate on this thread, solve on the workers
+    negated = Not(vc)
+    workers = []
+    for _ in range(jobs):
+        ctx = Context()
+        workers.append({
+            'ctx': ctx,
+            'vc': negated.translate(ctx),
+            'background': [f.translate(ctx) for f in background],
+            'lits': [g['lit'].translate(ctx) for g in goals],
+        })
+        vctx.child_contexts.append(ctx)
+
+    todo = list(range(len(goals)))
+    lock = threading.Lock()
+    results = [None] * len(goals)
+
+    def run(worker):
+        while True:
+            with lock:
+                if not todo:
+                    return
+                k = todo.pop(0)
+            switches = [lit if j == k else Not(lit) for j, lit in enumerate(worker['lits'])]
+            start = time.perf_counter()
+            if vctx.options['portfolio']:
+                result, detail, _ = race(worker['background'] + [worker['vc']] + switches, vctx,
+                                         f"{key} [{goals[k]['kind']}] {goals[k]['label']}", timeout,
+                                         record=key)
+            else:
+                s = Solver(ctx=worker['ctx'])
+                if timeout is not None:
+                    s.set('timeout', int(timeout * 1000))
+                s.add(*worker['background'])
+                s.add(worker['vc'])
+                s.add(*switches)
+                result = s.check()
+                if vctx.stats is not None:
+                    vctx.stats.add_solver(key, s)
+                detail = None
+                if result == sat:
+                    detail = str(s.model())
+                elif result == unknown:
+                    try:
+                        detail = s.reason_unknown()
+                    except Z3Exception:
+                        pass
+            seconds = time.perf_counter() - start
+            verdict = 'verified' if result == unsat else 'failed' if result == sat else 'unknown'
+            results[k] = {'kind': goals[k]['kind'], 'label': goals[k]['label'],
+                          'verdict': verdict, 'seconds': seconds, 'detail': detail}
+
+    try:
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            list(pool.map(run, workers))
+    finally:
+        for worker in workers:
+            vctx.child_contexts.remove(worker['ctx'])
+    return results
+
+def solve_incremental(vc, goals, axioms, vctx, key=''):
+    """Checks the goals of `vc` on the run's shared solver. Returns one result per goal.
+
+    The solver (vctx.shared_solver()) keeps what it learned across calls;
+    `axioms` hold only for this VC and are pushed with it. A first query
+    disables every goal through the assumptions Not(lit): since the goals
+    are independent, its (minimized) unsat core is the set of goals that
+    cannot be enabled, so everything outside the core is proved at once.
+    Each goal in the core is then confirmed on its own, which also gives
+    its counterexample. Results are as for solve_goals(); goals proved by
+    the first query report its time. Solver statistics are recorded under
+    `key` when the run is measured.
+    """
+    s = vctx.shared_solver()
+    s.push()
+    try:
+        s.add(*axioms)
+        s.add(Not(vc))
+        off = [Not(g['lit']) for g in goals]
+        start = time.perf_counter()
+        result = s.check(*off)
+        seconds = time.perf_counter() - start
+        if vctx.stats is not None:
+            vctx.stats.add_solver(key, s)
+        if result != unsat:
+            # Only possible on a timeout, or if the VC can fail outside its goals
+            verdict, detail = ('failed', str(s.model())) if result == sat else ('unknown', s.reason_unknown())
+            return [{'kind': g['kind'], 'label': g['label'], 'verdict': verdict,
+                     'seconds': seconds, 'detail': detail} for g in goals]
+        core = {c.get_id() for c in s.unsat_core()}
+        results = []
+        for k, g in enumerate(goals):
+            verdict, detail, took = 'verified', None, seconds
+            if off[k].get_id() in core:
+                # Enable this goal alone
+                start = time.perf_counter()
+                check = s.check(g['lit'], *[lit for j, lit in enumerate(off) if j != k])
+                took = time.perf_counter() - start
+                if vctx.stats is not None:
+                    vctx.stats.add_solver(key, s)
+                if check == sat:
+                    verdict, detail = 'failed', str(s.model())
+                elif check == unknown:
+                    verdict, detail = 'unknown', s.reason_unknown()
+            results.append({'kind': g['kind'], 'label': g['label'],
+                            'verdict': verdict, 'seconds': took, 'detail': detail})
+        return results
+    finally:
+        s.pop()
+
+def print_goals(results, out):
+    """Prints one line per goal result."""
+    for r in results:
+        print(f"    [{r['kind']}] {r['label']}: {r['verdict'].upper()} ({r['seconds']:.2f}s)",
+              file=out)
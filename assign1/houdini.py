@@ -0,0 +1,214 @@
+from z3 import *
+from parser import pretty
+
+# At most this many constants are used in templates, smallest first
+MAX_CONSTS = 8
+
+def stmt_names(stmts):
+    """Variables read or written, and integer constants, in a list of statements."""
+    names, consts = set(), set()
+    todo = list(stmts)
+    while todo:
+        node = todo.pop()
+        if not isinstance(node, (list, tuple)) or not node:
+            continue
+        if not isinstance(node[0], str):
+            todo.extend(node)
+            continue
+        tag = node[0]
+        if tag == 'const':
+            if not isinstance(node[1], bool):
+                consts.add(node[1])
+            continue
+        if tag in ('var', 'old'):
+            names.add(node[1])
+        elif tag in ('assign', 'tastore'):
+            names.add(node[1])
+        elif tag == 'call' and node[3]:
+            names.add(node[3])
+        todo.extend(node[1:])
+    return names, consts
+
+class Houdini:
+    """Infers invariants for loops that have none (Houdini algorithm).
+
+    Candidates come from templates over the loop's variables and the
+    constants around it: v >= k, v <= k, v <= w, v >= w, and b / not b for
+    Booleans. A candidate must hold on entry (after the statements before
+    the loop) and be preserved by the body, assuming the candidates that
+    survive and the loop test; failed candidates are dropped until the set
+    is inductive.
+
+    Everything is checked on one incremental solver. Each candidate's
+    goal is guarded by a literal g; the query assumes Not(g) for all of
+    them, so its minimized unsat core is the set of candidates that fail
+    (the goals are independent for fixed hypotheses). One query per round
+    thus prunes every failing candidate at once. Obligations inside the
+    statements (asserts, call preconditions) are disabled: `vctx` must be
+    in split mode, so they carry goal literals too.
+    """
+
+    def __init__(self, vctx, wp, interner=None):
+        self.vctx = vctx
+        self.wp = wp
+        self.interner = interner
+        self.solver = Solver(ctx=vctx.ctx)
+        self.solver.set('core.minimize', True)
+        # (while node, inferred invariants) in program order
+        self.inferred = []
+
+    def node(self, tag, *args):
+        if self.interner is None:
+            return [tag, *args]
+        return self.interner.node(tag, *args)
+
+    def seq(self, items):
+        if self.interner is None:
+            return list(items)
+        return self.interner.tuple(items)
+
+    # --- Program traversal ---
+
+    def block(self, stmts, prefix, ret_var, old_suffix):
+        """Annotates the loops in `stmts`; `prefix` is what runs before them."""
+        out = []
+        for s in stmts:
+            s = self.stmt(s, prefix, ret_var, old_suffix)
+            out.append(s)
+            prefix = prefix + [s]
+        return out
+
+    def stmt(self, s, prefix, ret_var, old_suffix):
+        if s[0] == 'seq':
+            return self.node('seq', *self.block(s[1:], prefix, ret_var, old_suffix))
+        if s[0] == 'if':
+            then = self.block(s[2][1:], prefix + [self.node('assume', s[1])], ret_var, old_suffix)
+            orelse = self.block(s[3][1:], prefix + [self.node('assume', self.node('not', s[1]))],
+                                ret_var, old_suffix)
+            return self.node('if', s[1], self.node('seq', *then), self.node('seq', *orelse))
+        if s[0] == 'while':
+            # Inner loops first; the body starts from an arbitrary state
+            # in which the test holds
+            body = self.block(s[2], [self.node('assume', s[1])], ret_var, old_suffix)
+            invariants = list(s[3])
+            if not invariants:
+                invariants = self.infer(s[1], body, prefix, ret_var, old_suffix)
+                self.inferred.append((s, invariants))
+            return self.node('while', s[1], self.seq(body), self.seq(invariants))
+        return s
+
+    # --- Inference ---
+
+    def candidates(self, cond, body, prefix):
+        names, consts = stmt_names([cond, *body])
+        _, prefix_consts = stmt_names(prefix)
+        consts = sorted(consts | prefix_consts | {0, 1}, key=abs)[:MAX_CONSTS]
+        ints = sorted(n for n in names if self.vctx.sort_of(n) == 'int' and n != 'ret')
+        bools = sorted(n for n in names if self.vctx.sort_of(n) == 'bool')
+        found = []
+        for v in ints:
+            var = self.node('var', v)
+            for k in sorted(consts):
+                found.append(self.node('>=', var, self.node('const', k)))
+                found.append(self.node('<=', var, self.node('const', k)))
+            for w in ints:
+                if v < w:
+                    found.append(self.node('<=', var, self.node('var', w)))
+                    found.append(self.node('>=', var, self.node('var', w)))
+        for b in bools:
+            found.append(self.node('var', b))
+            found.append(self.node('not', self.node('var', b)))
+        return found
+
+    def failing(self, goals):
+        """Indices of the goals that fail, from one query; None if unknown."""
+        off = [Not(g) for g in goals]
+        if self.solver.check(*off) != unsat:
+            return None
+        core = {c.get_id() for c in self.solver.unsat_core()}
+        return {k for k, lit in enumerate(off) if lit.get_id() in core}
+
+    def guarded(self, stmts, goals, formulas, ret_var, old_suffix):
+        """wp of `stmts` for And(goal_k => formula_k), with the statements'
+        own obligations off.
+
+        The goal literals are not program variables, so no statement
+        touches them, and the result is And(goal_k => wp(stmts, formula_k)):
+        one wp pass yields every candidate's obligation, each under its
+        literal.
+        """
+        post = And(*[Implies(g, f) for g, f in zip(goals, formulas)], self.vctx.ctx)
+        result = self.wp(self.node('seq', *stmts), post, self.vctx, ret_var, old_suffix)
+        return result, [Not(g['lit']) for g in self.vctx.take_goals()]
+
+    def infer(self, cond, body, prefix, ret_var, old_suffix):
+        vctx, s = self.vctx, self.solver
+        cands = self.candidates(cond, body, prefix)
+        if not cands:
+            return []
+        formulas = [vctx.translate(c, old_suffix) for c in cands]
+
+        def lits(name):
+            return [vctx.bool_const(f"{name}_{vctx.next_fresh_id()}") for _ in cands]
+
+        # 1. Initiation: candidate holds after the prefix
+        goals = lits('init')
+        init, off = self.guarded(prefix, goals, formulas, ret_var, old_suffix)
+        s.push()
+        s.add(*off)
+        s.add(Not(init))
+        failed = self.failing(goals)
+        s.pop()
+        if failed is None:
+            return []
+        alive = [k for k in range(len(cands)) if k not in failed]
+
+        # 2. Consecution: surviving candidates and the test imply the
+        #    candidates after one iteration; iterate to a fixpoint
+        hyps, goals = lits('hyp'), lits('step')
+        preserved, off = self.guarded(body, goals, formulas, ret_var, old_suffix)
+        s.push()
+        s.add(*off)
+        s.add(And(*[Implies(h, f) for h, f in zip(hyps, formulas)], vctx.ctx))
+        s.add(vctx.translate(cond, old_suffix))
+        s.add(Not(preserved))
+        while alive:
+            s.push()
+            # Dropped candidates are neither assumed nor checked
+            for k in range(len(cands)):
+                s.add(hyps[k] if k in alive else And(Not(hyps[k]), Not(goals[k])))
+            failed = self.failing([goals[k] for k in alive])
+            s.pop()
+            if failed is None:
+                alive = []
+            elif not failed:
+                break
+            else:
+                alive = [k for i, k in enumerate(alive) if i not in failed]
+        s.pop()
+        return [cands[k] for k in alive]
+
+def infer_invariants(main, procs, vctx, wp, interner=None):
+    """Fills in invariants for the loops of main and every procedure that lack them.
+
+    `vctx` must be a split-mode VerificationContext for the program, and
+    `wp` the VC generator. Returns (main, procs, list of (loop,
+    invariants)), with new nodes built by `interner` if given.
+    """
+    houdini = Houdini(vctx, wp, interner)
+    new_procs = {}
+    for name, spec in procs.items():
+        if spec['body'] is None:
+            new_procs[name] = spec
+            continue
+        prefix = [houdini.node('assume', spec['requires'])]
+        body = houdini.block(spec['body'], prefix, 'ret', '_old')
+        new_procs[name] = {**spec, 'body': houdini.seq(body)}
+    main = houdini.stmt(main, [], None, '')
+    return main, new_procs, houdini.inferred
+
+def print_inferred(inferred, out):
+    """Prints the invariants found for each loop."""
+    for loop, invariants in inferred:
+        found = ' and '.join(pretty(inv) for inv in invariants) or 'nothing'
+        print(f"Inferred for 'while {pretty(loop[1])}': {found}", file=out)
@@ -0,0 +1,186 @@
+import contextlib
+import cProfile
+import io
+import pstats
+import threading
+import time
+
+# Z3 statistics that are peaks, not counts: kept as the maximum over checks
+PEAK_STATISTICS = ('memory', 'max memory')
+
+# Z3 statistics shown by print_report(), when present
+SHOWN_STATISTICS = ('conflicts', 'decisions', 'quant instantiations', 'max memory')
+
+def vc_metrics(formulas):
+    """Size of a set of Z3 formulas: {'nodes': distinct DAG nodes, 'quantifiers': ...}."""
+    # Only measured runs need Z3 here
+    from z3 import is_app, is_quantifier
+    seen = set()
+    quantifiers = 0
+    todo = list(formulas)
+    while todo:
+        e = todo.pop()
+        if e.get_id() in seen:
+            continue
+        seen.add(e.get_id())
+        if is_quantifier(e):
+            quantifiers += 1
+            todo.append(e.body())
+        elif is_app(e):
+            todo.extend(e.children())
+    return {'nodes': len(seen), 'quantifiers': quantifiers}
+
+class Stats:
+    """Instrumentation of one prover run.
+
+    Records the wall time of each phase (parse, sorts, slicing, ...), and
+    for every procedure (and 'main') the time spent generating and solving
+    its VC, the VC's size, and the Z3 statistics of its checks. wp() also
+    reports per statement kind: the number of statements and their self
+    time, i.e. excluding the statements nested in them. Procedures run on
+    several threads share one Stats, so the VC generation and solving
+    totals can exceed the wall time of the run.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.phases = {}
+        self.procs = {}
+        self.stmts = {}
+        self.substitutions = 0
+        # Per-thread stack of the time spent in nested statements
+        self.local = threading.local()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Times a phase of the run; repeated phases add up."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            with self.lock:
+                self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    @contextlib.contextmanager
+    def stmt(self, kind):
+        """Times one statement of VC generation, minus its sub-statements."""
+        stack = self.local.__dict__.setdefault('stack', [])
+        stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            nested = stack.pop()
+            if stack:
+                stack[-1] += seconds
+            with self.lock:
+                entry = self.stmts.setdefault(kind, {'count': 0, 'seconds': 0.0})
+                entry['count'] += 1
+                entry['seconds'] += seconds - nested
+
+    def proc(self, name):
+        """The record of procedure `name` ('main' for the main program)."""
+        with self.lock:
+            return self.procs.setdefault(name, {'vcgen': 0.0, 'solve': 0.0, 'nodes': 0,
+                                                'quantifiers': 0, 'checks': 0, 'z3': {}})
+
+    @contextlib.contextmanager
+    def timed(self, name, key):
+        """Times part of the work on procedure `name`: 'vcgen' or 'solve'."""
+        record = self.proc(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            with self.lock:
+                record[key] += seconds
+
+    def count_substitution(self):
+        with self.lock:
+            self.substitutions += 1
+
+    def add_vc(self, name, formulas):
+        """Records the size of the formulas checked for procedure `name`."""
+        metrics = vc_metrics(formulas)
+        record = self.proc(name)
+        with self.lock:
+            record['nodes'] += metrics['nodes']
+            record['quantifiers'] += metrics['quantifiers']
+
+    def add_solver(self, name, solver):
+        """Adds the statistics of `solver`'s last check to procedure `name`."""
+        statistics = solver.statistics()
+        values = {k: statistics.get_key_value(k) for k in statistics.keys()}
+        record = self.proc(name)
+        with self.lock:
+            record['checks'] += 1
+            z3_stats = record['z3']
+            for k, v in values.items():
+                if k in PEAK_STATISTICS:
+                    z3_stats[k] = max(z3_stats.get(k, 0), v)
+                else:
+                    z3_stats[k] = z3_stats.get(k, 0) + v
+
+    def report(self):
+        """The recorded data as a dict of plain values (JSON-ready)."""
+        with self.lock:
+            procs = {name: {**r, 'z3': dict(r['z3'])} for name, r in self.procs.items()}
+            return {
+                'phases': dict(self.phases),
+                'vcgen': sum(r['vcgen'] for r in procs.values()),
+                'solve': sum(r['solve'] for r in procs.values()),
+                'substitutions': self.substitutions,
+                'procedures': procs,
+                'statements': {k: dict(v) for k, v in self.stmts.items()},
+            }
+
+def timed(stats, name, key):
+    """stats.timed(name, key), or nothing when the run is not measured."""
+    if stats is None:
+        return contextlib.nullcontext()
+    return stats.timed(name, key)
+
+def print_report(report, out):
+    """Prints a report made by Stats.report()."""
+    print("\n--- Statistics ---", file=out)
+    for name, seconds in report['phases'].items():
+        print(f"  {name:12} {seconds:9.3f}s", file=out)
+    print(f"  {'vcgen':12} {report['vcgen']:9.3f}s   ({report['substitutions']} substitutions)",
+          file=out)
+    print(f"  {'solve':12} {report['solve']:9.3f}s", file=out)
+
+    print(f"\n  {'procedure':20} {'vcgen':>9} {'solve':>9} {'nodes':>8} {'quants':>6}", file=out)
+    for name, r in report['procedures'].items():
+        print(f"  {name:20} {r['vcgen']:8.3f}s {r['solve']:8.3f}s {r['nodes']:8} {r['quantifiers']:6}",
+              file=out)
+        shown = [f"{k}={r['z3'][k]}" for k in SHOWN_STATISTICS if k in r['z3']]
+        if shown:
+            print(f"  {'':20} z3: {', '.join(shown)}", file=out)
+
+    if report['statements']:
+        print(f"\n  {'statement':20} {'count':>8} {'self time':>10}", file=out)
+        for kind, r in sorted(report['statements'].items(), key=lambda kv: -kv[1]['seconds']):
+            print(f"  {kind:20} {r['count']:8} {r['seconds']:9.3f}s", file=out)
+
+@contextlib.contextmanager
+def profiled(path=None, out=None, limit=25):
+    """Runs the body under cProfile.
+
+    The profile is written to `path` (for pstats or snakeviz), or else
+    the `limit` most expensive functions are printed to `out`.
+    """
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield profile
+    finally:
+        profile.disable()
+        if path:
+            profile.dump_stats(path)
+        else:
+            text = io.StringIO()
+            pstats.Stats(profile, stream=text).sort_stats('cumulative').print_stats(limit)
+            print(text.getvalue(), file=out)
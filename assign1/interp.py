@@ -0,0 +1,480 @@
+import itertools
+
+try:
+    import numpy as np
+except ImportError:
+    # Only the refutation pre-pass needs NumPy; see refute_proc
+    np = None
+
+from parser import pretty
+from scheduler import find_callees
+from modules import find_vars
+from sorts import ARRAY, BOOL
+
+# Inputs are drawn from [-RANGE, RANGE]: small values hit the boundary cases
+RANGE = 8
+
+# Lanes still looping after this many iterations are given up
+MAX_ITERATIONS = 1000
+
+def _mix(x):
+    """SplitMix64 finalizer: scrambles a uint64 vector."""
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+def _small(h):
+    """A hash vector turned into values in [-RANGE, RANGE]."""
+    return (h % np.uint64(2 * RANGE + 1)).astype(np.int64) - RANGE
+
+class Refuted(Exception):
+    """Raised when some lanes break an obligation."""
+
+    def __init__(self, kind, label, lanes):
+        super().__init__(f"{kind}: {label}")
+        self.kind = kind
+        self.label = label
+        self.lanes = lanes
+
+# --- Arrays ---
+#
+# An array is a tree of writes over a random base, as in Z3's theory:
+# a Base has a pseudo-random value at every index of every lane, Store
+# writes one index (in the lanes of its mask), Merge picks between two
+# arrays per lane (an assignment under a branch). Nothing is copied.
+
+class Base:
+    def __init__(self, seed):
+        self.seed = seed
+        # Index vectors read, to show the contents in a counterexample
+        self.reads = []
+
+    def select(self, interp, idx):
+        self.reads.append(idx)
+        return self.cells(interp.lane_keys, idx)
+
+    def cells(self, lane_keys, idx):
+        return _small(_mix(idx.astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+                           ^ lane_keys ^ np.uint64(self.seed)))
+
+    def bases(self, n):
+        return np.full(n, self.seed, dtype=np.int64)
+
+    def writes(self):
+        return []
+
+class Store:
+    def __init__(self, parent, idx, val, mask):
+        self.parent = parent
+        self.idx = idx
+        self.val = val
+        self.mask = mask
+
+    def select(self, interp, idx):
+        return np.where(self.mask & (self.idx == idx), self.val, self.parent.select(interp, idx))
+
+    def bases(self, n):
+        return self.parent.bases(n)
+
+    def writes(self):
+        return self.parent.writes() + [self.idx]
+
+class Merge:
+    def __init__(self, mask, then, orelse):
+        self.mask = mask
+        self.then = then
+        self.orelse = orelse
+
+    def select(self, interp, idx):
+        return np.where(self.mask, self.then.select(interp, idx), self.orelse.select(interp, idx))
+
+    def bases(self, n):
+        return np.where(self.mask, self.then.bases(n), self.orelse.bases(n))
+
+    def writes(self):
+        return self.then.writes() + self.orelse.writes()
+
+ARRAY_TYPES = (Base, Store, Merge)
+
+class Env:
+    """Where an expression is evaluated: the current state, the state old()
+    refers to, and names bound over the state (a callee's parameters).
+    'ret' stands for the variable `ret`, which is the LHS of a call."""
+
+    def __init__(self, state, old, bind=None, ret='ret'):
+        self.state = state
+        self.old = old
+        self.bind = bind or {}
+        self.ret = ret
+
+    def get(self, name):
+        if name in self.bind:
+            return self.bind[name]
+        return self.state[self.ret if name == 'ret' else name]
+
+class Interpreter:
+    """Runs While-Py code on a batch of inputs at once.
+
+    Every variable holds a NumPy vector with one entry per input (lane),
+    so a statement costs a few vector operations whatever the batch size.
+    Branches run under a mask of the lanes that take them; loops iterate
+    until no lane wants another round. Lanes that can tell nothing (an
+    assume failed, division by zero, overflow, a loop that does not end)
+    are dropped.
+
+    Code runs concretely, which is not always what the VC says. Calls
+    are replaced by their contracts (the requires is checked, the
+    modified variables get values that satisfy the ensures), and
+    functions used in expressions are arbitrary (but fixed) per lane, as
+    in the VC. Loops, however, really iterate, and their invariants are
+    checked each time the head is reached, while wp checks what follows
+    a loop against its entry state. A broken obligation is thus a real
+    execution that breaks the annotations, but the solver can still
+    verify the program, e.g. when an invariant is not preserved by the
+    body.
+    """
+
+    def __init__(self, procs, sorts, samples, seed=0):
+        self.procs = procs
+        self.sorts = sorts
+        self.n = samples
+        self.rng = np.random.default_rng(seed)
+        self.alive = np.ones(samples, dtype=bool)
+        self.lane_keys = _mix(np.arange(samples, dtype=np.uint64) + np.uint64(seed << 32))
+        self.seeds = itertools.count(1)
+        self.inputs = {}
+        # (procedure, {variable: value}, lanes) of every call, for counterexamples
+        self.calls = []
+
+    # --- Values ---
+
+    def fresh(self, name):
+        """A random value of the sort of variable `name`."""
+        sort = self.sorts.get(name)
+        if sort == ARRAY:
+            return Base(next(self.seeds))
+        if sort == BOOL:
+            return self.rng.integers(0, 2, size=self.n).astype(bool)
+        return self.rng.integers(-RANGE, RANGE + 1, size=self.n, dtype=np.int64)
+
+    def merge(self, mask, new, old):
+        if isinstance(old, ARRAY_TYPES):
+            return Merge(mask, new, old)
+        return np.where(mask, new, old)
+
+    def kill(self, lanes):
+        self.alive &= ~lanes
+
+    def function(self, name, args):
+        """The value of function `name` (a call_expr) at `args`: arbitrary
+        per lane, but the same for the same arguments."""
+        h = self.lane_keys ^ np.uint64(sum(map(ord, name)) * 0x9E3779B9)
+        for a in args:
+            h = _mix(h ^ a.astype(np.uint64))
+        return _small(_mix(h))
+
+    def equal(self, x, y):
+        """Array equality: the same base, and the same value at every index written."""
+        same = x.bases(self.n) == y.bases(self.n)
+        for idx in x.writes() + y.writes():
+            same &= x.select(self, idx) == y.select(self, idx)
+        return same
+
+    # --- Expressions ---
+
+    def expr(self, e, env, mask):
+        """The value of expression `e`; only the lanes in `mask` matter."""
+        tag = e[0]
+        if tag == 'const':
+            return np.full(self.n, e[1], dtype=bool if isinstance(e[1], bool) else np.int64)
+        elif tag == 'var':
+            return env.get(e[1])
+        elif tag == 'old':
+            return env.old[e[1]]
+        elif tag == 'select':
+            base = env.get(e[1][1]) if e[1][0] == 'var' else env.old[e[1][1]]
+            return base.select(self, self.expr(e[2], env, mask))
+        elif tag == 'and':
+            # The right operand only matters where the left one holds
+            left = self.expr(e[1], env, mask)
+            return left & self.expr(e[2], env, mask & left)
+        elif tag == 'or':
+            left = self.expr(e[1], env, mask)
+            return left | self.expr(e[2], env, mask & ~left)
+        elif tag == 'not':
+            return ~self.expr(e[1], env, mask)
+        elif tag in ('<', '<=', '>', '>=', '==', '!='):
+            left = self.expr(e[1], env, mask)
+            right = self.expr(e[2], env, mask)
+            if isinstance(left, ARRAY_TYPES):
+                same = self.equal(left, right)
+                return same if tag == '==' else ~same
+            if tag == '<': return left < right
+            if tag == '<=': return left <= right
+            if tag == '>': return left > right
+            if tag == '>=': return left >= right
+            if tag == '==': return left == right
+            if tag == '!=': return left != right
+        elif tag in ('+', '-', '*', '/'):
+            left = self.expr(e[1], env, mask)
+            if len(e) == 2:
+                return self.arith('-', np.zeros(self.n, dtype=np.int64), left, mask)
+            return self.arith(tag, left, self.expr(e[2], env, mask), mask)
+        elif tag == 'call_expr':
+            return self.function(e[1], [self.expr(a, env, mask) for a in e[2]])
+        raise NotImplementedError(f"interp: {e}")
+
+    def arith(self, op, a, b, mask):
+        """a op b on int64 vectors; lanes that overflow are dropped."""
+        with np.errstate(over='ignore'):
+            if op == '+':
+                r = a + b
+                over = ((a ^ r) & (b ^ r)) < 0
+            elif op == '-':
+                r = a - b
+                over = ((a ^ b) & (a ^ r)) < 0
+            elif op == '*':
+                r = a * b
+                safe_b = np.where(b == 0, 1, b)
+                over = (b != 0) & ((r // safe_b != a) | ((a == -1) & (b == np.iinfo(np.int64).min)))
+            else:
+                # Z3's integer division: the remainder is never negative.
+                # x / 0 is unspecified, so those lanes say nothing.
+                over = b == 0
+                safe_b = np.where(over, 1, b)
+                r = np.floor_divide(a, np.abs(safe_b)) * np.sign(safe_b)
+        self.kill(mask & over)
+        return r
+
+    # --- Statements ---
+
+    def block(self, stmts, env, mask):
+        for s in stmts:
+            self.stmt(s, env, mask)
+
+    def stmt(self, s, env, mask):
+        tag = s[0]
+        if tag == 'seq':
+            self.block(s[1:], env, mask)
+        elif tag == 'assign':
+            env.state[s[1]] = self.merge(mask, self.expr(s[2], env, mask), env.state[s[1]])
+        elif tag == 'return':
+            # As in wp: sets ret, and the statements after it still run
+            env.state['ret'] = self.merge(mask, self.expr(s[1], env, mask), env.state['ret'])
+        elif tag == 'tastore':
+            idx = self.expr(s[2], env, mask)
+            val = self.expr(s[3], env, mask)
+            env.state[s[1]] = Store(env.state[s[1]], idx, val, mask)
+        elif tag == 'assume':
+            self.kill(mask & ~self.expr(s[1], env, mask))
+        elif tag == 'assert':
+            self.check(s[1], env, mask, 'assertion', pretty(s[1]))
+        elif tag == 'if':
+            test = self.expr(s[1], env, mask)
+            self.stmt(s[2], env, mask & test)
+            self.stmt(s[3], env, mask & ~test)
+        elif tag == 'while':
+            self.loop(s, env, mask)
+        elif tag == 'call':
+            self.call(s, env, mask)
+        elif tag in ('skip', 'invariant', 'proc'):
+            pass
+        else:
+            raise NotImplementedError(f"interp: {s}")
+
+    def check(self, e, env, mask, kind, label):
+        """Raises Refuted if `e` is false in a live lane of `mask`."""
+        bad = mask & self.alive & ~self.expr(e, env, mask)
+        if bad.any():
+            raise Refuted(kind, label, bad)
+
+    def loop(self, s, env, mask):
+        cond, body, invariants = s[1], s[2], s[3]
+        label = ' and '.join(pretty(inv) for inv in invariants)
+        for _ in range(MAX_ITERATIONS):
+            for inv in invariants:
+                self.check(inv, env, mask, 'loop invariant', label)
+            mask = mask & self.alive & self.expr(cond, env, mask)
+            if not mask.any():
+                return
+            self.block(body, env, mask)
+        self.kill(mask)
+
+    def call(self, s, env, mask):
+        """x = f(args) by f's contract: check the requires, then give the
+        modified variables and x values that satisfy the ensures."""
+        fname, actuals, lhs = s[1], s[2], s[3]
+        spec = self.procs.get(fname)
+        if spec is None:
+            raise Exception(f"Attempted to call undefined procedure '{fname}'")
+        args = dict(zip(spec['params'], [self.expr(a, env, mask) for a in actuals]))
+        pre = dict(env.state)
+        self.check(spec['requires'], Env(pre, pre, args), mask, 'call precondition',
+                   f"{fname}: {pretty(spec['requires'])}")
+
+        target = lhs or 'ret'
+        havocked = sorted(set(spec['modifies']) | {target})
+        chosen = {v: env.state[v] for v in havocked}
+        found = ~mask
+        for frame, guesses in self.rounds(spec['ensures'], havocked, target):
+            post = dict(pre)
+            for v in havocked:
+                post[v] = pre[v] if frame and isinstance(pre[v], ARRAY_TYPES) else self.fresh(v)
+            post_env = Env(post, pre, args, target)
+            for v, idx, value in guesses:
+                if idx is None:
+                    post[v] = self.expr(value, post_env, mask)
+                else:
+                    post[v] = Store(post[v], self.expr(idx, post_env, mask),
+                                    self.expr(value, post_env, mask), mask)
+            ok = ~found & self.expr(spec['ensures'], post_env, mask & ~found)
+            for v in havocked:
+                chosen[v] = self.merge(ok, post[v], chosen[v])
+            found |= ok
+            if found.all():
+                break
+        # Lanes where no guess satisfied the ensures are given up
+        self.kill(~found)
+        for v in havocked:
+            env.state[v] = self.merge(mask, chosen[v], env.state[v])
+        self.calls.append((fname, {v: chosen[v] for v in havocked}, mask))
+
+    def rounds(self, ensures, havocked, target):
+        """Guesses for the variables a call modifies: (keep arrays as they
+        were, [(variable, index or None, expression)]) per round.
+
+        Random values rarely satisfy an equality such as ret == x + 1, so
+        the equalities of the ensures that define a modified variable (or
+        an element of a modified array) are tried as assignments: all at
+        once, then each on its own, then plain random values.
+        """
+        guesses = []
+        todo = [ensures]
+        while todo:
+            e = todo.pop()
+            if e[0] in ('and', 'or', 'not'):
+                todo.extend(e[1:])
+            elif e[0] == '==':
+                for lhs, rhs in ((e[1], e[2]), (e[2], e[1])):
+                    if lhs[0] == 'var':
+                        name = target if lhs[1] == 'ret' else lhs[1]
+                        if name in havocked:
+                            guesses.append((name, None, rhs))
+                    elif lhs[0] == 'select' and lhs[1][0] == 'var' and lhs[1][1] in havocked:
+                        guesses.append((lhs[1][1], lhs[2], rhs))
+        guesses.reverse()
+        yield True, guesses
+        yield False, guesses
+        for g in guesses:
+            yield True, [g]
+        yield True, []
+        yield False, []
+
+    # --- Entry points ---
+
+    def start(self, names, shown):
+        """A fresh state with a random value for every variable in `names`.
+        Counterexamples show the initial values of those in `shown`."""
+        state = {name: self.fresh(name) for name in sorted(names)}
+        self.inputs = {name: state[name] for name in sorted(shown) if name in state}
+        return Env(dict(state), dict(state))
+
+    def describe(self, refuted, env):
+        """A counterexample from the first lane that broke an obligation:
+        the inputs, what the calls on the way returned, and for a
+        postcondition the value returned."""
+        lane = int(np.argmax(refuted.lanes))
+        text = f"{refuted.kind} {refuted.label} fails"
+        if self.inputs:
+            text += " on input " + ', '.join(f"{name} = {self.show(value, lane)}"
+                                        for name, value in self.inputs.items())
+        for fname, result, lanes in self.calls:
+            if lanes[lane]:
+                shown = ', '.join(f"{v} = {self.show(value, lane)}" for v, value in result.items())
+                text += f"; after {fname}: {shown}"
+        if refuted.kind == 'postcondition':
+            text += f"; returning ret = {self.show(env.state['ret'], lane)}"
+        return text
+
+    def show(self, value, lane):
+        if isinstance(value, Base):
+            # The elements the run looked at
+            idx = np.array(sorted({int(i[lane]) for i in value.reads}), dtype=np.int64)
+            cells = value.cells(self.lane_keys[lane], idx)
+            return '{' + ', '.join(f"{i}: {v}" for i, v in zip(idx.tolist(), cells.tolist())) + '}'
+        if isinstance(value, ARRAY_TYPES):
+            return '<array>'
+        return str(value[lane].item())
+
+def _check_numpy():
+    if np is None:
+        raise Exception("Testing before solving (the 'refute' option) needs NumPy")
+
+def refute_proc(name, spec, procs, sorts, samples, seed=0):
+    """Runs procedure `name` on `samples` random inputs that satisfy its
+    requires, looking for a broken assertion, invariant, call
+    precondition or ensures. Returns a counterexample as text, or None.
+
+    Procedures whose contract uses the procedure itself are skipped: the
+    VC defines that function by the contract (see prover.proc_vc), which
+    an arbitrary function would not satisfy.
+    """
+    _check_numpy()
+    if name in find_callees(spec['requires']) | find_callees(spec['ensures']):
+        return None
+    interp = Interpreter(procs, sorts, samples, seed)
+    # ret is an output; its initial value says nothing
+    env = interp.start(set(sorts) | set(spec['params']) | {'ret'},
+                       (set(spec['params']) | find_vars(spec['body'])
+                        | find_vars(spec['requires']) | find_vars(spec['ensures'])) - {'ret'})
+    mask = np.ones(samples, dtype=bool)
+    try:
+        interp.stmt(('assume', spec['requires']), env, mask)
+        interp.block(spec['body'], env, mask)
+        interp.check(spec['ensures'], env, mask, 'postcondition', pretty(spec['ensures']))
+    except Refuted as e:
+        return interp.describe(e, env)
+    return None
+
+def refute_main(main, procs, sorts, samples, seed=0):
+    """Like refute_proc, for the main program."""
+    _check_numpy()
+    interp = Interpreter(procs, sorts, samples, seed)
+    env = interp.start(set(sorts) | {'ret'}, find_vars(main))
+    try:
+        interp.stmt(main, env, np.ones(samples, dtype=bool))
+    except Refuted as e:
+        return interp.describe(e, env)
+    return None
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    from parser import parse
+    from sorts import infer_sorts
+
+    argp = argparse.ArgumentParser(
+        description="Runs every procedure and the main program of a While-Py file on "
+                    "random inputs, without Z3, and prints the counterexamples found.")
+    argp.add_argument('path')
+    argp.add_argument('-n', '--samples', type=int, default=256,
+                      help="inputs tried at once (default: 256)")
+    argp.add_argument('--seed', type=int, default=0)
+    args = argp.parse_args()
+
+    with open(args.path) as f:
+        parsed = parse(f.read(), None, args.path)
+    if parsed['imports']:
+        sys.exit("Imports are not supported here; use prover.py --refute")
+    procs, main = parsed['procs'], parsed['main']
+    sorts = infer_sorts(procs, main, parsed['vars'] | ({'ret'} if procs else set()))
+
+    failed = False
+    for name, detail in [(name, refute_proc(name, spec, procs, sorts, args.samples, args.seed))
+                         for name, spec in procs.items()] + \
+                        [('main', refute_main(main, procs, sorts, args.samples, args.seed))]:
+        print(f"{name}: {'FAILED' if detail else 'no counterexample found'}")
+        if detail:
+            print(f"  {detail}")
+            failed = True
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,67 @@
+class Interner:
+    """Hash-conses While-Py AST nodes into shared, immutable tuples.
+
+    A node keeps the shape of the list format, e.g. ('+', ('var', 'x'),
+    ('const', 1)), so every pass that indexes nodes works unchanged. Nodes
+    are built bottom-up and looked up by their children's identities, so
+    structurally equal subtrees are the same object: `a == b` implies
+    `a is b`, and a node can be used as a dict key (or by id()) to memoize
+    work on it. Lists of statements or arguments become plain tuples of
+    nodes, interned the same way.
+
+    The table keeps every node alive; drop the Interner once parsing is
+    done if only the (already shared) nodes are needed.
+    """
+
+    def __init__(self):
+        self.table = {}
+
+    def _intern(self, key, value):
+        node = self.table.get(key)
+        if node is None:
+            node = self.table[key] = value
+        return node
+
+    def node(self, tag, *args):
+        """Interned node `(tag, *args)`; tuple arguments must already be interned."""
+        if tag == 'const':
+            # True == 1, so the type must be part of the key
+            key = (tag, type(args[0]), args[0])
+        else:
+            key = (tag,) + tuple(id(a) if isinstance(a, tuple) else a for a in args)
+        return self._intern(key, (tag,) + args)
+
+    def tuple(self, items):
+        """Interned tuple of already interned nodes (or plain strings)."""
+        items = tuple(items)
+        key = ('#tuple',) + tuple(id(a) if isinstance(a, tuple) else a for a in items)
+        return self._intern(key, items)
+
+    def convert(self, ast):
+        """Converts a node in the nested-list format to an interned node."""
+        if not isinstance(ast, (list, tuple)):
+            return ast
+        if ast and isinstance(ast[0], str):
+            tag = ast[0]
+            if tag == 'proc':
+                _, name, params, body, requires, ensures, modifies = ast
+                return self.node(tag, name, self.tuple(params), self.convert(body),
+                                 self.convert(requires), self.convert(ensures),
+                                 self.tuple(modifies))
+            return self.node(tag, *[self.convert(a) for a in ast[1:]])
+        # Untagged: a list of statements or arguments
+        return self.tuple(self.convert(a) for a in ast)
+
+    def convert_program(self, parsed):
+        """Converts the output of WhilePyVisitor to interned form."""
+        procs = {}
+        for name, spec in parsed['procs'].items():
+            procs[name] = {
+                'params': self.tuple(spec['params']),
+                'body': self.convert(spec['body']),
+                'requires': self.convert(spec['requires']),
+                'ensures': self.convert(spec['ensures']),
+                'modifies': self.tuple(spec['modifies']),
+            }
+        return {'main': self.convert(parsed['main']), 'procs': procs,
+                'vars': set(parsed['vars']), 'imports': list(parsed.get('imports', ()))}
@@ -0,0 +1,190 @@
+import hashlib
+import json
+import os
+import tempfile
+
+from parser import parse
+from scheduler import find_callees
+from sorts import infer_sorts, INT
+from cache import contract
+
+# Bump whenever the summary layout, or what a verdict depends on, changes
+SUMMARY_VERSION = 1
+
+# Summaries are kept next to their module, like Python's __pycache__
+SUMMARY_DIR = '__summaries__'
+
+def module_path(module, importer):
+    """The file of `from module import ...` in the file `importer`."""
+    directory = os.path.dirname(importer)
+    return os.path.join(directory, *module.split('.')) + '.py'
+
+def summary_path(path):
+    directory, name = os.path.split(path)
+    return os.path.join(directory, SUMMARY_DIR, os.path.splitext(name)[0] + '.json')
+
+def closure(names, procs):
+    """`names` plus every procedure their contracts call, transitively."""
+    todo = list(names)
+    found = set()
+    while todo:
+        name = todo.pop()
+        if name in found:
+            continue
+        found.add(name)
+        spec = procs[name]
+        todo.extend(find_callees(spec['requires']) | find_callees(spec['ensures']))
+    return found
+
+class ModuleLoader:
+    """Resolves the imports of While-Py programs to verified contracts.
+
+    Every imported module is verified once, with `verify(path)` (which
+    returns True iff it verified), and then described by a summary: the
+    contracts of its procedures, the sorts of the variables they mention
+    and a fingerprint of both. Importers use only the summary, so the
+    module's bodies are neither parsed nor verified again until its
+    source changes. A summary is also stale when a module it imports has
+    a new fingerprint; editing a body alone keeps the fingerprint, so the
+    importers of an edited module are not re-verified.
+    """
+
+    def __init__(self, verify, out=None):
+        self.verify = verify
+        self.out = out
+        # Path -> summary, for the modules loaded by this loader
+        self.summaries = {}
+        # Paths being loaded, to report cyclic imports
+        self.loading = []
+
+    def resolve(self, imports, importer, interner=None):
+        """The contracts named by `imports` (see parser.WhilePyVisitor.imports).
+
+        Returns (procs, sorts): the imported procedures, with a body of
+        None, and the sorts of the variables their contracts mention.
+        With an ir.Interner the contracts are built from its nodes.
+        Raises an Exception if a module does not verify, or a name is
+        missing or imported from two modules.
+        """
+        procs = {}
+        sorts = {}
+        for module, names in imports:
+            path = module_path(module, importer)
+            summary = self.load(path)
+            exported = summary['procs']
+            if '*' in names:
+                names = summary['defined']
+            for name in names:
+                if name not in exported:
+                    raise Exception(f"{importer}: {module} has no procedure '{name}'")
+            for name in closure(names, exported):
+                spec = {**exported[name], 'body': None}
+                if procs.get(name, spec) != spec:
+                    raise Exception(f"{importer}: two different procedures named '{name}' imported")
+                procs[name] = spec
+            sorts.update(summary['sorts'])
+        if interner is not None:
+            procs = {name: {'params': interner.tuple(spec['params']), 'body': None,
+                            'requires': interner.convert(spec['requires']),
+                            'ensures': interner.convert(spec['ensures']),
+                            'modifies': interner.tuple(spec['modifies'])}
+                     for name, spec in procs.items()}
+        return procs, sorts
+
+    def load(self, path):
+        """The summary of module `path`, verifying the module if it has none that is current."""
+        path = os.path.normpath(path)
+        if path in self.summaries:
+            return self.summaries[path]
+        if path in self.loading:
+            cycle = ' -> '.join(self.loading[self.loading.index(path):] + [path])
+            raise Exception(f"Cyclic import: {cycle}")
+        self.loading.append(path)
+        try:
+            with open(path) as f:
+                source = f.read()
+            digest = hashlib.sha256(source.encode()).hexdigest()
+            summary = self.read(path)
+            if not self.current(summary, path, digest):
+                summary = self.build(path, source, digest)
+        finally:
+            self.loading.pop()
+        self.summaries[path] = summary
+        return summary
+
+    def read(self, path):
+        try:
+            with open(summary_path(path)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def current(self, summary, path, digest):
+        """True iff `summary` describes source `digest` of `path` and the modules it imports now."""
+        if summary is None or summary.get('version') != SUMMARY_VERSION:
+            return False
+        if summary['source'] != digest:
+            return False
+        return all(self.load(module_path(module, path))['fingerprint'] == fingerprint
+                   for module, fingerprint in summary['imports'].items())
+
+    def build(self, path, source, digest):
+        """Verifies module `path` and writes its summary."""
+        # Plain lists, which is what the summary stores as JSON
+        parsed = parse(source, None, path)
+        imported, fixed = self.resolve(parsed['imports'], path)
+        procs = {**imported, **parsed['procs']}
+        sorts = infer_sorts(procs, parsed['main'], parsed['vars'] | {'ret'}, fixed)
+
+        if self.out is not None:
+            print(f"--- Verifying imported module {path} ---", file=self.out)
+        if not self.verify(path):
+            raise Exception(f"Imported module {path} does not verify")
+
+        exported = {name: contract(procs[name]) for name in closure(parsed['procs'], procs)}
+        names = set().union(*map(contract_vars, exported.values()))
+        summary = {
+            'version': SUMMARY_VERSION,
+            'source': digest,
+            'defined': sorted(parsed['procs']),
+            'procs': exported,
+            # Int is the default sort, so only the others are kept
+            'sorts': {v: sorts[v] for v in sorted(names) if sorts.get(v, INT) != INT},
+            # By module name, since paths depend on the working directory
+            'imports': {module: self.load(module_path(module, path))['fingerprint']
+                        for module, _ in parsed['imports']},
+        }
+        text = json.dumps([summary['procs'], summary['sorts']], sort_keys=True)
+        summary['fingerprint'] = hashlib.sha256(text.encode()).hexdigest()
+        # Summaries are JSON, so compare against what a reader will see
+        summary = json.loads(json.dumps(summary))
+        self.write(path, summary)
+        return summary
+
+    def write(self, path, summary):
+        target = summary_path(path)
+        directory = os.path.dirname(target)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(summary, f, indent=1)
+        os.replace(tmp, target)
+
+def contract_vars(spec):
+    """Names of the variables a procedure's contract mentions."""
+    return (set(spec['params']) | set(spec['modifies'])
+            | find_vars(spec['requires']) | find_vars(spec['ensures']))
+
+def find_vars(node):
+    """Names of the variables read anywhere in an AST node, including old(v)."""
+    found = set()
+    if isinstance(node, (list, tuple)) and node and isinstance(node[0], str):
+        if node[0] in ('var', 'old'):
+            found.add(node[1])
+        else:
+            for sub in node[1:]:
+                found |= find_vars(sub)
+    elif isinstance(node, (list, tuple)):
+        for sub in node:
+            found |= find_vars(sub)
+    return found
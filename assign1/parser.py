@@ -3,23 +3,57 @@ import pprint
 import sys
 
 class WhilePyVisitor(ast.NodeVisitor):
-    def __init__(self):
+    def __init__(self, interner=None):
         self.vars = set()
         self.procs = {}
+        # (module, names) of every `from module import names`
+        self.imports = []
+        # With an ir.Interner, nodes are built as shared, hash-consed tuples
+        # instead of fresh lists
+        self.interner = interner
+
+    def node(self, tag, *args):
+        """Builds an AST node: a list, or an interned tuple."""
+        if self.interner is None:
+            return [tag, *args]
+        return self.interner.node(tag, *args)
+
+    def seq(self, items):
+        """Builds a list of statements or arguments."""
+        if self.interner is None:
+            return list(items)
+        return self.interner.tuple(items)
 
     def visit_Module(self, node):
-        # First pass to register all procedure definitions
+        # First pass to register all procedure definitions and imports
         for stmt in node.body:
             if isinstance(stmt, ast.FunctionDef):
                 self.visit_FunctionDef(stmt)
+            elif isinstance(stmt, ast.ImportFrom):
+                self.visit_ImportFrom(stmt)
         
         # Second pass to build the main program body
         main_body = []
         for stmt in node.body:
-            if not isinstance(stmt, ast.FunctionDef):
+            if not isinstance(stmt, (ast.FunctionDef, ast.ImportFrom)):
                 main_body.append(self.visit(stmt))
                 
-        return {'main': ['seq'] + main_body, 'procs': self.procs, 'vars': self.vars}
+        return {'main': self.node('seq', *main_body), 'procs': self.procs, 'vars': self.vars,
+                'imports': self.imports}
+
+    def visit_ImportFrom(self, node):
+        # `from lib import inc, swap` (or `import *`) brings in the
+        # contracts of lib.py's procedures; see modules.py
+        if node.level or node.module is None:
+            raise NotImplementedError(f"Relative imports are not supported: {ast.dump(node)}")
+        for alias in node.names:
+            if alias.asname is not None:
+                raise NotImplementedError(f"Imported procedures cannot be renamed: {alias.name}")
+        self.imports.append((node.module, tuple(alias.name for alias in node.names)))
+
+    def visit_Import(self, node):
+        # Calls are by bare name, so `lib.inc(x)` could not be used
+        raise NotImplementedError(f"Use 'from module import name' instead: {ast.dump(node)}")
     
     def visit_BoolOp(self, node):
         assert isinstance(node.op, (ast.And, ast.Or))
@@ -30,7 +64,7 @@ class WhilePyVisitor(ast.NodeVisitor):
         
         current = visited_values[-1]
         for val in reversed(visited_values[:-1]):
-            current = [op_str, val, current]
+            current = self.node(op_str, val, current)
         return current
 
     def visit_Expr(self, node):
@@ -41,7 +75,7 @@ class WhilePyVisitor(ast.NodeVisitor):
                 func_id = call.func.id
                 if func_id not in ('assume', 'assert', 'invariant', 'requires', 'ensures', 'modifies'):
                     args = [self.visit(a) for a in call.args]
-                    return ['call', func_id, args, None] # No LHS
+                    return self.node('call', func_id, self.seq(args), None) # No LHS
         return self.visit(node.value)
     
     def visit_Call(self, node):
@@ -49,42 +83,42 @@ class WhilePyVisitor(ast.NodeVisitor):
             func_id = node.func.id
             if func_id == 'assume':
                 assert len(node.args) == 1
-                return ['assume', self.visit(node.args[0])]
+                return self.node('assume', self.visit(node.args[0]))
             elif func_id == 'assert':
                 assert len(node.args) == 1
-                return ['assert', self.visit(node.args[0])]
+                return self.node('assert', self.visit(node.args[0]))
             elif func_id == 'invariant':
                 assert len(node.args) == 1
-                return ['invariant', self.visit(node.args[0])]
+                return self.node('invariant', self.visit(node.args[0]))
             elif func_id == 'old':
                  assert len(node.args) == 1
                  # We extract the variable name, e.g., ['var', 'x'] -> 'x'
-                 return ['old', self.visit(node.args[0])[1]]
+                 return self.node('old', self.visit(node.args[0])[1])
             
             # This is a regular function call used as an expression
             # e.g., sum_array(n-1) inside an 'ensures' clause
             else:
                 args = [self.visit(a) for a in node.args]
                 # We create a new AST node type: 'call_expr'
-                return ['call_expr', func_id, args]
+                return self.node('call_expr', func_id, self.seq(args))
         
         raise NotImplementedError(f"Unexpected call expression: {ast.dump(node)}")    
     def visit_Const(self, node):
         assert isinstance(node.value, (int, bool))
-        return ['const', node.value]
+        return self.node('const', node.value)
     
     def visit_Constant(self, node):
         # For Python 3.8+
         assert isinstance(node.value, (int, bool))
-        return ['const', node.value]
+        return self.node('const', node.value)
     
     def visit_If(self, node):
         test = self.visit(node.test)
         body = list(map(self.visit, node.body))
         orelse = list(map(self.visit, node.orelse))
         if len(orelse) == 0:
-            orelse = [['skip']]
-        return ['if', test, ['seq'] + body, ['seq'] + orelse]
+            orelse = [self.node('skip')]
+        return self.node('if', test, self.node('seq', *body), self.node('seq', *orelse))
     
     def visit_Compare(self, node):
         assert len(node.ops) == 1
@@ -93,32 +127,32 @@ class WhilePyVisitor(ast.NodeVisitor):
         right = self.visit(node.comparators[0])
         op = node.ops[0]
         if isinstance(op, ast.Lt):
-            return ['<', left, right]
+            return self.node('<', left, right)
         elif isinstance(op, ast.LtE):
-            return ['<=', left, right]
+            return self.node('<=', left, right)
         elif isinstance(op, ast.Gt):
-            return ['>', left, right]
+            return self.node('>', left, right)
         elif isinstance(op, ast.GtE):
-            return ['>=', left, right]
+            return self.node('>=', left, right)
         elif isinstance(op, ast.Eq):
-            return ['==', left, right]
+            return self.node('==', left, right)
         elif isinstance(op, ast.NotEq):
-            return ['!=', left, right]
+            return self.node('!=', left, right)
         else:
             raise NotImplementedError(ast.dump(node))
     
     def visit_Name(self, node):
         self.vars.add(node.id)
-        return ['var', node.id]
+        return self.node('var', node.id)
     
     def visit_UnaryOp(self, node):
             # assert isinstance(node.op, ast.USub) # <--- Remove this line
             if isinstance(node.op, ast.USub):
                 operand = self.visit(node.operand)
-                return ['-', operand]
+                return self.node('-', operand)
             elif isinstance(node.op, ast.Not):
                 operand = self.visit(node.operand)
-                return ['not', operand]
+                return self.node('not', operand)
             
             raise NotImplementedError(ast.dump(node))
     
@@ -126,14 +160,14 @@ class WhilePyVisitor(ast.NodeVisitor):
         left = self.visit(node.left)
         right = self.visit(node.right)
         if isinstance(node.op, ast.Add):
-            return ['+', left, right]
+            return self.node('+', left, right)
         elif isinstance(node.op, ast.Sub):
-            return ['-', left, right]
+            return self.node('-', left, right)
         elif isinstance(node.op, ast.Mult):
-            return ['*', left, right]
+            return self.node('*', left, right)
         elif isinstance(node.op, ast.Div):
             # Note: This is integer division in Z3
-            return ['/', left, right]
+            return self.node('/', left, right)
         else:
             raise NotImplementedError(ast.dump(node))
 
@@ -152,12 +186,12 @@ class WhilePyVisitor(ast.NodeVisitor):
                     func_id = call.func.id
                     if func_id not in ('assume', 'assert', 'invariant', 'old'):
                         args = [self.visit(a) for a in call.args]
-                        return ['call', func_id, args, var] # LHS is 'var'
+                        return self.node('call', func_id, self.seq(args), var) # LHS is 'var'
             
             # Handle standard assignment: x = e
             # NOW it's safe to visit the value
             value = self.visit(node.value) 
-            return ['assign', var, value]
+            return self.node('assign', var, value)
             
         elif isinstance(target, ast.Subscript):
             # Handle array write: a[i] = e
@@ -168,7 +202,7 @@ class WhilePyVisitor(ast.NodeVisitor):
             
             index = self.visit(target.slice)
             value = self.visit(node.value) 
-            return ['tastore', arr_name, index, value]
+            return self.node('tastore', arr_name, index, value)
             
         raise NotImplementedError(ast.dump(node))
         
@@ -182,29 +216,29 @@ class WhilePyVisitor(ast.NodeVisitor):
             assert arr_base_ast[0] in ('var', 'old'), f"Array base must be a variable or old(var), not {arr_base_ast[0]}"
             
             # Return ['select', BASE_AST, INDEX_AST]
-            return ['select', arr_base_ast, index_ast]
+            return self.node('select', arr_base_ast, index_ast)
 
     def visit_Index(self, node):
         # Helper for Subscript in Python < 3.9
         return self.visit(node.value)
 
     def visit_Pass(self, node):
-        return ['skip']
+        return self.node('skip')
     
     def visit_Assert(self, node):
         test = self.visit(node.test)
-        return ['assert', test]
+        return self.node('assert', test)
     
     def visit_Return(self, node):
-        return ['return', self.visit(node.value)]
+        return self.node('return', self.visit(node.value))
 
     def visit_FunctionDef(self, node):
         name = node.name
         params = [a.arg for a in node.args.args]
         self.vars.update(params)
         
-        requires = ['const', True]
-        ensures = ['const', True]
+        requires = self.node('const', True)
+        ensures = self.node('const', True)
         modifies = []
         body_stmts = []
 
@@ -235,7 +269,9 @@ class WhilePyVisitor(ast.NodeVisitor):
             else:
                 body_stmts.append(stmt)
                 
-        body = [self.visit(s) for s in body_stmts]
+        body = self.seq(self.visit(s) for s in body_stmts)
+        params = self.seq(params)
+        modifies = self.seq(modifies)
         
         proc_info = {
             'params': params, 
@@ -247,7 +283,7 @@ class WhilePyVisitor(ast.NodeVisitor):
         self.procs[name] = proc_info
         # We return a 'proc' node, but it's mainly for completeness.
         # The main 'prove' function will use self.procs
-        return ['proc', name, params, body, requires, ensures, modifies]
+        return self.node('proc', name, params, body, requires, ensures, modifies)
 
     def visit_While(self, node):
         test = self.visit(node.test)
@@ -266,17 +302,52 @@ class WhilePyVisitor(ast.NodeVisitor):
             else:
                 body_stmts.append(stmt)
                 
-        body = [self.visit(s) for s in body_stmts]
-        return ['while', test, body, invariants]
+        body = self.seq(self.visit(s) for s in body_stmts)
+        return self.node('while', test, body, self.seq(invariants))
     
     def generic_visit(self, node):
         raise NotImplementedError(f"Unsupported AST node: {ast.dump(node)}")
 
+# Binding strength of operators, for pretty()
+PRECEDENCE = {'or': 1, 'and': 2, 'not': 3,
+              '<': 4, '<=': 4, '>': 4, '>=': 4, '==': 4, '!=': 4,
+              '+': 5, '-': 5, '*': 6, '/': 6}
+
+def pretty(expr, parent=0):
+    """Prints an expression node back in While-Py syntax, e.g. 'a[i] == old(a)[j]'."""
+    tag = expr[0]
+    if tag == 'const':
+        return repr(expr[1])
+    if tag == 'var':
+        return expr[1]
+    if tag == 'old':
+        return f"old({expr[1]})"
+    if tag == 'select':
+        return f"{pretty(expr[1], 7)}[{pretty(expr[2])}]"
+    if tag == 'call_expr':
+        return f"{expr[1]}({', '.join(pretty(a) for a in expr[2])})"
+    prec = PRECEDENCE[tag]
+    if tag == 'not':
+        text = f"not {pretty(expr[1], prec)}"
+    elif len(expr) == 2:
+        # Unary minus
+        text = f"-{pretty(expr[1], 7)}"
+    else:
+        # Operators are left-associative, except 'and'/'or' which the
+        # parser nests to the right
+        left, right = (prec, prec + 1) if tag not in ('and', 'or') else (prec + 1, prec)
+        text = f"{pretty(expr[1], left)} {tag} {pretty(expr[2], right)}"
+    return f"({text})" if prec < parent else text
+
 def py_ast(filename):
     with open(filename, "r") as f:
         tree = ast.parse(f.read(), filename=filename)
         return tree
 
+def parse(source, interner=None, filename='<string>'):
+    """Parses While-Py source text into {'main', 'procs', 'vars', 'imports'}."""
+    return WhilePyVisitor(interner).visit(ast.parse(source, filename=filename))
+
 
 if __name__ == "__main__":
     if len(sys.argv) != 2:
@@ -0,0 +1,142 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from z3 import *
+
+from cache import load_json, merge_json
+
+def _default(ctx):
+    return Solver(ctx=ctx)
+
+def _mbqi(on):
+    def make(ctx):
+        s = Solver(ctx=ctx)
+        s.set('mbqi', on)
+        return s
+    return make
+
+def _seed(seed):
+    def make(ctx):
+        s = Solver(ctx=ctx)
+        s.set('random_seed', seed)
+        return s
+    return make
+
+def _logic(ctx):
+    # Arrays, uninterpreted functions, (non)linear integer arithmetic, quantifiers
+    return SolverFor('AUFNIRA', ctx=ctx)
+
+def _tactic(ctx):
+    return Then('simplify', 'solve-eqs', 'smt', ctx=ctx).solver()
+
+# Configurations raced by the portfolio, by name; each builds a solver in a Context
+CONFIGS = {
+    'default': _default,
+    'mbqi': _mbqi(True),
+    'no-mbqi': _mbqi(False),
+    'logic': _logic,
+    'seed-1': _seed(1),
+    'seed-2': _seed(2),
+    'tactic': _tactic,
+}
+
+class WinnerStore:
+    """Remembers which configuration answered each query first.
+
+    Queries are identified by a readable key (e.g. the procedure name, or
+    a goal's label), so the preference carries over to later runs, and
+    to similar queries in other files. With a `directory`, winners are
+    kept in `directory/portfolio.json`.
+    """
+
+    def __init__(self, directory=None):
+        self.path = os.path.join(directory, 'portfolio.json') if directory else None
+        self.winners = load_json(self.path) if self.path else {}
+        self.added = {}
+        self.lock = threading.Lock()
+
+    def order(self, key):
+        """Configuration names, the last winner for `key` first."""
+        with self.lock:
+            best = self.winners.get(key)
+        return sorted(CONFIGS, key=lambda name: name != best)
+
+    def record(self, key, name):
+        with self.lock:
+            self.winners[key] = self.added[key] = name
+
+    def save(self):
+        """Merges new winners into the file; safe with concurrent writers."""
+        with self.lock:
+            if self.path is None or not self.added:
+                return
+            self.winners = merge_json(self.path, self.added)
+            self.added = {}
+
+def race(formulas, vctx, key, timeout=None, record=None):
+    """Checks the conjunction of `formulas` under every configuration at once.
+
+    Returns (result, detail, winner): the first sat or unsat answer, with
+    the model as text (sat) or the solver's reason (unknown) as `detail`,
+    and the name of the configuration that gave it. The other solvers are
+    interrupted. Must be called on the thread that owns the formulas'
+    Context; every configuration gets its own Context and a translated
+    copy. Configurations start in vctx.winners' order for `key`, so with
+    fewer CPUs than configurations the last winner always runs. When the
+    run is measured, the winner's statistics are recorded under `record`
+    (default: `key`).
+    """
+    names = vctx.winners.order(key)
+    entries = []
+    for name in names:
+        ctx = Context()
+        entries.append((name, ctx, [f.translate(ctx) for f in formulas]))
+        vctx.child_contexts.append(ctx)
+
+    lock = threading.Lock()
+    answer = {}
+
+    def run(entry):
+        name, ctx, fs = entry
+        if answer:
+            return None
+        s = CONFIGS[name](ctx)
+        if timeout is not None:
+            s.set('timeout', int(timeout * 1000))
+        s.add(*fs)
+        result = s.check()
+        if result == unknown:
+            try:
+                return name, result, s.reason_unknown()
+            except Z3Exception:
+                return name, result, None
+        detail = str(s.model()) if result == sat else None
+        with lock:
+            if not answer:
+                answer.update(result=result, detail=detail, winner=name)
+                if vctx.stats is not None:
+                    # Only the winner's work counts
+                    vctx.stats.add_solver(record or key, s)
+        return None
+
+    reasons = []
+    try:
+        with ThreadPoolExecutor(max_workers=min(len(entries), os.cpu_count() or 1)) as pool:
+            futures = [pool.submit(run, entry) for entry in entries]
+            pending = set(futures)
+            while pending:
+                _, pending = wait(pending, timeout=0.05)
+                if answer:
+                    # Keep interrupting: a solver may start after the first interrupt
+                    for _, ctx, _ in entries:
+                        ctx.interrupt()
+            reasons = [f.result() for f in futures if f.result() is not None]
+    finally:
+        for _, ctx, _ in entries:
+            vctx.child_contexts.remove(ctx)
+
+    if answer:
+        vctx.winners.record(key, answer['winner'])
+        return answer['result'], answer['detail'], answer['winner']
+    return unknown, (reasons[0][2] if reasons else None), None
@@ -1,23 +1,288 @@
-from z3 import *
-from parser import py_ast, WhilePyVisitor
+# Z3 and the modules built on it are imported by load_solver()
+from parser import parse, pretty
+from ir import Interner
+from scheduler import verify_procs
+from cache import VerdictCache, ParseCache, verdict_salt
+from sorts import infer_sorts, ARRAY, BOOL
+from slicing import slice_program
+from modules import ModuleLoader, contract_vars
+from instrument import Stats, timed, print_report, profiled
+from report import ProofResult
+import io
 import sys
+import threading
+import time
 import pprint
-# --- Global State ---
-PROC_ENV = {}
-ALL_VARS = set()
-FRESH_COUNTER = 0
-Z3_FUNC_CACHE = {}
-
-def next_fresh_id():
-    """Generates a unique ID for fresh variables."""
-    global FRESH_COUNTER
-    FRESH_COUNTER += 1
-    return FRESH_COUNTER
+
+_solver_lock = threading.Lock()
+_solver_loaded = False
+
+def load_solver():
+    """Imports Z3, and the modules that use it, into this module.
+
+    Loading Z3 is a large part of the prover's start-up time, and runs
+    that never reach a solver (parse errors, fully cached files) do not
+    need it. Everything that builds formulas works on a
+    VerificationContext, which calls this first; it is a no-op after the
+    first call.
+    """
+    global _solver_loaded, ssa_vc, solve_goals, solve_incremental, print_goals, race, WinnerStore
+    with _solver_lock:
+        if _solver_loaded:
+            return
+        import z3
+        # The names of `from z3 import *`, except where this module has its
+        # own (e.g. sorts.ARRAY), as when z3 was imported first
+        namespace = globals()
+        for name, value in vars(z3).items():
+            if not name.startswith('_') and name not in namespace:
+                namespace[name] = value
+        from ssa import ssa_vc
+        from goals import solve_goals, solve_incremental, print_goals
+        from portfolio import race, WinnerStore
+        _solver_loaded = True
+
+# Options accepted by VerificationContext and prove()
+DEFAULT_OPTIONS = {
+    # VC generation: 'wp' is the reference weakest precondition; 'linear'
+    # names the postcondition at each join, so the VC stays linear in size;
+    # 'ssa' builds the VC forward over passive form, without substitution
+    'vcgen': 'wp',
+    # Split the VC into one goal per assertion, call precondition, loop
+    # obligation and postcondition, and check each goal on its own
+    'split': False,
+    # With split: worker threads for the goals (None: one per CPU), and
+    # the time limit of each goal in seconds (None: no limit)
+    'goal_jobs': None,
+    'goal_timeout': None,
+    # Check every VC of a run on one incremental solver, which keeps the
+    # background facts and learned lemmas, with one assumption per goal
+    'incremental': False,
+    # Race every check over several solver configurations (see
+    # portfolio.CONFIGS) and take the first definitive answer
+    'portfolio': False,
+    # Drop statements outside the cone of influence of the proof
+    # obligations before generating VCs (see slicing.py)
+    'slice': False,
+    # Infer invariants for loops that have none (see houdini.py)
+    'infer_invariants': False,
+    # Definitions of functions used in their own contracts (e.g. sum(n-1)
+    # in the ensures of sum): None gives Z3 one quantified axiom,
+    # triggered by applications of the function; a number instead unfolds
+    # the definition that many levels deep from the applications in the
+    # VC, with no quantifier at all (see unfold)
+    'fuel': None,
+    # Before calling the solver, run each procedure and main on this many
+    # random inputs at once (see interp.py, which needs NumPy); a broken
+    # assertion or contract found that way is reported without a query.
+    # Loops really run there, so this can fail programs that wp's loop
+    # rule verifies
+    'refute': None,
+}
+
+class VerificationContext:
+    """Per-run verifier state.
+
+    Holds the procedure environment, the variable set and their sorts, the
+    fresh-name counter and the cache of uninterpreted functions, and owns a private
+    Z3 Context. Every Z3 term of a run is built in that context, so
+    several runs can proceed at once (e.g. on threads) and everything is
+    released together when the run ends. Keyword options are described
+    in DEFAULT_OPTIONS.
+    """
+
+    def __init__(self, procs, all_vars, out=None, sorts=None, **options):
+        unknown = set(options) - set(DEFAULT_OPTIONS)
+        if unknown:
+            raise TypeError(f"Unknown verifier options: {', '.join(sorted(unknown))}")
+        fuel = options.get('fuel')
+        if fuel is not None and (type(fuel) is not int or fuel < 1):
+            # With no level, unfold() would drop the definitions altogether
+            raise ValueError(f"fuel must be a number of levels, at least 1, not {fuel!r}")
+        load_solver()
+        self.options = {**DEFAULT_OPTIONS, **options}
+        self.ctx = Context()
+        self.proc_env = procs
+        self.all_vars = set(all_vars)
+        # Sort of every variable; pass the sorts of the whole program (see
+        # infer_sorts), otherwise only the procedures are looked at
+        self.sorts = sorts if sorts is not None else infer_sorts(procs, names=all_vars)
+        self.fresh_counter = 0
+        self.func_cache = {}
+        # Symbol table: each Z3 constant is created once per run
+        self.symbols = {}
+        # Translations of interned nodes, keyed on (id(node), old_suffix)
+        self.expr_cache = {}
+        # Definitions of named postconditions, assumed when the VC is checked
+        self.definitions = []
+        # Variables the code whose VC is being built may write (see
+        # name_post); None stands for all of them
+        self.written = None
+        # Labelled obligations (split mode)
+        self.goals = []
+        # Other Z3 Contexts working for this run (goal workers, portfolio)
+        self.child_contexts = []
+        # Portfolio winners; prove() loads them from the cache directory
+        self.winners = WinnerStore()
+        # The solver shared by all checks (incremental mode)
+        self.solver = None
+        # instrument.Stats of the run, if it is being measured
+        self.stats = None
+        # Verdict of every procedure checked, and of main (see record()),
+        # and a function called with each as it comes in
+        self.results = []
+        self.on_result = None
+        # Set by cancel(): the run stops as soon as possible
+        self.cancelled = threading.Event()
+        # The context this one was forked from
+        self.parent = None
+        # Progress messages go here; workers buffer theirs
+        self.out = out if out is not None else sys.stdout
+
+    def fork(self, out=None):
+        """Returns a context for the same program with its own Z3 Context."""
+        child = VerificationContext(self.proc_env, self.all_vars, out=out or self.out,
+                                    sorts=self.sorts, **self.options)
+        child.winners = self.winners
+        child.stats = self.stats
+        child.results = self.results
+        child.on_result = self.on_result
+        child.cancelled = self.cancelled
+        # Interrupting this run also interrupts the fork
+        child.parent = self
+        self.child_contexts.append(child.ctx)
+        return child
+
+    def next_fresh_id(self):
+        """Generates a unique ID for fresh variables."""
+        self.fresh_counter += 1
+        return self.fresh_counter
+
+    def int_const(self, name):
+        """The Int constant `name` of this run."""
+        const = self.symbols.get((name, 'int'))
+        if const is None:
+            const = self.symbols[(name, 'int')] = Int(name, self.ctx)
+        return const
+
+    def array_const(self, name):
+        """The Array(Int, Int) constant `name` of this run."""
+        const = self.symbols.get((name, 'array'))
+        if const is None:
+            sort = IntSort(self.ctx)
+            const = self.symbols[(name, 'array')] = Array(name, sort, sort)
+        return const
+
+    def bool_const(self, name):
+        """The Bool constant `name` of this run."""
+        const = self.symbols.get((name, 'bool'))
+        if const is None:
+            const = self.symbols[(name, 'bool')] = Bool(name, self.ctx)
+        return const
+
+    def sort_of(self, name):
+        """The inferred sort of variable `name`."""
+        return self.sorts.get(name, 'int')
+
+    def var(self, name, suffix=''):
+        """The constant for variable `name` (renamed with `suffix`) at its sort."""
+        sort = self.sort_of(name)
+        if sort == ARRAY:
+            return self.array_const(name + suffix)
+        if sort == BOOL:
+            return self.bool_const(name + suffix)
+        return self.int_const(name + suffix)
+
+    def substitute(self, formula, *pairs):
+        """z3.substitute, counted when the run is measured."""
+        if self.stats is not None:
+            self.stats.count_substitution()
+        return substitute(formula, *pairs)
+
+    def translate(self, expr, old_suffix='', env=None):
+        """Translates an AST expression in this context; see expr_to_z3."""
+        return expr_to_z3(expr, self, old_suffix, env)
+
+    def obligation(self, kind, formula, label):
+        """Marks `formula` as a proof obligation of the VC.
+
+        In split mode the formula is guarded by a fresh goal literal, so
+        it can be checked on its own (see goals.solve_goals); otherwise it
+        is returned unchanged.
+        """
+        if not (self.options['split'] or self.options['incremental']) or is_true(formula):
+            return formula
+        lit = self.bool_const(f"goal_{self.next_fresh_id()}")
+        self.goals.append({'kind': kind, 'label': label, 'lit': lit})
+        return Implies(lit, formula)
+
+    def take_goals(self):
+        """Returns the obligations made since the last call, and forgets them."""
+        goals, self.goals = self.goals, []
+        return goals
+
+    def shared_solver(self):
+        """The run's incremental solver; unsat cores are minimized."""
+        if self.solver is None:
+            self.solver = Solver(ctx=self.ctx)
+            self.solver.set('core.minimize', True)
+        return self.solver
+
+    def interrupt(self):
+        """Stops the solvers running for this run, including those in child contexts."""
+        self.ctx.interrupt()
+        for ctx in list(self.child_contexts):
+            ctx.interrupt()
+
+    def cancel(self):
+        """Stops the whole run: running checks are interrupted, and later
+        ones answer unknown. A check that was just starting can miss the
+        interrupt, so callers repeat this until the run is over."""
+        self.cancelled.set()
+        self.interrupt()
+
+    def record(self, name, result, seconds=0.0, detail=None, goals=None):
+        """Notes the verdict of procedure `name` (an entry of ProofResult.procedures).
+
+        `result` is the Z3 check result, or 'cached'.
+        """
+        verdict = ('cached' if result == 'cached' else 'verified' if result == unsat
+                   else 'failed' if result == sat else 'unknown')
+        entry = {'name': name, 'verdict': verdict, 'seconds': seconds,
+                 'detail': None if detail is None else str(detail), 'goals': goals}
+        # Forked contexts share the list; append is atomic
+        self.results.append(entry)
+        if self.on_result is not None:
+            self.on_result(entry)
+
+    def take_definitions(self):
+        """Returns the definitions made since the last call, and forgets them."""
+        definitions, self.definitions = self.definitions, []
+        return definitions
+
+    def close(self):
+        """Drops the cached Z3 objects and the Z3 Context of this run."""
+        if self.parent is not None and self.ctx in self.parent.child_contexts:
+            self.parent.child_contexts.remove(self.ctx)
+        self.func_cache = {}
+        self.symbols = {}
+        self.expr_cache = {}
+        self.definitions = []
+        self.goals = []
+        self.solver = None
+        self.ctx = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
 
 def find_old_vars(expr_ast):
     """Recursively finds all 'old(v)' variable names in an AST node."""
     vars = set()
-    if isinstance(expr_ast, list):
+    if isinstance(expr_ast, (list, tuple)):
         if expr_ast[0] == 'old':
             vars.add(expr_ast[1])
         else:
@@ -25,70 +290,83 @@ def find_old_vars(expr_ast):
                 vars.update(find_old_vars(sub_expr))
     return vars
 
-def z3_var(name):
-    """Get a Z3 Int variable. Caches array declarations."""
-    if name in ALL_VARS:
-        # Check if it's used as an array (a bit of a hack)
-        # In a real system, we'd have types.
-        is_array = any(
-            spec.get('modifies') and name in spec['modifies'] and 'a' in name.lower() 
-            for spec in PROC_ENV.values()
-        )
-        if is_array:
-             return Array(name, IntSort(), IntSort())
-    return Int(name)
-
-def z3_array(name):
+def z3_array(name, vctx):
     """Get a Z3 Array variable."""
-    return Array(name, IntSort(), IntSort())
+    return vctx.array_const(name)
 
 
-def expr_to_z3(expr, old_suffix=''):
-    """Converts our AST expression to a Z3 expression."""
+def expr_to_z3(expr, vctx, old_suffix='', env=None):
+    """Converts our AST expression to a Z3 expression.
+
+    `env`, if given, is called as env(kind, name) with kind 'var', 'array',
+    'old' or 'old_array'; a non-None result replaces the default symbol.
+    The SSA engine uses it to map variables to their current versions.
+    """
+    # Interned nodes are translated once per run (and old_suffix); the
+    # node itself is kept in the entry so its id() stays valid
+    if env is None and isinstance(expr, tuple):
+        key = (id(expr), old_suffix)
+        hit = vctx.expr_cache.get(key)
+        if hit is None:
+            hit = vctx.expr_cache[key] = (expr, _expr_to_z3(expr, vctx, old_suffix, env))
+        return hit[1]
+    return _expr_to_z3(expr, vctx, old_suffix, env)
+
+def _expr_to_z3(expr, vctx, old_suffix, env):
     if expr[0] == 'const':
         # Check for bool FIRST, since isinstance(True, int) is also True
         if isinstance(expr[1], bool):
-            return BoolVal(expr[1])
+            return BoolVal(expr[1], vctx.ctx)
         else:
-            return IntVal(expr[1])
+            return IntVal(expr[1], vctx.ctx)
     
     elif expr[0] == 'var':
-        # 'v' -> Int('v'). ALWAYS maps to the current state var.
-        return Int(expr[1]) 
+        # 'v' -> Int('v') (or its inferred sort). ALWAYS maps to the current state var.
+        bound = env and env('var', expr[1])
+        if bound is not None:
+            return bound
+        return vctx.var(expr[1])
     
     elif expr[0] == 'old':
         # 'old(v)'
         # At verify_proc (suffix='_old'), map to v_old
         # At call_site (suffix=''), map to v_pre_call
         # (Your previous _pre_call logic was correct for this part)
+        bound = env and env('old', expr[1])
+        if bound is not None:
+            return bound
         suffix_to_use = '_pre_call' if old_suffix == '' else old_suffix 
-        return Int(f"{expr[1]}{suffix_to_use}")
+        return vctx.var(expr[1], suffix_to_use)
 
     elif expr[0] == 'select':
         # Array read: a[i] or old(a)[i]
         arr_base_ast = expr[1]  # This is ['var', 'a'] or ['old', 'a']
         idx_ast = expr[2]
-        idx_z3 = expr_to_z3(idx_ast, old_suffix) # Recursively call
+        idx_z3 = expr_to_z3(idx_ast, vctx, old_suffix, env) # Recursively call
         
         arr_name = arr_base_ast[1] # The name 'a'
         
         if arr_base_ast[0] == 'var':
             # a[i] -> Select(a, i). ALWAYS maps to current state array.
-            arr_z3 = z3_array(arr_name)
+            arr_z3 = env and env('array', arr_name)
+            if arr_z3 is None:
+                arr_z3 = z3_array(arr_name, vctx)
             return Select(arr_z3, idx_z3)
         elif arr_base_ast[0] == 'old':
             # old(a)[i]
             # At verify_proc (suffix='_old'), map to a_old
             # At call_site (suffix=''), map to a_pre_call
             suffix_to_use = '_pre_call' if old_suffix == '' else old_suffix
-            arr_z3 = z3_array(f"{arr_name}{suffix_to_use}")
+            arr_z3 = env and env('old_array', arr_name)
+            if arr_z3 is None:
+                arr_z3 = z3_array(f"{arr_name}{suffix_to_use}", vctx)
             return Select(arr_z3, idx_z3)
         else:
             raise NotImplementedError(f"Unexpected array base in select: {arr_base_ast}")
 
     elif expr[0] in ('<', '<=', '>', '>=', '==', '!='):
-        left = expr_to_z3(expr[1], old_suffix)
-        right = expr_to_z3(expr[2], old_suffix)
+        left = expr_to_z3(expr[1], vctx, old_suffix, env)
+        right = expr_to_z3(expr[2], vctx, old_suffix, env)
         if expr[0] == '<': return left < right
         if expr[0] == '<=': return left <= right
         if expr[0] == '>': return left > right
@@ -97,9 +375,9 @@ def expr_to_z3(expr, old_suffix=''):
         if expr[0] == '!=': return left != right
     
     elif expr[0] in ('+', '-', '*', '/'):
-        left = expr_to_z3(expr[1], old_suffix)
+        left = expr_to_z3(expr[1], vctx, old_suffix, env)
         if len(expr) == 3:
-            right = expr_to_z3(expr[2], old_suffix)
+            right = expr_to_z3(expr[2], vctx, old_suffix, env)
             if expr[0] == '+': return left + right
             if expr[0] == '-': return left - right
             if expr[0] == '*': return left * right
@@ -110,61 +388,138 @@ def expr_to_z3(expr, old_suffix=''):
     
     elif expr[0] in ('and', 'or', 'not'):
         if expr[0] == 'and':
-            return And(expr_to_z3(expr[1], old_suffix), expr_to_z3(expr[2], old_suffix))
+            return And(expr_to_z3(expr[1], vctx, old_suffix, env), expr_to_z3(expr[2], vctx, old_suffix, env))
         if expr[0] == 'or':
-            return Or(expr_to_z3(expr[1], old_suffix), expr_to_z3(expr[2], old_suffix))
+            return Or(expr_to_z3(expr[1], vctx, old_suffix, env), expr_to_z3(expr[2], vctx, old_suffix, env))
         if expr[0] == 'not':
-            return Not(expr_to_z3(expr[1], old_suffix))
+            return Not(expr_to_z3(expr[1], vctx, old_suffix, env))
             
     elif expr[0] == 'call_expr':
         func_id = expr[1]
         args_ast = expr[2]
         
         # Get or create the Z3 uninterpreted function
-        if func_id not in Z3_FUNC_CACHE:
+        if func_id not in vctx.func_cache:
             # We need to know the 'arity' (number of args)
             # We get this from the procedure environment
             try:
-                num_params = len(PROC_ENV[func_id]['params'])
+                num_params = len(vctx.proc_env[func_id]['params'])
             except KeyError:
                 raise Exception(f"Using function '{func_id}' in expression, but it is not defined.")
             
             # Assume all args are Int, returns Int
-            arg_types = [IntSort()] * num_params
-            Z3_FUNC_CACHE[func_id] = Function(func_id, *arg_types, IntSort())
+            arg_types = [IntSort(vctx.ctx)] * num_params
+            vctx.func_cache[func_id] = Function(func_id, *arg_types, IntSort(vctx.ctx))
             
-        z3_func = Z3_FUNC_CACHE[func_id]
+        z3_func = vctx.func_cache[func_id]
         
         # Convert args to Z3, passing down the old_suffix
-        z3_args = [expr_to_z3(a, old_suffix) for a in args_ast]
+        z3_args = [expr_to_z3(a, vctx, old_suffix, env) for a in args_ast]
         
         return z3_func(*z3_args)
             
     else:
         raise NotImplementedError(f"expr_to_z3: {expr}")
 
-def wp(stmt, post, ret_var=None, old_suffix=''):
+def program_consts(formula, vctx):
+    """Finds the program variables (Int or Array constants) free in a formula."""
+    found = {}
+    seen = set()
+    todo = [formula]
+    while todo:
+        e = todo.pop()
+        if e.get_id() in seen:
+            continue
+        seen.add(e.get_id())
+        if is_quantifier(e):
+            todo.append(e.body())
+        elif is_const(e) and e.decl().kind() == Z3_OP_UNINTERPRETED:
+            if e.decl().name() in vctx.all_vars:
+                found[e.get_id()] = e
+        elif is_app(e):
+            todo.extend(e.children())
+    return list(found.values())
+
+def assigned_vars(stmts, procs):
+    """Names of the variables some statement in `stmts` may write."""
+    found = set()
+    todo = list(stmts)
+    while todo:
+        s = todo.pop()
+        if s[0] in ('assign', 'tastore'):
+            found.add(s[1])
+        elif s[0] == 'return':
+            found.add('ret')
+        elif s[0] == 'seq':
+            todo.extend(s[1:])
+        elif s[0] == 'if':
+            todo.extend([s[2], s[3]])
+        elif s[0] == 'while':
+            todo.extend(s[2])
+        elif s[0] == 'call':
+            spec = procs.get(s[1])
+            found.update(spec['modifies'] if spec is not None else ())
+            found.add(s[3] or 'ret')
+    return found
+
+def name_post(post, vctx):
+    """Replaces a postcondition by a fresh Boolean name (Flanagan-Saxe style).
+
+    The program variables free in `post` that the code being verified
+    writes (vctx.written) are renamed to fresh join copies v_j, and the
+    definition post[v_j/v] => P is recorded in vctx. The result is
+    (v_j == v for all such v) => P. Substitutions made further up only
+    rewrite these equalities, never the definition, so each join adds
+    O(|written vars|) instead of doubling the VC. Variables nothing
+    writes, like inputs read by later conditions, need no copy: copying
+    them too would carry each of them back to every earlier join.
+
+    P only occurs positively in the VC, so the one direction is enough; it
+    also keeps the definition sound when `post` contains the free
+    (implicitly universal) havoc constants of a call.
+    """
+    if is_true(post) or is_false(post):
+        return post
+    fresh_id = vctx.next_fresh_id()
+    join = [(v, Const(f"{v.decl().name()}_join_{fresh_id}", v.sort()))
+            for v in program_consts(post, vctx)
+            if vctx.written is None or v.decl().name() in vctx.written]
+    name = Bool(f"post_{fresh_id}", vctx.ctx)
+    vctx.definitions.append(Implies(vctx.substitute(post, join) if join else post, name))
+    if not join:
+        return name
+    return Implies(And(*[j == v for v, j in join], vctx.ctx), name)
+
+def wp(stmt, post, vctx, ret_var=None, old_suffix=''):
     """Calculates the Weakest Precondition (WP)."""
-    
+    if vctx.stats is None:
+        return _wp(stmt, post, vctx, ret_var, old_suffix)
+    with vctx.stats.stmt(stmt[0]):
+        return _wp(stmt, post, vctx, ret_var, old_suffix)
+
+def _wp(stmt, post, vctx, ret_var, old_suffix):
     if stmt[0] == 'seq':
         for s in reversed(stmt[1:]):
-            post = wp(s, post, ret_var, old_suffix)
+            post = wp(s, post, vctx, ret_var, old_suffix)
         return post
     
     elif stmt[0] == 'assume':
-        cond = expr_to_z3(stmt[1], old_suffix)
+        cond = expr_to_z3(stmt[1], vctx, old_suffix)
         return Implies(cond, post)
     
     elif stmt[0] == 'assert':
-        cond = expr_to_z3(stmt[1], old_suffix)
-        return And(cond, post)
+        cond = expr_to_z3(stmt[1], vctx, old_suffix)
+        return And(vctx.obligation('assert', cond, pretty(stmt[1])), post)
     
     elif stmt[0] == 'if':
-        test = expr_to_z3(stmt[1], old_suffix)
+        test = expr_to_z3(stmt[1], vctx, old_suffix)
         body = stmt[2]
         orelse = stmt[3]
-        wp_body = wp(body, post, ret_var, old_suffix)
-        wp_orelse = wp(orelse, post, ret_var, old_suffix)
+        if vctx.options['vcgen'] == 'linear':
+            # Both branches get the (small) name instead of a copy of post
+            post = name_post(post, vctx)
+        wp_body = wp(body, post, vctx, ret_var, old_suffix)
+        wp_orelse = wp(orelse, post, vctx, ret_var, old_suffix)
         return And(Implies(test, wp_body), Implies(Not(test), wp_orelse))
     
     elif stmt[0] == 'skip':
@@ -173,45 +528,47 @@ def wp(stmt, post, ret_var=None, old_suffix=''):
     elif stmt[0] == 'assign':
         # x = e
         var = stmt[1]
-        expr = expr_to_z3(stmt[2], old_suffix)
-        return substitute(post, (Int(var), expr))
+        expr = expr_to_z3(stmt[2], vctx, old_suffix)
+        return vctx.substitute(post, (vctx.var(var), expr))
         
     elif stmt[0] == 'tastore':
         # a[i] = e
         arr_name = stmt[1]
-        arr = z3_array(arr_name)
-        idx = expr_to_z3(stmt[2], old_suffix)
-        val = expr_to_z3(stmt[3], old_suffix)
+        arr = z3_array(arr_name, vctx)
+        idx = expr_to_z3(stmt[2], vctx, old_suffix)
+        val = expr_to_z3(stmt[3], vctx, old_suffix)
         new_arr = Store(arr, idx, val)
-        return substitute(post, (arr, new_arr))
+        return vctx.substitute(post, (arr, new_arr))
         
     elif stmt[0] == 'return':
         # return e
         assert ret_var is not None, "Return statement found outside function body"
-        val = expr_to_z3(stmt[1], old_suffix)
-        return substitute(post, (Int(ret_var), val))
+        val = expr_to_z3(stmt[1], vctx, old_suffix)
+        return vctx.substitute(post, (vctx.var(ret_var), val))
 
     elif stmt[0] == 'invariant':
         # Invariants do not affect the WP calculation directly
         return post
 
     elif stmt[0] == 'while':
-        cond = expr_to_z3(stmt[1], old_suffix)
+        cond = expr_to_z3(stmt[1], vctx, old_suffix)
         invariants = stmt[3]
         if not invariants:
-             print(f"Warning: While loop has no invariants. Verification will likely fail.")
+             print(f"Warning: While loop has no invariants. Verification will likely fail.", file=vctx.out)
              # Fallback: treat as assert(False)
-             return BoolVal(False)
+             return vctx.obligation('invariant', BoolVal(False, vctx.ctx), "loop has no invariant")
              
-        invariant = And(*[expr_to_z3(inv, old_suffix) for inv in invariants])
-        body = ['seq'] + stmt[2]
+        invariant = And(*[expr_to_z3(inv, vctx, old_suffix) for inv in invariants])
+        label = ' and '.join(pretty(inv) for inv in invariants)
+        body = ['seq', *stmt[2]]
         
         # 1. Invariant holds at loop entry
-        vc_entry = invariant
+        vc_entry = vctx.obligation('loop entry', invariant, label)
         
         # 2. Invariant is preserved by loop body
         # WP(body, invariant)
-        wp_body = wp(body, invariant, ret_var, old_suffix)
+        wp_body = wp(body, vctx.obligation('loop preserved', invariant, label),
+                     vctx, ret_var, old_suffix)
         vc_preservation = Implies(And(invariant, cond), wp_body)
         
         # 3. Invariant + exit condition implies postcondition
@@ -228,7 +585,7 @@ def wp(stmt, post, ret_var=None, old_suffix=''):
         fname, actuals, lhs = stmt[1], stmt[2], stmt[3]
         
         try:
-            spec = PROC_ENV[fname]
+            spec = vctx.proc_env[fname]
         except KeyError:
             raise Exception(f"Attempted to call undefined procedure '{fname}'")
             
@@ -239,100 +596,67 @@ def wp(stmt, post, ret_var=None, old_suffix=''):
         
         # --- 1. Precondition Check ---
         # Pre => requires[actuals/formals]
-        req_z3 = expr_to_z3(req, old_suffix='') # old() maps to pre-call state
-        subst_args_req = zip(map(Int, params), map(expr_to_z3, actuals))
-        requires_subst = substitute(req_z3, list(subst_args_req))
+        req_z3 = expr_to_z3(req, vctx, old_suffix='') # old() maps to pre-call state
+        subst_args_req = [(vctx.var(p), expr_to_z3(a, vctx)) for p, a in zip(params, actuals)]
+        requires_subst = vctx.obligation('requires', vctx.substitute(req_z3, subst_args_req),
+                                         f"{fname}: {pretty(req)}")
         
-        # --- 2. Havoc & Frame Condition ---
-        # We must havoc *all* variables, then constrain them
-        fresh_id = next_fresh_id()
+        # --- 2. Havoc ---
+        # Only what the callee may change gets a fresh post-call symbol:
+        # its modifies set and the lhs (or 'ret' for a bare call). Every
+        # other variable keeps its symbol, which is the frame condition,
+        # so a call costs O(|modifies|), not O(|program variables|).
+        fresh_id = vctx.next_fresh_id()
+        havocked = set(mod) | {lhs or 'ret'}
         
-        # Create fresh Z3 vars for the post-call state
-        all_vars_fresh = {}
-        for v in ALL_VARS:
-            all_vars_fresh[v] = Int(f"{v}_{fresh_id}")
-        
-        # Z3 arrays for post-call state
-        all_arrays_fresh = {}
-        for v in ALL_VARS:
-             # Simple heuristic: if it's in modifies, it *could* be an array
-             if v in mod:
-                all_arrays_fresh[v] = Array(f"{v}_{fresh_id}", IntSort(), IntSort())
+        # Create fresh Z3 vars (of each variable's sort) for the post-call state
+        fresh = {v: vctx.var(v, f"_{fresh_id}") for v in sorted(havocked)}
 
         # Substitution list for Havoc: map Int('v') -> Int('v_fresh')
-        subst_all_havoc = []
-        for v in ALL_VARS:
-            subst_all_havoc.append((Int(v), all_vars_fresh[v]))
-            if v in all_arrays_fresh:
-                subst_all_havoc.append((z3_array(v), all_arrays_fresh[v]))
+        subst_havoc = [(vctx.var(v), fresh[v]) for v in sorted(havocked)]
                 
         # Q[fresh/vars]
-        Q_havoc = substitute(post, subst_all_havoc)
-        
-        # --- 3. Assume Postcondition & Frame ---
-        # Build Ensures' = ensures_f[...] AND Frame
+        Q_havoc = vctx.substitute(post, subst_havoc)
         
-        # ensures_f[actuals/formals]
+        # --- 3. Assume Postcondition ---
         # At a call site, old(v) in ensures maps to pre-call state 'v'
         # Post-state 'v' maps to 'v_fresh'
-        ens_z3 = expr_to_z3(ens, old_suffix='') # old(v) -> Int(v)
-        subst_args_ens = zip(map(Int, params), map(expr_to_z3, actuals))
-        ens_subst_args = substitute(ens_z3, list(subst_args_ens))
-        
-        # ...[lhs/ret]
-        if lhs:
-            # ret maps to the *fresh* LHS var
-            ens_subst_ret = substitute(ens_subst_args, (Int('ret'), all_vars_fresh[lhs]))
-        else:
-            ens_subst_ret = ens_subst_args
-            
-        # ...[fresh/vars] (for post-state vars in ensures)
-        ens_havoc = substitute(ens_subst_ret, subst_all_havoc)
-        
-        # Frame Condition: ⋀v∉M (v_fresh = v_pre)
-        mod_vars = set(mod)
-        if lhs:
-            mod_vars.add(lhs)
-            
-        frame_conds = []
-        for v in ALL_VARS:
-            if v not in mod_vars:
-                # Add frame for scalar Ints
-                frame_conds.append(all_vars_fresh[v] == Int(v))
-                # Add frame for Arrays (Store-Select axiom)
-                if v in all_arrays_fresh:
-                     i = Int(f"i_frame_{fresh_id}")
-                     frame_conds.append(
-                         ForAll([i], Select(all_arrays_fresh[v], i) == Select(z3_array(v), i))
-                     )
-
-        Frame_Z3 = And(frame_conds)
-        
-        Ensures_Prime = And(ens_havoc, Frame_Z3)
+        ens_z3 = expr_to_z3(ens, vctx, old_suffix='') # old(v) -> Int(v)
+
+        # ...[lhs/ret]: ret maps to the *fresh* LHS var
+        ens_subst_ret = vctx.substitute(ens_z3, (vctx.var('ret'), fresh[lhs or 'ret']))
+
+        # ...[actuals/formals, fresh/vars] in one simultaneous step, so the
+        # actuals keep their pre-call values (in x = f(x), the argument is
+        # the old x, not the havocked one)
+        subst_args_ens = [(vctx.var(p), expr_to_z3(a, vctx)) for p, a in zip(params, actuals)]
+        subst_ens_havoc = subst_args_ens + [(old, new) for old, new in subst_havoc
+                                            if old.decl().name() not in params]
+        ens_havoc = vctx.substitute(ens_subst_ret, subst_ens_havoc)
         
         # --- 4. Final VC ---
-        # Pre_Check AND (ForAll fresh_vars. (Ensures' => Q_havoc))
-        
-        # Gather all Z3 fresh vars to quantify over
-        all_fresh_z3 = list(all_vars_fresh.values()) + list(all_arrays_fresh.values())
-        
-        vc_call = ForAll(all_fresh_z3, Implies(Ensures_Prime, Q_havoc))
+        # Pre_Check AND (ForAll fresh_vars. (Ensures => Q_havoc))
+        #
+        # The quantifier is skolemized away: the fresh vars are new
+        # constants, and the VC only ever occurs positively and is checked
+        # as Not(vc), so free constants are universal already. The call
+        # thus stays quantifier-free if the callee's contract is.
+        vc_call = Implies(ens_havoc, Q_havoc)
         
         # Now, substitute the _pre_call vars with the actual pre-call state
-        # (e.g., 'a_pre_call' -> 'a', 'x_pre_call' -> 'x')
-        subst_pre_call = []
-        for v in ALL_VARS:
-            subst_pre_call.append( (Int(f"{v}_pre_call"), Int(v)) )
-            subst_pre_call.append( (z3_array(f"{v}_pre_call"), z3_array(v)) )
-
-        return And(requires_subst, substitute(vc_call, subst_pre_call))
+        # (e.g., 'a_pre_call' -> 'a', 'x_pre_call' -> 'x'); only the
+        # callee's ensures can mention them
+        subst_pre_call = [(vctx.var(v, '_pre_call'), vctx.var(v))
+                          for v in sorted(find_old_vars(ens))]
+        if not subst_pre_call:
+            return And(requires_subst, vc_call)
+        return And(requires_subst, vctx.substitute(vc_call, subst_pre_call))
 
     else:
         raise NotImplementedError(f"wp: {stmt}")
 
-def verify_proc(name, spec):
-    """Generates the VC for a single procedure."""
-    print(f"  Verifying procedure {name}...")
+def proc_vc(name, spec, vctx):
+    """Generates the VC for a single procedure. Returns (vc, axioms)."""
     params = spec['params']
     body_ast = spec['body']
     req = spec['requires']
@@ -342,148 +666,559 @@ def verify_proc(name, spec):
     old_vars = find_old_vars(ens)
     old_assumptions = []
     for v in old_vars:
-        # Assume v_old == v at the start
-        old_assumptions.append(Int(f"{v}_old") == Int(v))
-        # Also handle arrays
-        if 'a' in v: # Heuristic
-             i = Int(f"i_old_frame_{v}")
-             old_assumptions.append(
-                 ForAll([i], Select(z3_array(f"{v}_old"), i) == Select(z3_array(v), i))
-             )
+        # Assume v_old == v at the start (for arrays, by extensionality)
+        old_assumptions.append(vctx.var(v, '_old') == vctx.var(v))
 
     # Precondition: requires(...) AND (v_old == v)
     # Note: old_suffix='_old' maps old(v) -> v_old
-    pre_z3 = expr_to_z3(req, old_suffix='_old')
-    pre_with_olds = And(pre_z3, And(old_assumptions))
+    pre_z3 = expr_to_z3(req, vctx, old_suffix='_old')
+    pre_with_olds = And(pre_z3, And(*old_assumptions, vctx.ctx))
     
-    # Postcondition: ensures(...)
-    post_z3 = expr_to_z3(ens, old_suffix='_old')
-    
-    # VC: Pre => WP(body, Post)
-    wp_body = wp(['seq'] + body_ast, post_z3, ret_var='ret', old_suffix='_old')
+    # VC: Pre => WP(body, Post). ssa_vc records the ensures goal itself.
+    if vctx.options['vcgen'] == 'ssa':
+        wp_body = ssa_vc(['seq', *body_ast], ens, vctx, ret_var='ret', old_suffix='_old')
+    else:
+        # Postcondition: ensures(...)
+        post_z3 = vctx.obligation('ensures', expr_to_z3(ens, vctx, old_suffix='_old'), pretty(ens))
+        vctx.written = assigned_vars(body_ast, vctx.proc_env)
+        wp_body = wp(['seq', *body_ast], post_z3, vctx, ret_var='ret', old_suffix='_old')
     
     vc = Implies(pre_with_olds, wp_body)
     
     # --- AXIOM PART ---
     # If the ensures clause uses this function recursively (as an uninterpreted function),
     # we must add the spec itself as an axiom.
-    axiom = None
-    if name in Z3_FUNC_CACHE:
-        z3_func = Z3_FUNC_CACHE[name]
+    axioms = []
+    if name in vctx.func_cache:
+        z3_func = vctx.func_cache[name]
         
-        # 1. Get Z3 vars for params
-        param_z3_vars = [Int(p) for p in params]
-        
-        # 2. Get Z3 vars for old_vars
-        old_z3_vars = []
-        for v in old_vars:
-            old_z3_vars.append(Int(f"{v}_old"))
-            if 'a' in v: # Simple heuristic
-                old_z3_vars.append(z3_array(f"{v}_old"))
-
-        all_axiom_vars = param_z3_vars + old_z3_vars
+        # 1. Get Z3 vars for params. Only they are bound: the function
+        # also reads the entry state (old(a)), which is fixed in this VC.
+        # Binding v_old as well would claim the definition for every
+        # array at once, which no function satisfies.
+        param_z3_vars = [vctx.var(p) for p in params]
 
-        # 3. Build axiom body
+        # 2. Build axiom body
         # We must use the same '_old' suffix as verify_proc
-        ens_axiom_body = expr_to_z3(ens, old_suffix='_old')
-        req_axiom_body = expr_to_z3(req, old_suffix='_old')
+        ens_axiom_body = expr_to_z3(ens, vctx, old_suffix='_old')
+        req_axiom_body = expr_to_z3(req, vctx, old_suffix='_old')
         
-        # 4. Substitute 'ret' with 'func_call'
-        axiom_body = substitute(ens_axiom_body, (Int('ret'), z3_func(*param_z3_vars)))
-        
-        # 5. Create axiom: ForAll(vars, Requires => Ensures)
-        # This defines the uninterpreted function
-        axiom = ForAll(all_axiom_vars, Implies(req_axiom_body, axiom_body))
+        # 3. Substitute 'ret' with 'func_call'
+        call = z3_func(*param_z3_vars)
+        axiom_body = vctx.substitute(ens_axiom_body, (vctx.var('ret'), call))
+        definition = Implies(req_axiom_body, axiom_body)
 
-    # Check this specific VC
-    s_proc = Solver()
+        # 4. Create axiom: ForAll(vars, Requires => Ensures), instantiated
+        # for every application of the function that Z3 sees. Each
+        # instance mentions f(n-1), so Z3 alone may unfold without end;
+        # with fuel we unfold a fixed number of levels ourselves.
+        fuel = vctx.options['fuel']
+        if fuel is None:
+            axioms = [ForAll(param_z3_vars, definition, patterns=[call])]
+        else:
+            axioms = unfold(z3_func, param_z3_vars, definition, [vc, *vctx.definitions],
+                            fuel, vctx)
+
+    return vc, axioms
+
+def applications(func, formulas):
+    """The applications of Z3 function `func` in `formulas`, outside quantifiers."""
+    found = {}
+    seen = set()
+    todo = list(formulas)
+    while todo:
+        e = todo.pop()
+        if e.get_id() in seen:
+            continue
+        seen.add(e.get_id())
+        if is_app(e):
+            if e.decl().eq(func):
+                found[e.get_id()] = e
+            todo.extend(e.children())
+    return list(found.values())
+
+def unfold(func, params, definition, formulas, fuel, vctx):
+    """Instances of ForAll(params, definition) for the applications of `func`.
+
+    Level 1 instantiates the definition for every application in
+    `formulas`, level 2 for the new applications in those instances, and
+    so on up to `fuel` levels. Returns the instances, which are ground,
+    so the solver's work is bounded by the fuel.
+    """
+    instances = []
+    seen = set()
+    frontier = applications(func, formulas)
+    for _ in range(fuel):
+        level = []
+        for app in frontier:
+            if app.get_id() in seen:
+                continue
+            seen.add(app.get_id())
+            level.append(vctx.substitute(definition, *zip(params, app.children())))
+        instances.extend(level)
+        frontier = applications(func, level)
+    return instances
+
+def verify_proc(name, spec, vctx):
+    """Verifies a single procedure against its contract. Returns the verdict."""
+    if spec['body'] is None:
+        # Imported: verified with its own module
+        return True
+    print(f"  Verifying procedure {name}...", file=vctx.out)
+    start = time.perf_counter()
+    if vctx.options['refute']:
+        from interp import refute_proc
+        detail = refute_proc(name, spec, vctx.proc_env, vctx.sorts, vctx.options['refute'])
+        if detail is not None:
+            vctx.record(name, sat, time.perf_counter() - start, detail)
+            print(f"  ...Procedure {name} FAILED on a test input.", file=vctx.out)
+            print(f"  Counterexample: {detail}", file=vctx.out)
+            return False
+    with timed(vctx.stats, name, 'vcgen'):
+        vc, axioms = proc_vc(name, spec, vctx)
 
     # --- ADD AXIOM TO SOLVER ---
-    if axiom is not None:
-        print(f"  ...Adding axiom for {name}")
-        s_proc.add(axiom)
-            
-    s_proc.add(Not(vc))
-    
-    # Check the VC
-    result = s_proc.check()
+    if axioms:
+        print(f"  ...Adding axiom for {name}", file=vctx.out)
+
+    # Check this specific VC
+    result, detail, goals = discharge(vc, vctx, axioms, key=name)
+    vctx.record(name, result, time.perf_counter() - start, detail, goals)
 
     if result == unsat:
-        print(f"  ...Procedure {name} VERIFIED.")
+        print(f"  ...Procedure {name} VERIFIED.", file=vctx.out)
         return True
     elif result == sat:
-        print(f"  ...Procedure {name} FAILED verification.")
-        print("  Counterexample:")
-        print(f"  {s_proc.model()}")
+        print(f"  ...Procedure {name} FAILED verification.", file=vctx.out)
+        print("  Counterexample:", file=vctx.out)
+        print(f"  {detail}", file=vctx.out)
         return False
     else: # result == unknown
-        print(f"  ...Procedure {name} FAILED verification (Solver returned UNKNOWN).")
-        print("  This is common with complex quantifier/array axioms.")
-        try:
-            print(f"  Solver reason: {s_proc.reason_unknown()}")
-        except Z3Exception:
-            pass # reason_unknown() can also fail
+        print(f"  ...Procedure {name} FAILED verification (Solver returned UNKNOWN).", file=vctx.out)
+        print("  This is common with complex quantifier/array axioms.", file=vctx.out)
+        if detail is not None:
+            print(f"  Solver reason: {detail}", file=vctx.out)
         return False
 
-def prove(filename):
-    """Main proving function."""
-    global PROC_ENV, ALL_VARS
+def discharge(vc, vctx, axioms=(), key=''):
+    """Checks that `vc` is valid. Returns (result, detail, goal results).
+
+    The run's pending definitions and `axioms` are assumed. `result` is
+    unsat when the VC is valid, sat with the counterexample model as
+    `detail`, or unknown with the solver's reason as `detail`. In split
+    mode each labelled goal is checked on its own and reported to vctx.out;
+    the first failing goal gives the counterexample, and the results of
+    all goals are returned (otherwise None). In incremental mode
+    the definitions are asserted once on the run's shared solver, and the
+    goals are checked there. In portfolio mode checks are raced over
+    several solver configurations; `key` names the query (e.g. the
+    procedure) so that the winning configuration is tried first next time.
+    When the run is measured, the check is recorded under `key`.
+    """
+    if vctx.cancelled.is_set():
+        return unknown, 'cancelled', None
+    if vctx.stats is not None:
+        vctx.stats.add_vc(key, [vc, *axioms, *vctx.definitions])
+    with timed(vctx.stats, key, 'solve'):
+        return _discharge(vc, vctx, axioms, key)
+
+def _discharge(vc, vctx, axioms, key):
+    goals = vctx.take_goals()
+    if vctx.options['incremental'] and goals:
+        vctx.shared_solver().add(*vctx.take_definitions())
+        results = solve_incremental(vc, goals, axioms, vctx, key)
+    elif vctx.options['split'] and goals:
+        results = solve_goals(vc, goals, list(axioms) + vctx.take_definitions(), vctx, key)
+    else:
+        results = None
+
+    if results is not None:
+        print_goals(results, vctx.out)
+        for verdict, result in (('failed', sat), ('unknown', unknown)):
+            for r in results:
+                if r['verdict'] == verdict:
+                    return result, r['detail'], results
+        return unsat, None, results
+
+    if vctx.options['portfolio']:
+        result, detail, winner = race(list(axioms) + vctx.take_definitions() + [Not(vc)], vctx, key)
+        if winner is not None:
+            print(f"  ...Answered by the '{winner}' configuration.", file=vctx.out)
+        return result, detail, None
+
+    s = Solver(ctx=vctx.ctx)
+    s.add(*axioms)
+    s.add(*vctx.take_definitions())
+    s.add(Not(vc))
+    result = s.check()
+    if vctx.stats is not None:
+        vctx.stats.add_solver(key, s)
+    if result == sat:
+        return result, s.model(), None
+    if result == unsat:
+        return result, None, None
+    try:
+        return result, s.reason_unknown(), None
+    except Z3Exception:
+        return result, None, None # reason_unknown() can also fail
+
+def main_vc(main_stmt, vctx):
+    """Generates the VC of the main program (postcondition True)."""
+    if vctx.options['vcgen'] == 'ssa':
+        return ssa_vc(main_stmt, ['const', True], vctx)
+    post = BoolVal(True, vctx.ctx)
+    vctx.written = assigned_vars([main_stmt], vctx.proc_env)
+    return wp(main_stmt, post, vctx)
+
+def verify_program(main_stmt, vctx, jobs=None, cache=None, dump=False):
+    """Verifies every procedure, then the main program. Returns the verdict.
+
+    Procedures are verified in parallel on up to `jobs` threads (default:
+    one per CPU); the first failure cancels the rest. Procedures whose
+    fingerprint is in `cache` (a VerdictCache) are skipped, and so is main
+    if its fingerprint is (see cache.main_fingerprint). With `dump`,
+    the simplified VC of main is printed, which can cost more than
+    checking it.
+    """
+    # 1. Verify all procedures (imported ones were, with their module)
+    if any(spec['body'] is not None for spec in vctx.proc_env.values()):
+        print("--- Verifying Procedures ---", file=vctx.out)
+        all_procs_verified = verify_procs(vctx, verify_proc, jobs, cache)
+        if not all_procs_verified:
+            print("Verification failed for one or more procedures. Halting.", file=vctx.out)
+            return False
+        print("--- All procedures verified ---", file=vctx.out)
     
-    # 1. Parse the file
-    tree = py_ast(filename)
-    visitor = WhilePyVisitor()
-    parsed = visitor.visit(tree)
+    # 2. Verify main program
+    if cache is None:
+        return verify_main(main_stmt, vctx, dump)
+    key = cache.main_key(main_stmt, vctx.proc_env)
+    if cache.get(key):
+        print("\n--- Main Program VERIFIED (cached) ---", file=vctx.out)
+        vctx.record('main', 'cached')
+        return True
+    verified = verify_main(main_stmt, vctx, dump)
+    if verified:
+        cache.put(key, 'main')
+        cache.save()
+    return verified
+
+def all_cached(main_stmt, procs, cache):
+    """True iff every procedure and main have a verdict in `cache` (a VerdictCache)."""
+    return (all(cache.get(cache.key(name, procs)) for name in procs
+                if procs[name]['body'] is not None)
+            and bool(cache.get(cache.main_key(main_stmt, procs))))
+
+def verify_main(main_stmt, vctx, dump=False):
+    """Verifies the main program against the procedures' contracts. Returns the verdict."""
+    print("\n--- Verifying Main Program ---", file=vctx.out)
+    start = time.perf_counter()
+    if vctx.options['refute']:
+        from interp import refute_main
+        detail = refute_main(main_stmt, vctx.proc_env, vctx.sorts, vctx.options['refute'])
+        if detail is not None:
+            vctx.record('main', sat, time.perf_counter() - start, detail)
+            print("\nProgram is INCORRECT (found by testing).", file=vctx.out)
+            print(f"Counterexample: {detail}", file=vctx.out)
+            return False
+    with timed(vctx.stats, 'main', 'vcgen'):
+        pre = main_vc(main_stmt, vctx)
+    
+    if dump:
+        print("\nFinal VC (simplified):", file=vctx.out)
+        print(simplify(pre), file=vctx.out)
+    
+    result, detail, goals = discharge(pre, vctx, key='main')
+    vctx.record('main', result, time.perf_counter() - start, detail, goals)
+    if result == unsat:
+        print("\nProgram is VERIFIED.", file=vctx.out)
+        return True
+    elif result == sat:
+        print("\nProgram is INCORRECT.", file=vctx.out)
+        print("Counterexample:", file=vctx.out)
+        print(detail, file=vctx.out)
+        return False
+    else: # result == unknown, e.g. when a timeout is set
+        print("\nProgram could not be verified (Solver returned UNKNOWN).", file=vctx.out)
+        print(f"Solver reason: {detail}", file=vctx.out)
+        return False
+
+class _Discard(io.TextIOBase):
+    """An output stream that drops everything (quiet mode)."""
+
+    def write(self, text):
+        return len(text)
+
+def prove(filename, jobs=None, cache_dir=None, stats=None, quiet=False, dump=False,
+          source=None, on_context=None, on_result=None, **options):
+    """Main proving function. Returns a report.ProofResult, true iff verified.
+
+    With `cache_dir`, parsed programs and verified procedures are
+    remembered on disk: an unchanged file is not parsed again, and a
+    procedure is not re-verified until it or its callees' contracts
+    change. If nothing needs verifying, Z3 is not even loaded. Modules
+    named by `from module import ...` are verified first, with the same
+    settings, unless their summary is current (see modules.py). With
+    `stats` (an instrument.Stats), the run's phases, VC sizes and solver
+    statistics are recorded there. `quiet` turns off all output; `dump`
+    prints the parsed program and main's simplified VC, which is costly
+    on large programs. With `source`, that text is proved instead of the
+    file's contents (`filename` only names it). `on_context` is called
+    with the VerificationContext once verification starts (e.g. to
+    cancel() it from another thread), and `on_result` with each entry of
+    the result's procedures as soon as it is known. Other keyword options
+    are described in DEFAULT_OPTIONS.
+    """
+    start = time.perf_counter()
+    out = _Discard() if quiet else sys.stdout
+    # Phase times are cheap, and always taken; the rest only when measured
+    phases = stats if stats is not None else Stats()
+
+    # 1. Parse the file into shared, hash-consed nodes
+    with phases.phase('parse'):
+        if source is None:
+            with open(filename) as f:
+                source = f.read()
+        interner = Interner()
+        parse_cache = ParseCache(cache_dir) if cache_dir else None
+        parsed = parse_cache.get(source) if parse_cache else None
+        if parsed is not None:
+            # Passes that build new nodes need them in the interner
+            parsed = interner.convert_program(parsed)
+        else:
+            parsed = parse(source, interner, filename)
+            if parse_cache:
+                parse_cache.put(source, parsed)
     
     main_stmt = parsed['main']
-    PROC_ENV = parsed['procs']
-    ALL_VARS = parsed['vars']
+    procs = parsed['procs']
+    all_vars = parsed['vars']
+    fixed_sorts = {}
+
+    # Imported procedures are known by their contracts only; each module
+    # is verified on its own, once (see modules.ModuleLoader)
+    if parsed['imports']:
+        with phases.phase('imports'):
+            loader = ModuleLoader(lambda path: prove(path, jobs=jobs, cache_dir=cache_dir,
+                                                     quiet=quiet, **options).verified, out)
+            imported, fixed_sorts = loader.resolve(parsed['imports'], filename, interner)
+        for name in imported:
+            if name in procs:
+                raise Exception(f"{filename}: procedure '{name}' is both defined and imported")
+            all_vars.update(contract_vars(imported[name]))
+        procs = {**imported, **procs}
     
     # Add 'ret' to all vars if any procedures exist
-    if PROC_ENV:
-        ALL_VARS.add('ret')
+    if procs:
+        all_vars.add('ret')
         
-    print("--- Program AST ---")
-    pprint.pprint(main_stmt)
-    print("\n--- Procedures ---")
-    pprint.pprint(PROC_ENV)
-    print("\n--- Variables ---")
-    pprint.pprint(ALL_VARS)
-    print("-" * 20)
-    
-    # 2. Verify all procedures
-    all_procs_verified = True
-    if PROC_ENV:
-        print("--- Verifying Procedures ---")
-        for name, spec in PROC_ENV.items():
-            if not verify_proc(name, spec):
-                all_procs_verified = False
-        if not all_procs_verified:
-            print("Verification failed for one or more procedures. Halting.")
-            return
-        print("--- All procedures verified ---")
-    
-    # 3. Verify main program
-    print("\n--- Verifying Main Program ---")
-    post = BoolVal(True)
-    pre = wp(main_stmt, post)
-    
-    print("\nFinal VC (simplified):")
-    print(simplify(pre))
-    
-    s = Solver()
-    s.add(Not(pre))
+    if dump:
+        print("--- Program AST ---", file=out)
+        pprint.pprint(main_stmt, stream=out)
+        print("\n--- Procedures ---", file=out)
+        pprint.pprint(procs, stream=out)
+        print("\n--- Variables ---", file=out)
+        pprint.pprint(all_vars, stream=out)
+        print("-" * 20, file=out)
     
-    if s.check() == unsat:
-        print("\nProgram is VERIFIED.")
+    # 2. Give every variable a sort
+    with phases.phase('sorts'):
+        sorts = infer_sorts(procs, main_stmt, all_vars, fixed_sorts)
+
+    # Fill in missing loop invariants; inference checks candidates with
+    # wp, with all the program's own obligations switched off
+    if options.get('infer_invariants'):
+        from houdini import infer_invariants, print_inferred
+        infer_options = {**options, 'vcgen': 'wp', 'split': True, 'incremental': False}
+        with phases.phase('invariants'), \
+                VerificationContext(procs, all_vars, out, sorts, **infer_options) as ivctx:
+            main_stmt, procs, inferred = infer_invariants(main_stmt, procs, ivctx, wp,
+                                                          interner)
+        print_inferred(inferred, out)
+
+    # Only keep what the proof obligations depend on
+    if options.get('slice'):
+        with phases.phase('slice'):
+            main_stmt, procs, removed = slice_program(main_stmt, procs, interner)
+        print(f"Slicing removed {removed} statement(s).", file=out)
+
+    # 3. Verify, in a fresh context that is released when the run ends
+    cache = None
+    if cache_dir:
+        cache = VerdictCache(cache_dir, verdict_salt(sorts, {**DEFAULT_OPTIONS, **options}))
+    if cache is not None and all_cached(main_stmt, procs, cache):
+        # Nothing to check, so no need for Z3
+        procedures = []
+        for name in [name for name in procs if procs[name]['body'] is not None] + ['main']:
+            print(f"  ...{name} VERIFIED (cached).", file=out)
+            entry = {'name': name, 'verdict': 'cached', 'seconds': 0.0, 'detail': None,
+                     'goals': None}
+            procedures.append(entry)
+            if on_result is not None:
+                on_result(entry)
+        print("\nProgram is VERIFIED.", file=out)
+        return ProofResult(filename, 'verified', time.perf_counter() - start, procedures,
+                           stats=stats.report() if stats is not None else None)
+
+    with phases.phase('verify'), \
+            VerificationContext(procs, all_vars, out, sorts, **options) as vctx:
+        vctx.stats = stats
+        vctx.on_result = on_result
+        if on_context is not None:
+            on_context(vctx)
+        if cache_dir:
+            vctx.winners = WinnerStore(cache_dir)
+        try:
+            verified = verify_program(main_stmt, vctx, jobs, cache, dump)
+        finally:
+            vctx.winners.save()
+        procedures = vctx.results
+
+    verdicts = {p['verdict'] for p in procedures}
+    if verified:
+        verdict = 'verified'
+    elif 'unknown' in verdicts and 'failed' not in verdicts:
+        verdict = 'unknown'
     else:
-        print("\nProgram is INCORRECT.")
-        print("Counterexample:")
-        print(s.model())
+        verdict = 'failed'
+    return ProofResult(filename, verdict, time.perf_counter() - start, procedures,
+                       stats=stats.report() if stats is not None else None)
+
+def fuel_level(text):
+    """argparse type of --fuel: a number of unfoldings, at least 1."""
+    import argparse
+    try:
+        fuel = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: '{text}'")
+    if fuel < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, not {fuel}")
+    return fuel
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: python prover.py <filename.py>")
-        sys.exit(1)
-        
-    filename = sys.argv[1]
-    prove(filename)
\ No newline at end of file
+    import argparse
+    import os
+
+    argp = argparse.ArgumentParser(
+        description="Hoare logic prover for While-Py programs.")
+    argp.add_argument('paths', nargs='+',
+                      help="files, directories or glob patterns to prove")
+    argp.add_argument('-j', '--jobs', type=int, default=None,
+                      help="number of parallel workers: processes over files in "
+                           "batch mode, threads over procedures for a single "
+                           "file (default: one per CPU)")
+    argp.add_argument('--pattern', default='test_*.py',
+                      help="file pattern used when a directory is given")
+    argp.add_argument('--timeout', type=float, default=None,
+                      help="Z3 timeout per query, in seconds")
+    argp.add_argument('--cache-dir', default=None,
+                      help="remember verified procedures in this directory")
+    argp.add_argument('--vcgen', choices=('wp', 'linear', 'ssa'), default='wp',
+                      help="VC generator: reference wp, linear-size wp with "
+                           "named join postconditions, or forward SSA")
+    argp.add_argument('--split', action='store_true',
+                      help="check every assertion, call precondition and loop "
+                           "obligation as a separate goal, and report each")
+    argp.add_argument('--goal-jobs', type=int, default=None,
+                      help="with --split, threads solving goals (default: one per CPU)")
+    argp.add_argument('--goal-timeout', type=float, default=None,
+                      help="with --split, time limit per goal, in seconds")
+    argp.add_argument('--incremental', action='store_true',
+                      help="check all goals of a run on one incremental solver")
+    argp.add_argument('--portfolio', action='store_true',
+                      help="race several solver configurations on every check")
+    argp.add_argument('--slice', action='store_true',
+                      help="slice away statements no proof obligation depends on")
+    argp.add_argument('--infer-invariants', action='store_true',
+                      help="infer invariants for loops that have none")
+    argp.add_argument('--refute', action='store_true',
+                      help="run every procedure on random inputs before calling Z3, "
+                           "to find counterexamples cheaply; needs NumPy")
+    argp.add_argument('--refute-samples', type=int, default=256, metavar='N',
+                      help="inputs tried by --refute (default: 256)")
+    argp.add_argument('--fuel', type=fuel_level, default=None,
+                      help="unfold recursive function definitions this many levels "
+                           "deep instead of giving Z3 a quantified axiom")
+    argp.add_argument('--stats', action='store_true',
+                      help="for a single file, print phase times, VC sizes and "
+                           "solver statistics")
+    argp.add_argument('--stats-json', default=None,
+                      help="for a single file, write the statistics to this JSON file")
+    argp.add_argument('--profile', action='store_true',
+                      help="for a single file, run under cProfile and print the "
+                           "top functions")
+    argp.add_argument('--profile-out', default=None, metavar='FILE',
+                      help="with --profile (which it implies), write the profile to "
+                           "this file instead, for pstats or snakeviz")
+    argp.add_argument('-q', '--quiet', action='store_true',
+                      help="print nothing but the verdict (single file) or the summary")
+    argp.add_argument('--dump', action='store_true',
+                      help="print the parsed program and the simplified VC of main")
+    argp.add_argument('--json', default=None,
+                      help="write the verdicts of all files and procedures to this JSON file")
+    argp.add_argument('--junit', default=None,
+                      help="write the verdicts as JUnit XML to this file")
+    argp.add_argument('--watch', action='store_true',
+                      help="keep running, and re-verify what an edit to the file affects")
+    argp.add_argument('-v', '--verbose', action='store_true',
+                      help="in batch mode, print the full output of failing files")
+    args = argp.parse_args()
+    options = {'vcgen': args.vcgen, 'split': args.split,
+               'goal_jobs': args.goal_jobs, 'goal_timeout': args.goal_timeout,
+               'incremental': args.incremental, 'portfolio': args.portfolio,
+               'slice': args.slice, 'infer_invariants': args.infer_invariants,
+               'fuel': args.fuel, 'refute': args.refute_samples if args.refute else None}
+
+    from report import write_json, write_junit
+
+    def write_reports(results):
+        if args.json:
+            with open(args.json, 'w') as f:
+                write_json(results, f)
+        if args.junit:
+            with open(args.junit, 'w') as f:
+                write_junit(results, f)
+
+    if args.watch:
+        if len(args.paths) != 1 or not os.path.isfile(args.paths[0]):
+            argp.error("--watch takes a single file")
+        if args.timeout is not None:
+            load_solver()
+            set_param('timeout', int(args.timeout * 1000))
+        from watch import Watcher
+        try:
+            Watcher(args.paths[0], jobs=args.jobs, **options).watch()
+        except KeyboardInterrupt:
+            pass
+    elif len(args.paths) == 1 and os.path.isfile(args.paths[0]):
+        # Single file: keep the classic, fully verbose run.
+        if args.timeout is not None:
+            load_solver()
+            set_param('timeout', int(args.timeout * 1000))
+        import contextlib
+        import json
+        stats = Stats() if args.stats or args.stats_json else None
+        profiling = profiled(args.profile_out) if args.profile or args.profile_out \
+            else contextlib.nullcontext()
+        with profiling:
+            result = prove(args.paths[0], jobs=args.jobs, cache_dir=args.cache_dir, stats=stats,
+                           quiet=args.quiet, dump=args.dump, **options)
+        if args.quiet:
+            print(f"{result.path}: {result.verdict}")
+        if args.stats:
+            print_report(stats.report(), sys.stdout)
+        if args.stats_json:
+            with open(args.stats_json, 'w') as f:
+                json.dump(stats.report(), f, indent=2)
+        write_reports([result])
+        sys.exit(0 if result else 1)
+    else:
+        from batch import prove_many, print_summary
+        start = time.perf_counter()
+        results = prove_many(args.paths, jobs=args.jobs, timeout=args.timeout,
+                             pattern=args.pattern, cache_dir=args.cache_dir,
+                             progress=not args.quiet, quiet=args.quiet, dump=args.dump,
+                             **options)
+        ok = print_summary(results, verbose=args.verbose, wall=time.perf_counter() - start)
+        write_reports([ProofResult.from_dict(r['result']) for r in results])
+        sys.exit(0 if ok else 1)
\ No newline at end of file
@@ -0,0 +1,86 @@
+import json
+import xml.etree.ElementTree as ET
+
+class ProofResult:
+    """The outcome of proving one file, as returned by prover.prove().
+
+    `verdict` is 'verified', 'failed', 'unknown' (the solver gave up) or
+    'error' (the file could not be proved at all, see `error`). Each
+    entry of `procedures` (the main program last, named 'main') is a dict
+    with the procedure's name, verdict ('verified', 'failed', 'unknown' or
+    'cached'), the seconds taken, the counterexample model or the
+    solver's reason as text ('detail'), and, in split or incremental
+    mode, the results of its goals ('goals', see goals.solve_goals).
+    Procedures cancelled after another one failed have no entry. A
+    result is true iff the file is verified.
+    """
+
+    def __init__(self, path, verdict, seconds=0.0, procedures=(), error=None, stats=None):
+        self.path = path
+        self.verdict = verdict
+        self.seconds = seconds
+        self.procedures = list(procedures)
+        self.error = error
+        # instrument.Stats report, if the run was measured
+        self.stats = stats
+
+    @property
+    def verified(self):
+        return self.verdict == 'verified'
+
+    def __bool__(self):
+        return self.verified
+
+    def __repr__(self):
+        return f"ProofResult({self.path!r}, {self.verdict!r})"
+
+    def to_dict(self):
+        return {
+            'path': self.path,
+            'verdict': self.verdict,
+            'seconds': self.seconds,
+            'procedures': self.procedures,
+            'error': self.error,
+            'stats': self.stats,
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d['path'], d['verdict'], d['seconds'], d['procedures'], d['error'], d['stats'])
+
+def write_json(results, f):
+    """Writes a list of ProofResults as a JSON array."""
+    json.dump([r.to_dict() for r in results], f, indent=2)
+    f.write("\n")
+
+def write_junit(results, f):
+    """Writes a list of ProofResults as JUnit XML, for CI dashboards.
+
+    Every file is a test suite and every procedure (and main) a test
+    case. Failed procedures are failures with the counterexample; unknown
+    ones are errors; a file that could not be proved is one error.
+    """
+    root = ET.Element('testsuites')
+    for r in results:
+        suite = ET.SubElement(root, 'testsuite', name=r.path, time=f"{r.seconds:.3f}")
+        failures = errors = 0
+        cases = r.procedures
+        if r.verdict == 'error':
+            cases = [{'name': '<file>', 'verdict': 'error', 'seconds': r.seconds,
+                      'detail': r.error}]
+        for p in cases:
+            case = ET.SubElement(suite, 'testcase', classname=r.path, name=p['name'],
+                                 time=f"{p['seconds']:.3f}")
+            if p['verdict'] == 'failed':
+                failures += 1
+                failure = ET.SubElement(case, 'failure', message="counterexample found")
+                failure.text = p['detail']
+            elif p['verdict'] in ('unknown', 'error'):
+                errors += 1
+                error = ET.SubElement(case, 'error', message=p['verdict'])
+                error.text = p['detail']
+        suite.set('tests', str(len(cases)))
+        suite.set('failures', str(failures))
+        suite.set('errors', str(errors))
+    ET.ElementTree(root).write(f, encoding='unicode', xml_declaration=True)
+    f.write("\n")
@@ -0,0 +1,148 @@
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+def find_callees(node):
+    """Recursively finds the names of all procedures called in an AST node."""
+    callees = set()
+    if isinstance(node, (list, tuple)):
+        if node and node[0] in ('call', 'call_expr'):
+            callees.add(node[1])
+        for sub in node[1:] if node and isinstance(node[0], str) else node:
+            callees.update(find_callees(sub))
+    return callees
+
+def call_graph(procs):
+    """Maps every procedure to the procedures it calls.
+
+    Both statement calls ('call') and calls inside expressions and
+    contracts ('call_expr') count as edges.
+    """
+    graph = {}
+    for name, spec in procs.items():
+        callees = find_callees(spec['body'])
+        callees |= find_callees(spec['requires'])
+        callees |= find_callees(spec['ensures'])
+        graph[name] = sorted(c for c in callees if c in procs)
+    return graph
+
+def strongly_connected_components(graph):
+    """Tarjan's algorithm. Returns the SCCs callees-first (reverse topological order)."""
+    index = {}
+    lowlink = {}
+    on_stack = set()
+    stack = []
+    sccs = []
+    counter = 0
+
+    for root in graph:
+        if root in index:
+            continue
+        # Iterative DFS, so deep call chains do not hit the recursion limit
+        work = [(root, iter(graph[root]))]
+        index[root] = lowlink[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+        while work:
+            node, children = work[-1]
+            for child in children:
+                if child not in index:
+                    index[child] = lowlink[child] = counter
+                    counter += 1
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(graph[child])))
+                    break
+                elif child in on_stack:
+                    lowlink[node] = min(lowlink[node], index[child])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+                if lowlink[node] == index[node]:
+                    scc = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        scc.append(member)
+                        if member == node:
+                            break
+                    sccs.append(sorted(scc))
+    return sccs
+
+def verify_procs(vctx, check, jobs=None, cache=None):
+    """Verifies all procedures of `vctx` in parallel. Returns True if all pass.
+
+    Procedures are checked modularly against their callees' contracts, so
+    every SCC of the call graph is an independent task. Each task runs on
+    a worker thread in its own VerificationContext (and so its own Z3
+    Context), with its output buffered and printed as a whole when it
+    finishes. `check(name, spec, vctx)` verifies one procedure. As soon as
+    one procedure fails, pending tasks are cancelled and running solvers
+    are interrupted. Procedures found in `cache` (a VerdictCache) are not
+    checked again.
+    """
+    procs = vctx.proc_env
+    # Imported procedures (no body) were verified with their own module
+    sccs = [scc for scc in strongly_connected_components(call_graph(procs))
+            if any(procs[name]['body'] is not None for name in scc)]
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+
+    failed = threading.Event()
+    running = {}
+    lock = threading.Lock()
+
+    def run_scc(scc):
+        out = io.StringIO()
+        with vctx.fork(out=out) as worker:
+            with lock:
+                running[id(worker)] = worker
+            try:
+                for name in scc:
+                    if failed.is_set():
+                        return None, out.getvalue()
+                    key = cache.key(name, procs) if cache is not None else None
+                    if key is not None and cache.get(key):
+                        print(f"  ...Procedure {name} VERIFIED (cached).", file=out)
+                        worker.record(name, 'cached')
+                        continue
+                    if not check(name, procs[name], worker):
+                        # A solver interrupted because another task failed
+                        # also reports failure; count it as cancelled.
+                        return (None if failed.is_set() else False), out.getvalue()
+                    if key is not None:
+                        cache.put(key, name)
+                return True, out.getvalue()
+            finally:
+                with lock:
+                    del running[id(worker)]
+
+    all_verified = True
+    with ThreadPoolExecutor(max_workers=max(1, min(jobs, len(sccs)))) as pool:
+        pending = {pool.submit(run_scc, scc): scc for scc in sccs}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                scc = pending.pop(future)
+                verdict, output = (None, '') if future.cancelled() else future.result()
+                if verdict is None:
+                    # Cancelled or interrupted after another procedure failed
+                    print(f"  ...Cancelled {', '.join(scc)}.", file=vctx.out)
+                    continue
+                vctx.out.write(output)
+                if not verdict:
+                    all_verified = False
+                    if not failed.is_set():
+                        failed.set()
+                        for other in pending:
+                            other.cancel()
+                        with lock:
+                            for worker in running.values():
+                                worker.interrupt()
+    if cache is not None:
+        cache.save()
+    return all_verified
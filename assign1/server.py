@@ -0,0 +1,281 @@
+import asyncio
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from z3 import set_param
+from prover import DEFAULT_OPTIONS, prove
+from report import ProofResult
+
+# JSON-RPC 2.0 error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+REQUEST_TIMED_OUT = -32001
+REQUEST_CANCELLED = -32800
+
+# Longest accepted request line (the program source is inside it)
+MAX_LINE = 64 * 1024 * 1024
+
+class Run:
+    """A verify request being served."""
+
+    def __init__(self, request_id):
+        self.id = request_id
+        # The run's VerificationContext, once verification has started
+        self.vctx = None
+        # Set by the worker thread when it takes up the request
+        self.started = False
+        # Set when the request is cancelled or times out
+        self.stopped = threading.Event()
+        self.stop_requested = asyncio.Event()
+        self.reason = None
+
+    def stop(self, reason):
+        if self.reason is None:
+            self.reason = reason
+        self.stopped.set()
+        self.stop_requested.set()
+
+class Server:
+    """Serves verify requests as line-delimited JSON-RPC 2.0.
+
+    Z3 and the prover stay loaded between requests. Each request is
+    proved on a pool of `jobs` threads, each run in its own Z3 Context
+    (see prover.VerificationContext). Methods:
+
+    verify {source, path?, options?, timeout?}
+        Proves `source`. While it runs, a 'procedure' notification
+        {id, name, verdict, seconds, detail, goals} is sent as each
+        procedure (and finally main) is checked; the response is the
+        ProofResult as a dict. After `timeout` seconds (or when
+        cancelled) the run is stopped and the response is an error.
+    cancel {id}
+        Stops the verify request `id` of this connection.
+    ping
+        Answers "pong".
+    shutdown
+        Stops the server once the response is sent.
+
+    When a client closes its input, its pending requests are still
+    answered; only shutdown and cancel stop them early.
+    """
+
+    def __init__(self, jobs=None, cache_dir=None, options=None):
+        self.pool = ThreadPoolExecutor(max_workers=jobs or os.cpu_count() or 1)
+        self.cache_dir = cache_dir
+        self.options = options or {}
+        self.done = None
+
+    async def serve(self, reader, write):
+        """Answers the requests read from `reader` until it is closed.
+
+        `write(text)` sends one line; it is only called on the event loop.
+        """
+        runs = {}
+        tasks = set()
+
+        def send(message):
+            write(json.dumps({'jsonrpc': '2.0', **message}) + "\n")
+
+        while not self.done.is_set():
+            try:
+                line = await reader.readline()
+            except ValueError:
+                send({'id': None, 'error': {'code': INVALID_REQUEST, 'message': "Request too long"}})
+                break
+            if not line:
+                break
+            if not line.strip():
+                continue
+            try:
+                message = json.loads(line)
+            except ValueError as e:
+                send({'id': None, 'error': {'code': PARSE_ERROR, 'message': str(e)}})
+                continue
+            if not isinstance(message, dict) or not isinstance(message.get('method'), str):
+                send({'id': None, 'error': {'code': INVALID_REQUEST, 'message': "Not a request"}})
+                continue
+            task = asyncio.ensure_future(self.dispatch(message, send, runs))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        # The client has sent everything (e.g. requests piped in): answer
+        # what it asked for, unless the server is shutting down
+        if self.done.is_set():
+            for run in list(runs.values()):
+                run.stop('cancelled')
+        if tasks:
+            await asyncio.wait(tasks)
+
+    async def dispatch(self, message, send, runs):
+        request_id = message.get('id')
+        params = message.get('params') or {}
+        method = message['method']
+        try:
+            if method == 'verify':
+                result = await self.verify(request_id, params, send, runs)
+            elif method == 'cancel':
+                run = runs.get(params.get('id'))
+                if run is not None:
+                    run.stop('cancelled')
+                result = run is not None
+            elif method == 'ping':
+                result = 'pong'
+            elif method == 'shutdown':
+                self.done.set()
+                result = None
+            else:
+                raise RpcError(METHOD_NOT_FOUND, f"Unknown method '{method}'")
+        except RpcError as e:
+            if request_id is not None:
+                send({'id': request_id, 'error': {'code': e.code, 'message': e.message}})
+            return
+        if request_id is not None:
+            send({'id': request_id, 'result': result})
+
+    async def verify(self, request_id, params, send, runs):
+        source = params.get('source')
+        if not isinstance(source, str):
+            raise RpcError(INVALID_PARAMS, "'source' must be the program text")
+        options = {**self.options, **(params.get('options') or {})}
+        unknown = set(options) - set(DEFAULT_OPTIONS)
+        if unknown:
+            raise RpcError(INVALID_PARAMS, f"Unknown verifier options: {', '.join(sorted(unknown))}")
+        if request_id in runs:
+            raise RpcError(INVALID_REQUEST, f"Request {request_id} is already running")
+        path = params.get('path', '<request>')
+        timeout = params.get('timeout')
+
+        loop = asyncio.get_running_loop()
+        run = runs[request_id] = Run(request_id)
+
+        def on_result(entry):
+            loop.call_soon_threadsafe(send, {'method': 'procedure',
+                                             'params': {'id': request_id, **entry}})
+
+        def on_context(vctx):
+            run.vctx = vctx
+            if run.stopped.is_set():
+                vctx.cancel()
+
+        def work():
+            run.started = True
+            if run.stopped.is_set():
+                return None
+            try:
+                # Requests already run in parallel; keep each on one thread
+                result = prove(path, jobs=1, cache_dir=self.cache_dir, quiet=True, source=source,
+                               on_context=on_context, on_result=on_result, **options)
+            except Exception as e:
+                result = ProofResult(path, 'error', error=f"{type(e).__name__}: {e}")
+            return result.to_dict()
+
+        future = loop.run_in_executor(self.pool, work)
+        stop = asyncio.ensure_future(run.stop_requested.wait())
+        try:
+            done, _ = await asyncio.wait([future, stop], timeout=timeout,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if future not in done:
+                run.stop('timeout')
+                # Interrupt until the run notices; a check may start just
+                # after an interrupt. A request still queued is dropped
+                # when a worker takes it up.
+                while run.started and not future.done():
+                    if run.vctx is not None:
+                        run.vctx.cancel()
+                    await asyncio.wait([future], timeout=0.05)
+            result = future.result() if future.done() else None
+        finally:
+            stop.cancel()
+            del runs[request_id]
+
+        if run.reason == 'timeout':
+            raise RpcError(REQUEST_TIMED_OUT, f"Verification took longer than {timeout}s")
+        if run.reason == 'cancelled':
+            raise RpcError(REQUEST_CANCELLED, "Verification was cancelled")
+        return result
+
+class RpcError(Exception):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+async def serve_stdio(server):
+    """Serves one client on stdin/stdout."""
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=MAX_LINE)
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+
+    def write(text):
+        sys.stdout.write(text)
+        sys.stdout.flush()
+
+    # Stop reading once a shutdown request is answered
+    serving = asyncio.ensure_future(server.serve(reader, write))
+    done = asyncio.ensure_future(server.done.wait())
+    await asyncio.wait([serving, done], return_when=asyncio.FIRST_COMPLETED)
+    done.cancel()
+    if not serving.done():
+        serving.cancel()
+
+async def serve_socket(server, path):
+    """Serves any number of clients on the Unix socket `path`, until shutdown."""
+    async def client(reader, writer):
+        try:
+            await server.serve(reader, lambda text: writer.write(text.encode()))
+            await writer.drain()
+        except asyncio.CancelledError:
+            # The server is shutting down
+            pass
+        finally:
+            writer.close()
+
+    if os.path.exists(path):
+        os.remove(path)
+    listener = await asyncio.start_unix_server(client, path, limit=MAX_LINE)
+    try:
+        async with listener:
+            await server.done.wait()
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+async def main(args, options):
+    server = Server(args.jobs, args.cache_dir, options)
+    server.done = asyncio.Event()
+    try:
+        if args.socket:
+            await serve_socket(server, args.socket)
+        else:
+            await serve_stdio(server)
+    finally:
+        server.pool.shutdown(wait=False, cancel_futures=True)
+
+if __name__ == "__main__":
+    import argparse
+
+    argp = argparse.ArgumentParser(
+        description="Keeps the prover loaded and serves verify requests as JSON-RPC.")
+    argp.add_argument('--socket', default=None,
+                      help="listen on this Unix socket (default: serve stdin/stdout)")
+    argp.add_argument('-j', '--jobs', type=int, default=None,
+                      help="requests verified at once (default: one per CPU)")
+    argp.add_argument('--timeout', type=float, default=None,
+                      help="Z3 timeout per query, in seconds")
+    argp.add_argument('--cache-dir', default=None,
+                      help="remember verified procedures in this directory")
+    argp.add_argument('--vcgen', choices=('wp', 'linear', 'ssa'), default='wp',
+                      help="default VC generator; requests can override any option")
+    args = argp.parse_args()
+
+    if args.timeout is not None:
+        set_param('timeout', int(args.timeout * 1000))
+    try:
+        asyncio.run(main(args, {'vcgen': args.vcgen}))
+    except KeyboardInterrupt:
+        pass
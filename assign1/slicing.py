@@ -0,0 +1,164 @@
+def expr_vars(expr):
+    """Names of the current-state variables an expression reads.
+
+    old(v) is not counted: it denotes the entry value, which no statement
+    can change.
+    """
+    found = set()
+    todo = [expr]
+    while todo:
+        e = todo.pop()
+        if e[0] == 'var':
+            found.add(e[1])
+        elif e[0] == 'select':
+            if e[1][0] == 'var':
+                found.add(e[1][1])
+            todo.append(e[2])
+        elif e[0] == 'call_expr':
+            todo.extend(e[2])
+        elif e[0] not in ('const', 'old'):
+            todo.extend(e[1:])
+    return found
+
+def old_vars(expr):
+    """Names v used as old(v) (or old(v)[i]) in an expression."""
+    found = set()
+    todo = [expr]
+    while todo:
+        e = todo.pop()
+        if e[0] == 'old':
+            found.add(e[1])
+        elif e[0] == 'call_expr':
+            todo.extend(e[2])
+        elif e[0] != 'const' and e[0] != 'var':
+            todo.extend(a for a in e[1:] if isinstance(a, (list, tuple)))
+    return found
+
+class Slicer:
+    """Backward cone-of-influence slicing of While-Py statements.
+
+    A statement is kept if it is a proof obligation (assert, loop, call
+    with a non-trivial precondition), an assumption (assume, call with a
+    non-trivial postcondition) or may write a variable that a kept
+    statement, or the postcondition, later reads; `live` is the set of
+    such variables. Conditionals are kept when a branch keeps something
+    (control dependence), and a call writes its modifies set and lhs.
+    Assumptions are always kept, since they can constrain a live
+    variable through others (assume(x == y) with only x live), so only
+    writes no kept statement reads are dropped and the sliced program
+    has the same verdict as the original.
+    """
+
+    def __init__(self, procs, interner=None):
+        self.procs = procs
+        self.interner = interner
+        self.removed = 0
+
+    def node(self, tag, *args):
+        if self.interner is None:
+            return [tag, *args]
+        return self.interner.node(tag, *args)
+
+    def seq(self, items):
+        if self.interner is None:
+            return list(items)
+        return self.interner.tuple(items)
+
+    def block(self, stmts, live):
+        """Slices a list of statements. Returns (kept statements, live before)."""
+        kept = []
+        for s in reversed(stmts):
+            s, live = self.stmt(s, live)
+            if s is not None:
+                kept.append(s)
+        return kept[::-1], live
+
+    def stmt(self, s, live):
+        """Slices one statement. Returns (statement or None, live before)."""
+        tag = s[0]
+        if tag == 'seq':
+            kept, live = self.block(s[1:], live)
+            return self.node('seq', *kept), live
+
+        elif tag == 'assert':
+            return s, live | expr_vars(s[1])
+
+        elif tag == 'assume':
+            return s, live | expr_vars(s[1])
+
+        elif tag in ('assign', 'return'):
+            var = s[1] if tag == 'assign' else 'ret'
+            value = s[2] if tag == 'assign' else s[1]
+            if var in live:
+                return s, (live - {var}) | expr_vars(value)
+
+        elif tag == 'tastore':
+            if s[1] in live:
+                # The rest of the array is still read
+                return s, live | expr_vars(s[2]) | expr_vars(s[3])
+
+        elif tag == 'if':
+            then_kept, then_live = self.block(s[2][1:], live)
+            else_kept, else_live = self.block(s[3][1:], live)
+            if then_kept or else_kept:
+                return (self.node('if', s[1], self.node('seq', *then_kept),
+                                  self.node('seq', *(else_kept or [self.node('skip')]))),
+                        then_live | else_live | expr_vars(s[1]))
+            self.removed += 1
+            return None, live
+
+        elif tag == 'while':
+            # Loops are obligations (entry, preservation). Under the while
+            # rule the body runs against the invariant, and what follows
+            # the loop against the entry state.
+            inv_vars = set().union(*[expr_vars(inv) for inv in s[3]])
+            body, body_live = self.block(s[2], inv_vars)
+            return (self.node('while', s[1], self.seq(body), s[3]),
+                    live | inv_vars | body_live | expr_vars(s[1]))
+
+        elif tag == 'call':
+            fname, actuals, lhs = s[1], s[2], s[3]
+            spec = self.procs.get(fname)
+            if spec is None:
+                # Let VC generation report the undefined procedure
+                return s, live
+            written = set(spec['modifies']) | {lhs or 'ret'}
+            req, ens = spec['requires'], spec['ensures']
+            trivial = all(c[0] == 'const' and c[1] is True for c in (req, ens))
+            if written & live or not trivial:
+                # The contract reads the actuals (for the params), the
+                # pre-state through old(), and unmodified globals
+                params = set(spec['params'])
+                read = ((expr_vars(req) - params)
+                        | (expr_vars(spec['ensures']) - params - written - {'ret'})
+                        | old_vars(spec['ensures']))
+                for a in actuals:
+                    read |= expr_vars(a)
+                return s, (live - written) | read
+
+        elif tag in ('skip', 'invariant', 'proc'):
+            return None, live
+
+        else:
+            raise NotImplementedError(f"slice: {s}")
+
+        self.removed += 1
+        return None, live
+
+def slice_program(main, procs, interner=None):
+    """Slices the main program and every procedure body.
+
+    Main is sliced against its assertions, each body against its own
+    assertions and ensures clause; contracts are left alone. Returns
+    (main, procs, number of statements removed).
+    """
+    slicer = Slicer(procs, interner)
+    main, _ = slicer.stmt(main, set())
+    sliced = {}
+    for name, spec in procs.items():
+        if spec['body'] is None:
+            sliced[name] = spec
+            continue
+        body, _ = slicer.block(spec['body'], expr_vars(spec['ensures']))
+        sliced[name] = {**spec, 'body': slicer.seq(body)}
+    return main, sliced, slicer.removed
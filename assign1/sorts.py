@@ -0,0 +1,165 @@
+INT, BOOL, ARRAY = 'int', 'bool', 'array'
+
+class SortInference:
+    """Infers one sort (int, bool or array) for every program variable.
+
+    Variables are global in While-Py (procedures share the state and 'ret'),
+    so there is one sort per name. Each use of a variable constrains it,
+    and constraints are solved by unification: a type is either
+    ('sort', s) for a known sort or ('var', name) for the still unknown
+    sort of a variable. Unknowns are kept in a union-find structure.
+    """
+
+    def __init__(self, procs):
+        self.procs = procs
+        self.parent = {}
+        # Root variable -> its sort, once known
+        self.known = {}
+
+    # --- Union-find ---
+
+    def find(self, name):
+        root = name
+        while self.parent.get(root, root) != root:
+            root = self.parent[root]
+        # Path compression
+        while name != root:
+            self.parent[name], name = root, self.parent[name]
+        return root
+
+    def resolve(self, t):
+        """A type with variables replaced by their sort where it is known."""
+        if t[0] == 'var':
+            root = self.find(t[1])
+            if root in self.known:
+                return ('sort', self.known[root])
+            return ('var', root)
+        return t
+
+    def unify(self, t1, t2, node):
+        t1, t2 = self.resolve(t1), self.resolve(t2)
+        if t1 == t2:
+            return
+        if t1[0] == 'sort' and t2[0] == 'sort':
+            raise Exception(f"Sort error: {t1[1]} used as {t2[1]} in {node[0]!r} node {node}")
+        if t1[0] == 'sort':
+            t1, t2 = t2, t1
+        # t1 is an unknown variable
+        self.parent[t1[1]] = t2[1] if t2[0] == 'var' else t1[1]
+        if t2[0] == 'sort':
+            self.known[t1[1]] = t2[1]
+
+    def expect(self, node, sort):
+        self.unify(self.expr(node), ('sort', sort), node)
+
+    # --- Expressions ---
+
+    def expr(self, node):
+        """Returns the type of expression `node`, constraining its variables."""
+        tag = node[0]
+        if tag == 'const':
+            return ('sort', BOOL if isinstance(node[1], bool) else INT)
+        elif tag in ('var', 'old'):
+            # old(v) has the sort of v
+            return ('var', node[1])
+        elif tag == 'select':
+            self.unify(('var', node[1][1]), ('sort', ARRAY), node)
+            self.expect(node[2], INT)
+            return ('sort', INT)
+        elif tag in ('<', '<=', '>', '>='):
+            self.expect(node[1], INT)
+            self.expect(node[2], INT)
+            return ('sort', BOOL)
+        elif tag in ('==', '!='):
+            self.unify(self.expr(node[1]), self.expr(node[2]), node)
+            return ('sort', BOOL)
+        elif tag in ('+', '-', '*', '/'):
+            for arg in node[1:]:
+                self.expect(arg, INT)
+            return ('sort', INT)
+        elif tag in ('and', 'or', 'not'):
+            for arg in node[1:]:
+                self.expect(arg, BOOL)
+            return ('sort', BOOL)
+        elif tag == 'call_expr':
+            # Procedures used in expressions are Int -> Int functions
+            spec = self.procs.get(node[1])
+            for arg in node[2]:
+                self.expect(arg, INT)
+            for p in spec['params'] if spec else ():
+                self.unify(('var', p), ('sort', INT), node)
+            return ('sort', INT)
+        raise NotImplementedError(f"sorts: {node}")
+
+    # --- Statements ---
+
+    def stmt(self, node):
+        tag = node[0]
+        if tag == 'seq':
+            for s in node[1:]:
+                self.stmt(s)
+        elif tag in ('assume', 'assert', 'invariant'):
+            self.expect(node[1], BOOL)
+        elif tag == 'if':
+            self.expect(node[1], BOOL)
+            self.stmt(node[2])
+            self.stmt(node[3])
+        elif tag == 'while':
+            self.expect(node[1], BOOL)
+            for s in node[2]:
+                self.stmt(s)
+            for inv in node[3]:
+                self.expect(inv, BOOL)
+        elif tag == 'assign':
+            self.unify(('var', node[1]), self.expr(node[2]), node)
+        elif tag == 'return':
+            self.unify(('var', 'ret'), self.expr(node[1]), node)
+        elif tag == 'tastore':
+            self.unify(('var', node[1]), ('sort', ARRAY), node)
+            self.expect(node[2], INT)
+            self.expect(node[3], INT)
+        elif tag == 'call':
+            spec = self.procs.get(node[1])
+            if spec is not None:
+                for p, a in zip(spec['params'], node[2]):
+                    self.unify(('var', p), self.expr(a), node)
+            else:
+                for a in node[2]:
+                    self.expr(a)
+            if node[3]:
+                self.unify(('var', node[3]), ('var', 'ret'), node)
+        elif tag in ('skip', 'proc'):
+            pass
+        else:
+            raise NotImplementedError(f"sorts: {node}")
+
+    def proc(self, spec):
+        self.expect(spec['requires'], BOOL)
+        self.expect(spec['ensures'], BOOL)
+        # Imported procedures have only a contract
+        for s in spec['body'] or ():
+            self.stmt(s)
+
+    def sort_of(self, name):
+        """The inferred sort of `name`; unconstrained variables are ints."""
+        return self.known.get(self.find(name), INT)
+
+def infer_sorts(procs, main=None, names=(), fixed=None):
+    """Maps every variable of the program to INT, BOOL or ARRAY.
+
+    `fixed` maps variables to sorts decided elsewhere, e.g. by the module
+    an imported procedure was verified in. Raises an Exception if some
+    variable is used with two sorts.
+    """
+    inference = SortInference(procs)
+    for name, sort in (fixed or {}).items():
+        inference.unify(('var', name), ('sort', sort), ('var', name))
+    for spec in procs.values():
+        inference.proc(spec)
+    if main is not None:
+        inference.stmt(main)
+    names = set(names) | set(inference.parent)
+    for spec in procs.values():
+        names.update(spec['params'])
+        names.update(spec['modifies'])
+    return {name: inference.sort_of(name) for name in names}
@@ -0,0 +1,203 @@
+from z3 import *
+from parser import pretty
+
+class PassiveVC:
+    """Forward VC generator over passive (SSA) form.
+
+    Every assignment gives the target a new version, a fresh constant named
+    'x@<id>', and records the fact `x@<id> == e`. Assertions become goals
+    `path => e`, where `path` is the conjunction of facts on the way there;
+    conditionals join their versions with phi equalities. Nothing is ever
+    substituted into an accumulated formula, and all path conditions are
+    shared, so the VC is built in one pass and is linear in program size.
+
+    The statement rules mirror wp(), which stays the reference engine.
+    """
+
+    def __init__(self, vctx, ret_var=None, old_suffix=''):
+        self.vctx = vctx
+        self.ret_var = ret_var
+        self.old_suffix = old_suffix
+        # Current version of each variable; missing means the initial symbol
+        self.versions = {}
+        self.goals = []
+
+    # --- Versions ---
+
+    def _var(self, name, versions=None):
+        """The constant for the current (or given) version, at the variable's sort."""
+        version = (self.versions if versions is None else versions).get(name)
+        return self.vctx.var(name, '' if version is None else f"@{version}")
+
+    def _bump(self, name):
+        """Gives `name` a new version and returns it."""
+        self.versions[name] = self.vctx.next_fresh_id()
+        return self.versions[name]
+
+    def _env(self, versions=None):
+        """An expr_to_z3 environment reading the given (default: current) state."""
+        def env(kind, name):
+            if kind in ('var', 'array'):
+                return self._var(name, versions)
+            return None # old(v) keeps its usual meaning
+        return env
+
+    def expr(self, expr_ast, env=None):
+        return self.vctx.translate(expr_ast, self.old_suffix, env or self._env())
+
+    # --- Statements ---
+
+    def goal(self, outer, path, cond, kind, label):
+        """Records the obligation that `cond` holds whenever the path does."""
+        self.goals.append(Implies(And(outer, path), self.vctx.obligation(kind, cond, label)))
+
+    def run(self, stmt, outer, path):
+        """Executes `stmt` symbolically; returns the extended path.
+
+        `path` holds the facts of the current block and `outer` those of
+        the enclosing blocks. Keeping them apart means a conditional adds
+        its branches' facts once, instead of copying the path into both.
+        """
+        ctx = self.vctx.ctx
+
+        if stmt[0] == 'seq':
+            for s in stmt[1:]:
+                path = self.run(s, outer, path)
+            return path
+
+        elif stmt[0] == 'assume':
+            return And(path, self.expr(stmt[1]))
+
+        elif stmt[0] == 'assert':
+            cond = self.expr(stmt[1])
+            self.goal(outer, path, cond, 'assert', pretty(stmt[1]))
+            return And(path, cond)
+
+        elif stmt[0] == 'if':
+            test = self.expr(stmt[1])
+            inner = And(outer, path)
+            before = dict(self.versions)
+            then_path = self.run(stmt[2], inner, test)
+            then_versions = self.versions
+            self.versions = dict(before)
+            else_path = self.run(stmt[3], inner, Not(test))
+            else_versions = self.versions
+
+            # Phi: variables changed on either side get a joined version
+            self.versions = dict(before)
+            then_eqs, else_eqs = [], []
+            for name in sorted(set(then_versions) | set(else_versions)):
+                if then_versions.get(name) == else_versions.get(name):
+                    self.versions[name] = then_versions.get(name)
+                    continue
+                self._bump(name)
+                then_eqs.append(self._var(name) == self._var(name, then_versions))
+                else_eqs.append(self._var(name) == self._var(name, else_versions))
+            return And(path, Or(And(then_path, *then_eqs, ctx), And(else_path, *else_eqs, ctx)))
+
+        elif stmt[0] in ('skip', 'invariant', 'proc'):
+            return path
+
+        elif stmt[0] in ('assign', 'return'):
+            if stmt[0] == 'assign':
+                var, value = stmt[1], stmt[2]
+            else:
+                assert self.ret_var is not None, "Return statement found outside function body"
+                var, value = self.ret_var, stmt[1]
+            value_z3 = self.expr(value)
+            self._bump(var)
+            return And(path, self._var(var) == value_z3)
+
+        elif stmt[0] == 'tastore':
+            arr_name = stmt[1]
+            idx = self.expr(stmt[2])
+            val = self.expr(stmt[3])
+            stored = Store(self._var(arr_name), idx, val)
+            self._bump(arr_name)
+            return And(path, self._var(arr_name) == stored)
+
+        elif stmt[0] == 'while':
+            # Same (entry-state) rule as wp: the invariant holds on entry,
+            # is preserved by one iteration, and with the negated test
+            # implies what follows.
+            invariants = stmt[3]
+            if not invariants:
+                print(f"Warning: While loop has no invariants. Verification will likely fail.", file=self.vctx.out)
+                self.goal(outer, path, BoolVal(False, ctx), 'invariant', "loop has no invariant")
+                return BoolVal(False, ctx)
+            cond = self.expr(stmt[1])
+            invariant = And(*[self.expr(inv) for inv in invariants], ctx)
+            label = ' and '.join(pretty(inv) for inv in invariants)
+            self.goal(outer, path, invariant, 'loop entry', label)
+
+            entry = dict(self.versions)
+            inner = And(outer, path, invariant, cond)
+            body_path = self.run(['seq', *stmt[2]], inner, BoolVal(True, ctx))
+            self.goal(inner, body_path, And(*[self.expr(inv) for inv in invariants], ctx),
+                      'loop preserved', label)
+            self.versions = entry
+            return And(path, invariant, Not(cond))
+
+        elif stmt[0] == 'call':
+            return self.call(stmt, outer, path)
+
+        else:
+            raise NotImplementedError(f"ssa: {stmt}")
+
+    def call(self, stmt, outer, path):
+        """x = f(e1, e2): check requires, havoc modifies and lhs, assume ensures."""
+        fname, actuals, lhs = stmt[1], stmt[2], stmt[3]
+        try:
+            spec = self.vctx.proc_env[fname]
+        except KeyError:
+            raise Exception(f"Attempted to call undefined procedure '{fname}'")
+        params = spec['params']
+
+        # Actuals are evaluated in the pre-call state
+        pre = dict(self.versions)
+        actual_z3 = dict(zip(params, [self.expr(a) for a in actuals]))
+        pre_env = self._env(pre)
+
+        def contract_env(post_env):
+            def env(kind, name):
+                if kind == 'var' and name in actual_z3:
+                    return actual_z3[name]
+                if kind == 'old':
+                    return pre_env('var', name)
+                if kind == 'old_array':
+                    return pre_env('array', name)
+                return post_env(kind, name)
+            return env
+
+        # 1. Precondition check
+        self.goal(outer, path, self.expr(spec['requires'], contract_env(pre_env)),
+                  'requires', f"{fname}: {pretty(spec['requires'])}")
+
+        # 2. Havoc: modified variables and the lhs get new versions;
+        #    everything else keeps its version, which is the frame condition
+        for v in spec['modifies']:
+            self._bump(v)
+        ret_name = lhs if lhs else 'ret'
+        self._bump(ret_name)
+        post_env = self._env()
+
+        def ens_env(kind, name):
+            if kind == 'var' and name == 'ret':
+                return self._var(ret_name)
+            return contract_env(post_env)(kind, name)
+
+        # 3. Assume the postcondition
+        return And(path, self.expr(spec['ensures'], ens_env))
+
+def ssa_vc(stmt, post_ast, vctx, ret_var=None, old_suffix=''):
+    """VC of `stmt` with postcondition `post_ast`, built over passive form.
+
+    Counterpart of wp(stmt, post): the result is over the initial-state
+    symbols, and valid iff every assertion, call precondition, loop
+    obligation and the postcondition hold.
+    """
+    gen = PassiveVC(vctx, ret_var, old_suffix)
+    true = BoolVal(True, vctx.ctx)
+    path = gen.run(stmt, true, true)
+    gen.goal(true, path, gen.expr(post_ast), 'ensures', pretty(post_ast))
+    return And(*gen.goals, vctx.ctx)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The prover's modules are flat files in assign1/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
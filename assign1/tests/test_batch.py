@@ -0,0 +1,15 @@
+import os
+
+from batch import prove_many, print_summary
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_prove_many(capsys):
+    results = prove_many([os.path.join(HERE, 'test_proc*.py')], jobs=2, quiet=True)
+    assert [os.path.basename(r['path']) for r in results] == \
+        ['test_proc1.py', 'test_proc2.py', 'test_proc3.py']
+    assert {r['verdict'] for r in results} == {'verified'}
+    assert print_summary(results, wall=1.5)
+    out = capsys.readouterr().out
+    assert "Wall time: 1.50s" in out
+    assert "Sum time:" in out
@@ -0,0 +1,89 @@
+import multiprocessing
+import sys
+import textwrap
+
+from cache import VerdictCache, ParseCache, verdict_salt
+from parser import parse
+from prover import prove
+
+SOURCE = textwrap.dedent("""
+def inc(x):
+  requires(True)
+  ensures(ret == x + 1)
+  modifies()
+  return x + 1
+
+def dec(x):
+  requires(True)
+  ensures(ret == x - 1)
+  modifies()
+  return x - 1
+
+y = inc(1)
+assert(y == 2)
+""")
+
+def verdicts(directory, source=SOURCE, **options):
+    result = prove('<test>', cache_dir=str(directory), quiet=True, source=source, **options)
+    assert result.verified
+    return {p['name']: p['verdict'] for p in result.procedures}
+
+def test_round_trip(tmp_path):
+    cache = VerdictCache(str(tmp_path))
+    cache.put('k', 'p')
+    cache.save()
+    assert VerdictCache(str(tmp_path)).get('k') == {'proc': 'p'}
+
+def test_salt_changes_keys(tmp_path):
+    procs = {'p': {'params': ['x'], 'body': [['return', ['var', 'x']]],
+                   'requires': ['const', True], 'ensures': ['const', True], 'modifies': []}}
+    plain = VerdictCache(str(tmp_path), verdict_salt({}, {'vcgen': 'wp'}))
+    other = VerdictCache(str(tmp_path), verdict_salt({}, {'vcgen': 'ssa'}))
+    arrays = VerdictCache(str(tmp_path), verdict_salt({'x': 'array'}, {'vcgen': 'wp'}))
+    ints = VerdictCache(str(tmp_path), verdict_salt({'x': 'int'}, {'vcgen': 'wp'}))
+    assert plain.key('p', procs) != other.key('p', procs)
+    assert plain.key('p', procs) != arrays.key('p', procs)
+    # Int is the default sort
+    assert plain.key('p', procs) == ints.key('p', procs)
+
+def test_cached_until_changed(tmp_path):
+    assert set(verdicts(tmp_path).values()) == {'verified'}
+    assert set(verdicts(tmp_path).values()) == {'cached'}
+    # Other options give other verdicts
+    assert set(verdicts(tmp_path, vcgen='ssa').values()) == {'verified'}
+    # A new body invalidates only its own procedure
+    edited = SOURCE.replace("return x - 1", "r = x - 1\n  return r")
+    assert verdicts(tmp_path, edited) == {'inc': 'cached', 'dec': 'verified', 'main': 'cached'}
+    # A new contract also invalidates its callers
+    edited = SOURCE.replace("ensures(ret == x + 1)", "ensures(ret > x)")
+    edited = edited.replace("assert(y == 2)", "assert(y > 1)")
+    assert verdicts(tmp_path, edited) == {'inc': 'verified', 'dec': 'cached', 'main': 'verified'}
+
+def save_many(directory, worker):
+    for i in range(20):
+        cache = VerdictCache(directory)
+        cache.put(f"{worker}-{i}", 'p')
+        cache.save()
+
+def test_concurrent_processes_keep_entries(tmp_path):
+    workers = [multiprocessing.Process(target=save_many, args=(str(tmp_path), w))
+               for w in range(6)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    cache = VerdictCache(str(tmp_path))
+    assert all(cache.get(f"{w}-{i}") for w in range(6) for i in range(20))
+
+def test_parse_cache_round_trip(tmp_path):
+    cache = ParseCache(str(tmp_path))
+    assert cache.get(SOURCE) is None
+    parsed = parse(SOURCE, None, '<test>')
+    cache.put(SOURCE, parsed)
+    assert cache.get(SOURCE) == parsed
+
+def test_parse_cache_is_per_python(tmp_path, monkeypatch):
+    cache = ParseCache(str(tmp_path))
+    cache.put(SOURCE, parse(SOURCE, None, '<test>'))
+    monkeypatch.setattr(sys.implementation, 'cache_tag', 'other-interpreter')
+    assert cache.get(SOURCE) is None
@@ -0,0 +1,102 @@
+import io
+import os
+import textwrap
+
+import pytest
+
+from instrument import vc_metrics
+from parser import parse
+from prover import VerificationContext, main_vc, proc_vc, prove
+from sorts import infer_sorts
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def vcs(source, vcgen='wp'):
+    """The VC (with its axioms and definitions) of every procedure and main."""
+    parsed = parse(source, None, '<test>')
+    procs, all_vars = parsed['procs'], parsed['vars'] | {'ret'}
+    sorts = infer_sorts(procs, parsed['main'], all_vars)
+    found = {}
+    with VerificationContext(procs, all_vars, io.StringIO(), sorts, vcgen=vcgen) as vctx:
+        for name, spec in procs.items():
+            vc, axioms = proc_vc(name, spec, vctx)
+            found[name] = vc_metrics([vc, *axioms, *vctx.take_definitions()])
+        found['main'] = vc_metrics([main_vc(parsed['main'], vctx), *vctx.take_definitions()])
+    return found
+
+@pytest.mark.parametrize('vcgen', ['wp', 'linear', 'ssa'])
+@pytest.mark.parametrize('name', ['test_proc1.py', 'test_proc2.py', 'test_proc3.py'])
+def test_calls_are_quantifier_free(name, vcgen):
+    with open(os.path.join(HERE, name)) as f:
+        metrics = vcs(f.read(), vcgen)
+    assert all(m['quantifiers'] == 0 for m in metrics.values()), metrics
+
+MUTUAL = textwrap.dedent("""
+def even(n):
+  requires(n >= 0)
+  ensures(ret >= 0 and ret <= 1)
+  modifies()
+  if n == 0:
+    r = 0
+  else:
+    r = odd(n - 1)
+  return 1 - r
+
+def odd(n):
+  requires(n >= 0)
+  ensures(ret >= 0 and ret <= 1)
+  modifies()
+  if n == 0:
+    r = 1
+  else:
+    r = even(n - 1)
+  return 1 - r
+
+x = even(4)
+assert(x >= 0)
+""")
+
+RECURSIVE = [
+    ('test_recursive1.py', None, 'failed'),
+    ('test_recursive2.py', None, 'failed'),
+    ('mutual', MUTUAL, 'verified'),
+    ('mutual, wrong', MUTUAL.replace("assert(x >= 0)", "assert(x == 1)"), 'failed'),
+]
+
+@pytest.mark.parametrize('name, source, expected', RECURSIVE, ids=[r[0] for r in RECURSIVE])
+def test_recursive_verdicts(name, source, expected):
+    path = os.path.join(HERE, name) if source is None else '<test>'
+    for vcgen in ('wp', 'linear', 'ssa'):
+        assert prove(path, quiet=True, source=source, vcgen=vcgen).verdict == expected
+
+FRAME = textwrap.dedent("""
+def setg():
+  requires(True)
+  ensures(g == 1)
+  modifies('g')
+  g = 1
+
+h = 5
+g = 0
+setg()
+""")
+
+@pytest.mark.parametrize('vcgen', ['wp', 'linear', 'ssa'])
+def test_only_modifies_is_havocked(vcgen):
+    def verdict(assertion):
+        return prove('<test>', quiet=True, source=FRAME + f"assert({assertion})\n",
+                     vcgen=vcgen).verdict
+    assert verdict("h == 5") == 'verified'
+    assert verdict("g == 1") == 'verified'
+    assert verdict("g == 0") == 'failed'
+
+def with_globals(n):
+    """FRAME, and a procedure that is never called, writing n other globals."""
+    lines = ["def other():", "  requires(True)", "  ensures(True)",
+             f"  modifies({', '.join(repr(f'u{i}') for i in range(n))})"]
+    lines += [f"  u{i} = {i}" for i in range(n)] or ["  skip = 0"]
+    return "\n".join(lines) + "\n" + FRAME + "setg()\nassert(h == 5 and g == 1)\n"
+
+@pytest.mark.parametrize('vcgen', ['wp', 'linear', 'ssa'])
+def test_call_cost_ignores_other_globals(vcgen):
+    assert vcs(with_globals(1), vcgen)['main'] == vcs(with_globals(40), vcgen)['main']
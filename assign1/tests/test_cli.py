@@ -0,0 +1,29 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def run(*args):
+    return subprocess.run([sys.executable, 'prover.py', *args], cwd=HERE,
+                          capture_output=True, text=True)
+
+def test_profile_takes_no_value():
+    result = run('--profile', 'test_proc1.py')
+    assert result.returncode == 0, result.stderr
+    assert "Program is VERIFIED." in result.stdout
+    assert "cumulative" in result.stdout
+
+def test_profile_out(tmp_path):
+    path = str(tmp_path / 'run.prof')
+    result = run('--profile-out', path, 'test_proc1.py')
+    assert result.returncode == 0, result.stderr
+    assert os.path.getsize(path) > 0
+
+@pytest.mark.parametrize('fuel', ['0', '-1', 'x'])
+def test_fuel_must_be_positive(fuel):
+    result = run('--fuel', fuel, 'test_recursive2.py')
+    assert result.returncode == 2
+    assert "argument --fuel" in result.stderr
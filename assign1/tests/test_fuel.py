@@ -0,0 +1,24 @@
+import os
+
+import pytest
+
+from prover import prove
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def sum_array_verdict(**options):
+    result = prove(os.path.join(HERE, 'test_recursive2.py'), quiet=True, **options)
+    return {p['name']: p['verdict'] for p in result.procedures}['sum_array']
+
+@pytest.mark.parametrize('fuel', [None, 1, 2, 5])
+def test_sum_array_verifies(fuel):
+    assert sum_array_verdict(fuel=fuel) == 'verified'
+
+@pytest.mark.parametrize('fuel', [0, -1, 1.5])
+def test_no_fuel_is_rejected(fuel):
+    with pytest.raises(ValueError):
+        sum_array_verdict(fuel=fuel)
+
+def test_rejected_without_recursion():
+    with pytest.raises(ValueError):
+        prove(os.path.join(HERE, 'test_proc1.py'), quiet=True, fuel=0)
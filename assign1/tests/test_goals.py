@@ -0,0 +1,29 @@
+import textwrap
+
+import pytest
+
+from prover import prove
+
+SOURCE = textwrap.dedent("""
+def inc(x):
+  requires(x >= 0)
+  ensures(ret == x + 1)
+  modifies()
+  if x > 5:
+    return x + 1
+  return x + 1
+
+y = inc(1)
+assert(y == 2)
+""")
+
+def goals(**options):
+    result = prove('<test>', quiet=True, source=SOURCE, **options)
+    assert result.verdict == 'verified'
+    return {p['name']: sorted(g['kind'] for g in p['goals']) for p in result.procedures}
+
+@pytest.mark.parametrize('vcgen', ['wp', 'linear', 'ssa'])
+@pytest.mark.parametrize('mode', ['split', 'incremental'])
+def test_one_goal_per_obligation(vcgen, mode):
+    assert goals(vcgen=vcgen, **{mode: True}) == {'inc': ['ensures'],
+                                                  'main': ['assert', 'requires']}
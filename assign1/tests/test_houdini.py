@@ -0,0 +1,57 @@
+import io
+import textwrap
+
+from houdini import Houdini, infer_invariants
+from parser import parse, pretty
+from prover import VerificationContext, prove, wp
+from sorts import infer_sorts
+
+def infer(source):
+    """The invariants inferred for each loop, as text."""
+    parsed = parse(textwrap.dedent(source), None, '<test>')
+    sorts = infer_sorts(parsed['procs'], parsed['main'], parsed['vars'])
+    with VerificationContext(parsed['procs'], parsed['vars'], io.StringIO(), sorts,
+                             vcgen='wp', split=True) as vctx:
+        _, _, inferred = infer_invariants(parsed['main'], parsed['procs'], vctx, wp)
+    return [{pretty(inv) for inv in invariants} for _, invariants in inferred]
+
+COUNTER = """
+i = 0
+while i < 10:
+    i = i + 1
+assert(i == 10)
+"""
+
+def test_infers_loop_bounds():
+    assert infer(COUNTER) == [{'i >= 0', 'i <= 10'}]
+    assert prove('<test>', quiet=True, source=textwrap.dedent(COUNTER),
+                 infer_invariants=True).verified
+
+def test_false_candidates_pruned_by_one_query(monkeypatch):
+    pruned = []
+    failing = Houdini.failing
+
+    def spy(self, goals):
+        found = failing(self, goals)
+        pruned.append(len(found))
+        return found
+
+    monkeypatch.setattr(Houdini, 'failing', spy)
+    infer(COUNTER)
+    # Initiation: i >= 1 and i >= 10 fail on entry, both in one core
+    assert pruned[0] == 2
+    # Consecution drops i <= 0, then i <= 1, and stops once nothing fails
+    assert pruned[1:] == [1, 1, 0]
+
+def test_nested_loops():
+    found = infer("""
+    i = 0
+    while i < 10:
+        j = 0
+        while j < 5:
+            j = j + 1
+        i = i + 1
+    """)
+    # Inner loops are annotated first
+    assert found[0] >= {'j >= 0', 'j <= 5'}
+    assert found[1] >= {'i >= 0', 'i <= 10'}
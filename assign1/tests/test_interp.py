@@ -0,0 +1,46 @@
+import os
+import textwrap
+
+import pytest
+
+pytest.importorskip('numpy')
+
+from prover import prove
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def verdict(source, **options):
+    return prove('<test>', quiet=True, source=textwrap.dedent(source), **options).verdict
+
+def test_refutes_recursive1():
+    result = prove(os.path.join(HERE, 'test_recursive1.py'), quiet=True, refute=256)
+    assert result.verdict == 'failed'
+    assert "fails on input" in result.procedures[-1]['detail']
+
+@pytest.mark.parametrize('name', ['test_proc1.py', 'test_proc2.py', 'test_proc3.py',
+                                  'test_array1.py', 'test_array2.py', 'test_array3.py'])
+def test_no_false_alarms(name):
+    assert prove(os.path.join(HERE, name), quiet=True, refute=256).verified
+
+def test_loops_run_concretely():
+    # The invariant is not preserved (i = 9 after the step from 8), which
+    # a concrete run sees; wp checks the code after a loop against the
+    # entry state, and verifies it
+    source = """
+    i = 0
+    while i < 10:
+        invariant(i <= 8)
+        i = i + 1
+    """
+    assert verdict(source) == 'verified'
+    assert verdict(source, refute=64) == 'failed'
+
+def test_preserved_invariant():
+    source = """
+    i = 0
+    while i < 10:
+        invariant(i <= 10)
+        i = i + 1
+    assert(i == 10)
+    """
+    assert verdict(source, refute=64) == 'verified'
@@ -0,0 +1,26 @@
+from ir import Interner
+from parser import parse
+
+def test_equal_nodes_are_shared():
+    interner = Interner()
+    a = interner.convert(['+', ['var', 'x'], ['const', 1]])
+    b = interner.node('+', interner.node('var', 'x'), interner.node('const', 1))
+    assert a is b
+
+def test_constants_keep_their_type():
+    interner = Interner()
+    assert interner.node('const', True) is not interner.node('const', 1)
+
+def test_parser_output_is_interned():
+    source = "x = y + 1\nz = y + 1\n"
+    parsed = parse(source, Interner(), '<test>')
+    first, second = parsed['main'][1], parsed['main'][2]
+    assert first[2] is second[2]
+
+def test_convert_program_matches_interned_parse():
+    source = "def f(a):\n  requires(a > 0)\n  ensures(ret == a)\n  modifies()\n  return a\n\nx = f(1)\n"
+    interner = Interner()
+    parsed = parse(source, interner, '<test>')
+    converted = interner.convert_program(parse(source, None, '<test>'))
+    assert converted['main'] is parsed['main']
+    assert converted['procs']['f']['ensures'] is parsed['procs']['f']['ensures']
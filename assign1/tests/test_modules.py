@@ -0,0 +1,99 @@
+import os
+import textwrap
+
+import pytest
+
+from modules import ModuleLoader, summary_path
+from prover import prove
+
+LIB = """
+def inc(x):
+  requires(True)
+  ensures(ret == x + 1)
+  modifies()
+  return x + 1
+"""
+
+MID = """
+from lib import inc
+
+def inc2(x):
+  requires(True)
+  ensures(ret == x + 2)
+  modifies()
+  y = inc(x)
+  z = inc(y)
+  return z
+"""
+
+def write(directory, name, source):
+    path = os.path.join(str(directory), name + '.py')
+    with open(path, 'w') as f:
+        f.write(textwrap.dedent(source))
+    return path
+
+class Loader(ModuleLoader):
+    """A loader that records which modules it verifies, and trusts them."""
+
+    def __init__(self):
+        super().__init__(self.record)
+        self.verified = []
+
+    def record(self, path):
+        self.verified.append(os.path.basename(path))
+        return True
+
+def load(directory):
+    loader = Loader()
+    summary = loader.load(os.path.join(str(directory), 'mid.py'))
+    return summary, sorted(loader.verified)
+
+def test_summaries_are_reused(tmp_path):
+    write(tmp_path, 'lib', LIB)
+    write(tmp_path, 'mid', MID)
+    summary, verified = load(tmp_path)
+    assert verified == ['lib.py', 'mid.py']
+    # Only mid's own contracts, which do not mention inc
+    assert sorted(summary['procs']) == ['inc2']
+    assert os.path.exists(summary_path(os.path.join(str(tmp_path), 'lib.py')))
+    assert load(tmp_path) == (summary, [])
+
+def test_new_body_keeps_importers(tmp_path):
+    write(tmp_path, 'lib', LIB)
+    write(tmp_path, 'mid', MID)
+    summary, _ = load(tmp_path)
+    write(tmp_path, 'lib', LIB.replace("return x + 1", "r = x + 1\n  return r"))
+    assert load(tmp_path) == (summary, ['lib.py'])
+
+def test_new_contract_invalidates_importers(tmp_path):
+    write(tmp_path, 'lib', LIB)
+    write(tmp_path, 'mid', MID)
+    summary, _ = load(tmp_path)
+    write(tmp_path, 'lib', LIB.replace("requires(True)", "requires(x >= 0)"))
+    new, verified = load(tmp_path)
+    assert verified == ['lib.py', 'mid.py']
+    assert new['imports']['lib'] != summary['imports']['lib']
+    # mid's own contracts did not change, so neither did its importers'
+    assert new['fingerprint'] == summary['fingerprint']
+
+def test_import_errors(tmp_path):
+    write(tmp_path, 'lib', LIB)
+    loader = Loader()
+    with pytest.raises(Exception, match="no procedure 'dec'"):
+        loader.resolve([('lib', ['dec'])], os.path.join(str(tmp_path), 'main.py'))
+    write(tmp_path, 'a', "from b import g\n")
+    write(tmp_path, 'b', "from a import f\n")
+    with pytest.raises(Exception, match="Cyclic import"):
+        Loader().load(os.path.join(str(tmp_path), 'a.py'))
+
+def test_prove_with_imports(tmp_path):
+    write(tmp_path, 'lib', LIB)
+    write(tmp_path, 'mid', MID)
+    main = write(tmp_path, 'main', "from mid import inc2\n\ny = inc2(1)\nassert(y == 3)\n")
+    assert prove(main, quiet=True).verified
+    bad = write(tmp_path, 'bad', "from mid import inc2\n\ny = inc2(1)\nassert(y == 4)\n")
+    assert prove(bad, quiet=True).verdict == 'failed'
+    write(tmp_path, 'lib', LIB.replace("ret == x + 1", "ret == x + 2"))
+    # lib's new contract does not hold, so nothing importing it verifies
+    with pytest.raises(Exception, match="does not verify"):
+        prove(main, quiet=True)
@@ -0,0 +1,27 @@
+import multiprocessing
+
+from portfolio import CONFIGS, WinnerStore
+
+def test_winner_goes_first(tmp_path):
+    last = list(CONFIGS)[-1]
+    store = WinnerStore(str(tmp_path))
+    store.record('p', last)
+    store.save()
+    assert WinnerStore(str(tmp_path)).order('p')[0] == last
+
+def save_many(directory, worker):
+    name = list(CONFIGS)[0]
+    for i in range(20):
+        store = WinnerStore(directory)
+        store.record(f"{worker}-{i}", name)
+        store.save()
+
+def test_concurrent_processes_keep_winners(tmp_path):
+    workers = [multiprocessing.Process(target=save_many, args=(str(tmp_path), w))
+               for w in range(6)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    winners = WinnerStore(str(tmp_path)).winners
+    assert all(f"{w}-{i}" in winners for w in range(6) for i in range(20))
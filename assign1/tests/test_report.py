@@ -0,0 +1,43 @@
+import io
+import json
+import os
+import xml.etree.ElementTree as ET
+
+from prover import prove
+from report import ProofResult, write_json, write_junit
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def results():
+    return [prove(os.path.join(HERE, name), quiet=True)
+            for name in ('test_proc1.py', 'test_recursive1.py')]
+
+def test_json_round_trip():
+    original = results()
+    text = io.StringIO()
+    write_json(original, text)
+    loaded = [ProofResult.from_dict(d) for d in json.loads(text.getvalue())]
+    assert [r.to_dict() for r in loaded] == [r.to_dict() for r in original]
+    assert [bool(r) for r in loaded] == [True, False]
+    main = loaded[1].procedures[-1]
+    assert main['name'] == 'main' and main['verdict'] == 'failed' and main['detail']
+
+def test_junit():
+    original = results()
+    text = io.StringIO()
+    write_junit(original + [ProofResult('broken.py', 'error', error="SyntaxError: x")], text)
+    root = ET.fromstring(text.getvalue().split('?>', 1)[1])
+    suites = root.findall('testsuite')
+    assert [s.get('name') for s in suites] == [r.path for r in original] + ['broken.py']
+
+    counts = [(s.get('tests'), s.get('failures'), s.get('errors')) for s in suites]
+    assert counts == [('2', '0', '0'), ('2', '1', '0'), ('1', '0', '1')]
+
+    # One test case per procedure, main last
+    for suite, result in zip(suites, original):
+        assert [c.get('name') for c in suite.findall('testcase')] == \
+            [p['name'] for p in result.procedures]
+    failure = suites[1].find("testcase[@name='main']/failure")
+    assert failure is not None
+    assert failure.text == original[1].procedures[-1]['detail']
+    assert suites[2].find('testcase/error').text == "SyntaxError: x"
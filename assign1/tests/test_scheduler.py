@@ -0,0 +1,29 @@
+import os
+
+import pytest
+
+from prover import prove
+from scheduler import strongly_connected_components
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_sccs_callees_first():
+    graph = {'main': ['a', 'b'], 'a': ['b'], 'b': ['c'], 'c': ['b'], 'd': []}
+    sccs = strongly_connected_components(graph)
+    assert sorted(map(tuple, sccs)) == [('a',), ('b', 'c'), ('d',), ('main',)]
+    position = {name: i for i, scc in enumerate(sccs) for name in scc}
+    assert position['b'] < position['a'] < position['main']
+
+def test_deep_chain_does_not_recurse():
+    graph = {f"p{i}": [f"p{i + 1}"] for i in range(5000)}
+    graph['p5000'] = []
+    sccs = strongly_connected_components(graph)
+    assert sccs[0] == ['p5000'] and sccs[-1] == ['p0']
+
+@pytest.mark.parametrize('jobs', [1, 4])
+def test_parallel_verdicts(jobs):
+    verdicts = {name: prove(os.path.join(HERE, name), jobs=jobs, quiet=True).verdict
+                for name in ('test_proc1.py', 'test_proc2.py', 'test_proc3.py',
+                             'test_recursive1.py')}
+    assert verdicts == {'test_proc1.py': 'verified', 'test_proc2.py': 'verified',
+                        'test_proc3.py': 'verified', 'test_recursive1.py': 'failed'}
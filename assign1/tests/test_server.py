@@ -0,0 +1,25 @@
+import json
+import os
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def serve(*messages):
+    """Pipes `messages` into a stdio server; returns the responses by id."""
+    lines = "".join(json.dumps({'jsonrpc': '2.0', **m}) + "\n" for m in messages)
+    done = subprocess.run([sys.executable, 'server.py'], cwd=HERE, input=lines,
+                          capture_output=True, text=True, timeout=120)
+    replies = [json.loads(line) for line in done.stdout.splitlines()]
+    return {r['id']: r for r in replies if 'id' in r}
+
+def test_piped_requests_are_answered():
+    with open(os.path.join(HERE, 'test_proc1.py')) as f:
+        source = f.read()
+    replies = serve({'id': 1, 'method': 'verify', 'params': {'source': source}},
+                    {'id': 2, 'method': 'verify',
+                     'params': {'source': source, 'options': {'vcgen': 'ssa'}}},
+                    {'id': 3, 'method': 'ping'})
+    assert replies[1]['result']['verdict'] == 'verified'
+    assert replies[2]['result']['verdict'] == 'verified'
+    assert replies[3]['result'] == 'pong'
@@ -0,0 +1,67 @@
+import textwrap
+
+import pytest
+
+from prover import prove
+from slicing import slice_program
+from parser import parse
+
+def verdict(source, **options):
+    return prove('<test>', quiet=True, source=textwrap.dedent(source), **options).verdict
+
+# Assumes that constrain the asserted variable only through another one
+INDIRECT_ASSUMES = [
+    """
+    y = x
+    assume(x > 0)
+    assert(y > 0)
+    """,
+    """
+    assume(x == y)
+    z = 1
+    assume(y > 3)
+    assert(x > 3)
+    """,
+]
+
+@pytest.mark.parametrize('source', INDIRECT_ASSUMES, ids=['assignment', 'equality'])
+def test_slicing_keeps_indirect_assumes(source):
+    assert verdict(source) == 'verified'
+    assert verdict(source, slice=True) == 'verified'
+
+def test_slicing_keeps_call_postconditions():
+    source = """
+    def pos(a):
+      requires(True)
+      ensures(a > 0)
+      modifies()
+      assume(a > 0)
+      return 0
+
+    y = x
+    z = pos(x)
+    assert(y > 0)
+    """
+    assert verdict(source) == 'verified'
+    assert verdict(source, slice=True) == 'verified'
+
+def test_slicing_drops_dead_writes():
+    source = textwrap.dedent("""
+    x = 0
+    z = 0
+    z = 1
+    x = 2
+    assert(x == 2)
+    """)
+    parsed = parse(source, None, '<test>')
+    _, _, removed = slice_program(parsed['main'], parsed['procs'])
+    assert removed == 3
+    assert verdict(source, slice=True) == 'verified'
+
+def test_slicing_keeps_failures():
+    source = """
+    assume(x > 0)
+    assert(y > 0)
+    """
+    assert verdict(source) == 'failed'
+    assert verdict(source, slice=True) == 'failed'
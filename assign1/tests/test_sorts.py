@@ -0,0 +1,26 @@
+import pytest
+
+from parser import parse
+from sorts import infer_sorts, ARRAY, BOOL, INT
+
+def sorts(source, fixed=None):
+    parsed = parse(source, None, '<test>')
+    return infer_sorts(parsed['procs'], parsed['main'], parsed['vars'], fixed)
+
+def test_inferred_from_use():
+    found = sorts("b = True\nn = a[0]\nm = n + 1\nc = d\nassert(c[1] == 2)\n")
+    assert found['b'] == BOOL
+    assert found['a'] == ARRAY and found['c'] == ARRAY and found['d'] == ARRAY
+    assert found['n'] == INT and found['m'] == INT
+
+def test_names_do_not_matter():
+    # An array not called arr, and an int that is
+    found = sorts("values[0] = 1\narr = 3\n")
+    assert found['values'] == ARRAY and found['arr'] == INT
+
+def test_fixed_sorts():
+    assert sorts("x = y\n", {'y': ARRAY})['x'] == ARRAY
+
+def test_conflicting_uses():
+    with pytest.raises(Exception):
+        sorts("a[0] = 1\nb = a + 1\n")
@@ -0,0 +1,80 @@
+import io
+import os
+import textwrap
+
+import pytest
+
+from bench import gen_ifs
+from instrument import vc_metrics
+from parser import parse
+from prover import VerificationContext, main_vc, prove
+from sorts import infer_sorts
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+EXPECTED = {
+    'test_array1.py': 'verified',
+    'test_array2.py': 'verified',
+    'test_array3.py': 'verified',
+    'test_proc1.py': 'verified',
+    'test_proc2.py': 'verified',
+    'test_proc3.py': 'verified',
+    'test_recursive1.py': 'failed',
+    'test_recursive2.py': 'failed',
+}
+
+@pytest.mark.parametrize('vcgen', ['wp', 'linear', 'ssa'])
+@pytest.mark.parametrize('mode', [{}, {'split': True}, {'incremental': True}],
+                         ids=['whole', 'split', 'incremental'])
+def test_generators_agree(vcgen, mode):
+    verdicts = {name: prove(os.path.join(HERE, name), quiet=True, vcgen=vcgen, **mode).verdict
+                for name in EXPECTED}
+    assert verdicts == EXPECTED
+
+def main_vc_nodes(source, vcgen):
+    parsed = parse(source, None, '<test>')
+    sorts = infer_sorts(parsed['procs'], parsed['main'], parsed['vars'])
+    with VerificationContext(parsed['procs'], parsed['vars'], io.StringIO(), sorts,
+                             vcgen=vcgen) as vctx:
+        vc = main_vc(parsed['main'], vctx)
+        return vc_metrics([vc, *vctx.definitions])['nodes']
+
+@pytest.mark.parametrize('vcgen', ['linear', 'ssa'])
+def test_vc_size_is_linear(vcgen):
+    small, large = main_vc_nodes(gen_ifs(32), vcgen), main_vc_nodes(gen_ifs(128), vcgen)
+    # Four times the program; a quadratic VC would be sixteen times larger
+    assert large < 5 * small
+
+# Joins must still see what is written before them, outside the branches
+JOINS = [
+    ("""
+    x = 5
+    if c > 0:
+        y = 1
+    else:
+        y = 2
+    assert(x == 5 and y >= 1)
+    """, 'verified'),
+    ("""
+    x = 5
+    if c > 0:
+        y = 1
+    else:
+        y = 2
+    assert(x == 6)
+    """, 'failed'),
+    ("""
+    x = 0
+    if c > 0:
+        x = x + 1
+    if d > 0:
+        x = x + 1
+    assert(x <= 2 and c <= 0 or x >= 1)
+    """, 'verified'),
+]
+
+@pytest.mark.parametrize('source, expected', JOINS)
+def test_linear_joins(source, expected):
+    for vcgen in ('wp', 'linear'):
+        result = prove('<test>', quiet=True, source=textwrap.dedent(source), vcgen=vcgen)
+        assert result.verdict == expected
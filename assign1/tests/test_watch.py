@@ -0,0 +1,83 @@
+import io
+import os
+import textwrap
+
+from watch import Watcher
+
+SOURCE = textwrap.dedent("""
+def inc(x):
+  requires(True)
+  ensures(ret == x + 1)
+  modifies()
+  return x + 1
+
+def dec(x):
+  requires(True)
+  ensures(ret == x - 1)
+  modifies()
+  return x - 1
+
+y = inc(1)
+assert(y == 2)
+""")
+
+def check(watcher, path, source):
+    with open(path, 'w') as f:
+        f.write(source)
+    watcher.out = io.StringIO()
+    assert watcher.check()
+    return watcher.out.getvalue()
+
+def test_only_changes_are_verified(tmp_path):
+    path = str(tmp_path / 'prog.py')
+    watcher = Watcher(path)
+    out = check(watcher, path, SOURCE)
+    assert "3 definition(s) parsed, 3 to verify" in out
+    assert "Program is VERIFIED." in out
+
+    # A new body: only that procedure
+    edited = SOURCE.replace("return x - 1", "r = x - 1\n  return r")
+    out = check(watcher, path, edited)
+    assert "1 definition(s) parsed, 1 to verify" in out
+    assert "dec: VERIFIED" in out
+
+    # A new contract: the procedure and its caller
+    out = check(watcher, path, edited.replace("ret == x + 1", "ret == x + 2"))
+    assert "1 definition(s) parsed, 2 to verify" in out
+    assert "Not verified: inc, main" in out
+
+    # Back to the previous version
+    out = check(watcher, path, edited)
+    assert "2 to verify" in out
+    assert "Program is VERIFIED." in out
+
+def test_parse_errors_keep_the_last_version(tmp_path):
+    path = str(tmp_path / 'prog.py')
+    watcher = Watcher(path)
+    check(watcher, path, SOURCE)
+    with open(path, 'w') as f:
+        f.write(SOURCE + "\nwhile\n")
+    watcher.out = io.StringIO()
+    assert not watcher.check()
+    assert "Parse error" in watcher.out.getvalue()
+    assert "0 to verify" in check(watcher, path, SOURCE)
+
+def test_verification_errors_are_verdicts(tmp_path):
+    path = str(tmp_path / 'prog.py')
+    watcher = Watcher(path)
+    broken = SOURCE.replace("y = inc(1)", "y = g(1)")
+    out = check(watcher, path, broken)
+    assert "main: ERROR" in out
+    assert "undefined procedure 'g'" in out
+    assert "Not verified: main" in out
+    # Unchanged, the error is remembered rather than raised again
+    assert "main: ERROR (unchanged)" in check(watcher, path, broken + "\n")
+    out = check(watcher, path, SOURCE)
+    assert "1 to verify" in out
+    assert "Program is VERIFIED." in out
+
+    # The same for a procedure, checked on the worker threads
+    out = check(watcher, path, SOURCE.replace("return x - 1", "r = h(x)\n  return x - 1"))
+    assert "dec: ERROR" in out
+    assert "Not verified: dec" in out
+    assert "Program is VERIFIED." in check(watcher, path, SOURCE)
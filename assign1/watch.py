@@ -0,0 +1,195 @@
+import ast
+import io
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from parser import WhilePyVisitor
+from ir import Interner
+from sorts import infer_sorts
+from slicing import slice_program
+from houdini import infer_invariants
+from cache import proc_fingerprint, main_fingerprint, verdict_salt, salted
+from modules import ModuleLoader, contract_vars
+from prover import VerificationContext, verify_proc, verify_main, wp, prove
+
+class Watcher:
+    """Re-verifies a file whenever it changes, redoing only what the edit affects.
+
+    The parsed definitions and every verdict stay in memory. After an
+    edit, only the function definitions (and main) whose text changed are
+    visited again, and a procedure is re-verified only if its fingerprint
+    (see cache.proc_fingerprint) changed: when its own body or contract
+    changed, or the contract of a procedure it calls. Main is re-verified
+    when its statements or its callees' contracts change. The variables
+    that are not Int are part of every fingerprint, since an edit
+    anywhere can change their sorts.
+    Unlike prove(), a failing procedure does not stop the others or main,
+    and an error in one (e.g. a call to an undefined procedure) is only
+    that definition's verdict.
+    Imported modules are not watched: their summaries are checked again
+    when this file changes.
+    """
+
+    def __init__(self, path, jobs=None, out=None, **options):
+        self.path = path
+        self.jobs = jobs
+        self.out = out if out is not None else sys.stdout
+        self.options = options
+        self.interner = Interner()
+        # Function name -> (AST dump, spec, variables), and the same for
+        # main with its imports added
+        self.defs = {}
+        self.main = None
+        # Fingerprint -> procedure entry (see report.ProofResult), for the
+        # current version of the file
+        self.verdicts = {}
+        self.mtime = None
+
+    def load(self, source):
+        """Parses `source`, visiting only the definitions that changed. Returns how many were."""
+        tree = ast.parse(source, filename=self.path)
+        defs = {}
+        body = []
+        visited = 0
+        for node in tree.body:
+            if not isinstance(node, ast.FunctionDef):
+                body.append(node)
+                continue
+            # ast.dump leaves out line numbers, so moving a definition is no change
+            text = ast.dump(node)
+            entry = self.defs.get(node.name)
+            if entry is None or entry[0] != text:
+                visitor = WhilePyVisitor(self.interner)
+                visitor.visit_FunctionDef(node)
+                entry = (text, visitor.procs[node.name], visitor.vars)
+                visited += 1
+            defs[node.name] = entry
+
+        module = ast.Module(body=body, type_ignores=[])
+        text = ast.dump(module)
+        main = self.main
+        if main is None or main[0] != text:
+            visitor = WhilePyVisitor(self.interner)
+            main = (text, visitor.visit(module)['main'], visitor.vars, visitor.imports)
+            visited += 1
+
+        # Only keep the new version once all of it parsed
+        self.defs, self.main = defs, main
+        return visited
+
+    def check(self):
+        """Loads the file and re-verifies what changed. Returns False on a parse error."""
+        with open(self.path) as f:
+            source = f.read()
+        try:
+            visited = self.load(source)
+        except (SyntaxError, NotImplementedError, AssertionError) as e:
+            print(f"Parse error: {type(e).__name__}: {e}", file=self.out)
+            return False
+
+        procs = {name: entry[1] for name, entry in self.defs.items()}
+        main_stmt = self.main[1]
+        all_vars = set(self.main[2]).union(*[entry[2] for entry in self.defs.values()])
+        try:
+            imported, fixed = {}, {}
+            if self.main[3]:
+                loader = ModuleLoader(lambda path: prove(path, quiet=True, **self.options).verified,
+                                      self.out)
+                imported, fixed = loader.resolve(self.main[3], self.path, self.interner)
+            for name in imported:
+                if name in procs:
+                    raise Exception(f"procedure '{name}' is both defined and imported")
+                all_vars.update(contract_vars(imported[name]))
+            own = list(procs)
+            procs = {**imported, **procs}
+            if procs:
+                all_vars.add('ret')
+            sorts = infer_sorts(procs, main_stmt, all_vars, fixed)
+        except Exception as e:
+            print(f"Error: {e}", file=self.out)
+            return False
+
+        salt = verdict_salt(sorts, self.options)
+        keys = {name: salted(proc_fingerprint(name, procs), salt) for name in own}
+        keys['main'] = salted(main_fingerprint(main_stmt, procs), salt)
+        todo = [name for name in own if keys[name] not in self.verdicts]
+        check_main = keys['main'] not in self.verdicts
+        reused = [name for name in keys if keys[name] in self.verdicts]
+
+        print(f"\n--- {self.path}: {visited} definition(s) parsed, "
+              f"{len(todo) + check_main} to verify ---", file=self.out)
+        for name in reused:
+            entry = self.verdicts[keys[name]]
+            if entry['verdict'] != 'verified':
+                print(f"  {name}: {entry['verdict'].upper()} (unchanged)", file=self.out)
+
+        if todo or check_main:
+            self.verify(main_stmt, procs, all_vars, sorts, todo, check_main, keys)
+
+        # Forget the verdicts of older versions
+        self.verdicts = {keys[name]: self.verdicts[keys[name]] for name in keys
+                         if keys[name] in self.verdicts}
+        failed = [name for name in keys
+                  if self.verdicts.get(keys[name], {}).get('verdict') != 'verified']
+        if failed:
+            print(f"Not verified: {', '.join(failed)}", file=self.out)
+        else:
+            print("Program is VERIFIED.", file=self.out)
+        return True
+
+    def verify(self, main_stmt, procs, all_vars, sorts, todo, check_main, keys):
+        """Verifies the procedures in `todo` in parallel, then main if asked,
+        printing each verdict as it comes in."""
+        if self.options.get('infer_invariants'):
+            infer_options = {**self.options, 'vcgen': 'wp', 'split': True, 'incremental': False}
+            with VerificationContext(procs, all_vars, self.out, sorts, **infer_options) as ivctx:
+                main_stmt, procs, _ = infer_invariants(main_stmt, procs, ivctx, wp, self.interner)
+        if self.options.get('slice'):
+            main_stmt, procs, _ = slice_program(main_stmt, procs, self.interner)
+
+        def show(entry):
+            print(f"  {entry['name']}: {entry['verdict'].upper()} ({entry['seconds']:.2f}s)",
+                  file=self.out)
+            if entry['verdict'] != 'verified' and entry['detail']:
+                print(f"    {entry['detail']}", file=self.out)
+            self.verdicts[keys[entry['name']]] = entry
+
+        def guarded(name, check):
+            # An error (e.g. a call to an undefined procedure) is that
+            # definition's verdict; the others, and watching, go on
+            start = time.perf_counter()
+            try:
+                check()
+            except Exception as e:
+                show({'name': name, 'verdict': 'error', 'seconds': time.perf_counter() - start,
+                      'detail': f"{type(e).__name__}: {e}", 'goals': None})
+
+        # Progress messages of the checks are dropped; only verdicts are shown
+        with VerificationContext(procs, all_vars, io.StringIO(), sorts, **self.options) as vctx:
+            vctx.on_result = show
+
+            def run(name):
+                with vctx.fork() as worker:
+                    guarded(name, lambda: verify_proc(name, procs[name], worker))
+
+            if todo:
+                with ThreadPoolExecutor(max_workers=self.jobs or os.cpu_count() or 1) as pool:
+                    for future in as_completed([pool.submit(run, name) for name in todo]):
+                        future.result()
+            if check_main:
+                guarded('main', lambda: verify_main(main_stmt, vctx))
+
+    def watch(self, interval=0.5):
+        """Checks the file now and whenever its modification time changes."""
+        while True:
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except OSError:
+                # Editors may replace the file rather than write it
+                mtime = None
+            if mtime is not None and mtime != self.mtime:
+                self.mtime = mtime
+                self.check()
+            time.sleep(interval)